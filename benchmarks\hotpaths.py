@@ -0,0 +1,271 @@
+"""Бенчмарки горячих путей: add, commit, игнор-шаблоны, загрузка блобов при push и clone.
+
+Запуск из корня репозитория, результат — JSON для сравнения между версиями:
+
+    python -m benchmarks.hotpaths --files 2000 --binary-ratio 0.2 --output results.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.mock_github import MockGitHub
+from benchmarks.synthetic import SIZE_DISTRIBUTIONS, RepositorySpec, generate_repository
+
+BENCHMARKS = ("add", "add_unchanged", "commit", "ignore_matching", "worktree_walk",
+              "build_tree_data", "clone_archive", "clone_github")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class Context:
+    """Общие для всех бенчмарков данные: исходное дерево, архив и mock-сервер"""
+
+    def __init__(self, workdir, spec, jobs, mock):
+        self.workdir = workdir
+        self.spec = spec
+        self.jobs = jobs
+        self.mock = mock
+        self.source = os.path.join(workdir, "source")
+        self.tracked, self.ignored, self.total_size = generate_repository(self.source, spec)
+        self.__counter = 0
+
+    def scratch(self, name):
+        self.__counter += 1
+        return os.path.join(self.workdir, f"{name}-{self.__counter}")
+
+    def fresh_repository(self, add=False, commit=False):
+        """Копия исходного дерева с пустым .gitx; при необходимости сразу add и commit"""
+        from core.repository import Repository
+
+        path = self.scratch("repo")
+        shutil.copytree(self.source, path)
+        repository = Repository(path)
+        with quiet():
+            repository.init()
+            if add:
+                repository.add(["."], self.jobs)
+            if commit:
+                repository.commit("benchmark")
+        return repository
+
+
+@contextlib.contextmanager
+def quiet():
+    # Построчный вывод add на тысячах файлов иначе измерял бы скорость терминала
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+@contextlib.contextmanager
+def working_directory(path):
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+def bench_add(context):
+    repository = context.fresh_repository()
+    return (lambda: repository.add(["."], context.jobs)), len(context.tracked), context.total_size
+
+
+def bench_add_unchanged(context):
+    repository = context.fresh_repository(add=True)
+    return (lambda: repository.add(["."], context.jobs)), len(context.tracked), context.total_size
+
+
+def bench_commit(context):
+    repository = context.fresh_repository(add=True)
+    return (lambda: repository.commit("benchmark")), len(context.tracked), context.total_size
+
+
+def bench_ignore_matching(context):
+    from core.ignore import IgnoreMatcher
+
+    matcher = IgnoreMatcher()
+    if context.spec.ignore_patterns:
+        matcher.add_file(os.path.join(context.source, ".gitxignore"))
+    paths = context.tracked + context.ignored
+
+    def run():
+        for path in paths:
+            matcher.is_ignored(path, False)
+    return run, len(paths), 0
+
+
+def bench_worktree_walk(context):
+    from core.repository import Repository
+
+    repository = Repository(context.source)
+    return (lambda: list(repository.iter_worktree())), len(context.tracked) + len(context.ignored), 0
+
+
+def bench_build_tree_data(context):
+    from core.github import GitHubClient
+    from core.commit import read_commit
+    from core.refs import read_ref
+    from core.tree import walk_tree
+
+    repository = context.fresh_repository(add=True, commit=True)
+    tip = read_commit(repository.objects, read_ref(repository.vcs_dir, "main"))
+    changes = [(path, None, (mode, oid)) for path, mode, oid in walk_tree(repository.objects, tip["tree"])]
+
+    def run():
+        context.mock.reset()
+        with GitHubClient("bench", "repo", "token", context.jobs, api_url=context.mock.url) as client:
+            # Приватный метод вызывается напрямую: измеряется именно загрузка блобов без остального push
+            repository._Repository__build_tree_data(client, changes)
+    return run, len(changes), context.total_size
+
+
+def _archive(context):
+    path = os.path.join(context.workdir, "source.tar.gz")
+    if not os.path.exists(path):
+        with tarfile.open(path, "w:gz") as archive:
+            for relative_path in context.tracked:
+                archive.add(os.path.join(context.source, relative_path), f"bench-repo/{relative_path}")
+    return path
+
+
+def bench_clone_archive(context):
+    from core.repository import Repository
+    from core.commit import make_signature
+
+    archive_path = _archive(context)
+    signature = make_signature("Benchmark <bench@example.com>", 1700000000)
+
+    def run():
+        with open(archive_path, "rb") as file:
+            Repository(context.scratch("clone")).clone_archive(
+                file, "origin", "https://github.com/bench/repo", "main", "0" * 40, "benchmark", signature, context.jobs
+            )
+    return run, len(context.tracked), context.total_size
+
+
+def bench_clone_github(context):
+    from core.repository import Repository
+    from commands.rest import clone
+
+    files = {}
+    for relative_path in context.tracked:
+        with open(os.path.join(context.source, relative_path), "rb") as file:
+            files[relative_path] = file.read()
+
+    def run():
+        context.mock.reset()
+        context.mock.seed(files)
+        target = context.scratch("github")
+        os.makedirs(target)
+        with working_directory(target):
+            clone(Repository(target), {"repository_url": "https://github.com/bench/repo", "jobs": context.jobs})
+    return run, len(context.tracked), context.total_size
+
+
+def measure(name, context, repeat):
+    """Медиана времени по repeat прогонам и пик памяти по отдельному прогону под tracemalloc"""
+    timings = []
+    for _ in range(repeat):
+        run, items, size = globals()[f"bench_{name}"](context)
+        with quiet():
+            start = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - start)
+
+    # tracemalloc замедляет выполнение, поэтому память меряется отдельным прогоном
+    run, items, size = globals()[f"bench_{name}"](context)
+    tracemalloc.start()
+    try:
+        with quiet():
+            run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    seconds = statistics.median(timings)
+    return {
+        "name": name,
+        "seconds": round(seconds, 6),
+        "timings": [round(timing, 6) for timing in timings],
+        "items": items,
+        "bytes": size,
+        "items_per_second": round(items / seconds, 1) if seconds else None,
+        "mb_per_second": round(size / seconds / (1 << 20), 2) if seconds and size else None,
+        "peak_memory_mb": round(peak / (1 << 20), 2),
+    }
+
+
+def revision():
+    try:
+        result = subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True)
+        return result.stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.hotpaths")
+    parser.add_argument("--files", type=int, default=1000)
+    parser.add_argument("--mean-size", type=int, default=4096)
+    parser.add_argument("--size-distribution", choices=SIZE_DISTRIBUTIONS, default="lognormal")
+    parser.add_argument("--binary-ratio", type=float, default=0.1)
+    parser.add_argument("--ignore-patterns", type=int, default=20)
+    parser.add_argument("--ignored-ratio", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("-j", "--jobs", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="задержка ответа mock-сервера GitHub")
+    parser.add_argument("--only", help="список бенчмарков через запятую")
+    parser.add_argument("--output", help="файл для JSON; по умолчанию stdout")
+    args = parser.parse_args()
+
+    names = args.only.split(",") if args.only else list(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)}")
+
+    spec = RepositorySpec(
+        files=args.files, mean_size=args.mean_size, size_distribution=args.size_distribution,
+        binary_ratio=args.binary_ratio, ignore_patterns=args.ignore_patterns,
+        ignored_ratio=args.ignored_ratio, seed=args.seed,
+    )
+
+    with MockGitHub(latency=args.latency_ms / 1000) as mock, tempfile.TemporaryDirectory() as workdir:
+        # core.github читает адрес API при импорте, поэтому переменная задаётся до первого импорта
+        os.environ["GITX_GITHUB_API"] = mock.url
+        context = Context(workdir, spec, args.jobs, mock)
+        results = []
+        for name in names:
+            results.append(measure(name, context, args.repeat))
+            print(f"{name}: {results[-1]['seconds']:.3f}s", file=sys.stderr)
+
+    report = {
+        "revision": revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "spec": spec.to_dict(),
+        "jobs": args.jobs,
+        "repeat": args.repeat,
+        "results": results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+"""Имитация GitHub REST API в памяти: то подмножество, которым пользуются clone и push."""
+import base64
+import hashlib
+import io
+import json
+import random
+import re
+import tarfile
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from core.objects import object_header
+from core.tree import TREE_MODE, format_tree, parse_tree
+
+REPO_PATH = re.compile(r"/repos/([^/]+)/([^/]+)(?:/(.*))?")
+FAULT_MESSAGES = {
+    403: "You have exceeded a secondary rate limit. Please wait a few minutes before you try again.",
+    429: "Too many requests",
+}
+
+
+class MockGitHub:
+    """HTTP-сервер на свободном порту; объекты хранятся в памяти с теми же id, что и в git.
+
+    Для проверки повторов умеет отвечать отказами: inject() — заданным запросам, fault_rate — случайной
+    доле запросов (429 с Retry-After), rate_limit — первичный лимит с заголовками X-RateLimit-*.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, fault_rate=0.0, retry_after=0, seed=1):
+        self.latency = latency
+        self.fault_rate = fault_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.rate_limit = None
+        self.reset()
+        handler = type("Handler", (_Handler,), {"mock": self})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.url = f"http://{host}:{self.server.server_port}"
+        self.__thread = None
+
+    def reset(self):
+        with self.lock:
+            self.objects = {}
+            self.refs = {}
+            self.requests = 0
+            self.connections = set()
+            # "METHOD вид" -> число обработанных запросов, например "POST git/blobs"
+            self.handled = Counter()
+            self.rejected = 0
+            self.faults = []
+            self.window_start = time.time()
+            self.window_used = 0
+
+    def inject(self, status, count=1, path=None, retry_after=None, message=None):
+        """Следующие count запросов, в пути которых есть path, получат status вместо ответа"""
+        with self.lock:
+            self.faults.append({
+                "status": status, "count": count, "path": path, "retry_after": retry_after,
+                "message": message or FAULT_MESSAGES.get(status, "Server Error"),
+            })
+
+    def set_rate_limit(self, limit, window=60):
+        """Первичный лимит: limit запросов за window секунд, дальше 403 до сброса окна"""
+        with self.lock:
+            self.rate_limit = (limit, window)
+            self.window_start = time.time()
+            self.window_used = 0
+
+    def take_fault(self, path):
+        """Отказ для очередного запроса или None; заодно считает первичный лимит"""
+        with self.lock:
+            for fault in self.faults:
+                if fault["count"] > 0 and (fault["path"] is None or fault["path"] in path):
+                    fault["count"] -= 1
+                    self.rejected += 1
+                    return fault
+            if self.fault_rate and self.random.random() < self.fault_rate:
+                self.rejected += 1
+                return {"status": 429, "retry_after": self.retry_after, "message": FAULT_MESSAGES[429]}
+            if self.rate_limit:
+                limit, window = self.rate_limit
+                if time.time() >= self.window_start + window:
+                    self.window_start = time.time()
+                    self.window_used = 0
+                if self.window_used >= limit:
+                    self.rejected += 1
+                    return {"status": 403, "retry_after": None, "message": "API rate limit exceeded"}
+                self.window_used += 1
+            return None
+
+    def rate_limit_headers(self):
+        if not self.rate_limit:
+            return {}
+        limit, window = self.rate_limit
+        with self.lock:
+            return {
+                "X-RateLimit-Limit": str(limit),
+                "X-RateLimit-Remaining": str(max(0, limit - self.window_used)),
+                "X-RateLimit-Used": str(self.window_used),
+                "X-RateLimit-Reset": str(int(self.window_start + window + 0.999)),
+            }
+
+    def start(self):
+        self.__thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.__thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def put(self, obj_type, data):
+        oid = hashlib.sha1(object_header(obj_type, len(data)) + data).hexdigest()
+        with self.lock:
+            self.objects[oid] = (obj_type, data)
+        return oid
+
+    def read_tree(self, tree_hash):
+        return parse_tree(self.objects[tree_hash][1])
+
+    def walk(self, tree_hash, prefix=""):
+        for mode, name, oid in self.read_tree(tree_hash):
+            if mode == TREE_MODE:
+                yield from self.walk(oid, f"{prefix}{name}/")
+            else:
+                yield f"{prefix}{name}", mode, oid
+
+    def build_tree(self, files):
+        """Строит дерево из {path: (mode, blob)}; возвращает его id"""
+        root = {}
+        for path, entry in files.items():
+            node = root
+            *directories, name = path.split("/")
+            for directory in directories:
+                node = node.setdefault(directory, {})
+            node[name] = entry
+
+        def build(node):
+            entries = []
+            for name, value in node.items():
+                if isinstance(value, dict):
+                    entries.append((TREE_MODE, name, build(value)))
+                else:
+                    entries.append((value[0], name, value[1]))
+            return self.put("tree", format_tree(entries))
+
+        return build(root)
+
+    def commit(self, tree, parents, message):
+        lines = [f"tree {tree}"] + [f"parent {parent}" for parent in parents]
+        signature = "Benchmark <bench@example.com> 1700000000 +0000"
+        lines += [f"author {signature}", f"committer {signature}"]
+        return self.put("commit", ("\n".join(lines) + "\n\n" + message + "\n").encode())
+
+    def seed(self, files, branch="main", message="Initial commit"):
+        """Заполняет репозиторий файлами {path: bytes} одним коммитом; возвращает его id"""
+        tree = self.build_tree({path: ("100644", self.put("blob", data)) for path, data in files.items()})
+        commit_hash = self.commit(tree, [], message)
+        self.refs[branch] = commit_hash
+        return commit_hash
+
+    def commit_tree(self, commit_hash):
+        return self.objects[commit_hash][1].decode().split("\n", 1)[0].split(" ")[1]
+
+    def tarball(self, commit_hash):
+        buffer = io.BytesIO()
+        with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+            for path, mode, oid in self.walk(self.commit_tree(commit_hash)):
+                data = self.objects[oid][1]
+                info = tarfile.TarInfo(f"bench-repo-{commit_hash[:7]}/{path}")
+                info.size = len(data)
+                info.mode = 0o755 if mode == "100755" else 0o644
+                archive.addfile(info, io.BytesIO(data))
+        return buffer.getvalue()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Заголовки и тело уходят отдельными записями; без TCP_NODELAY keep-alive упирается в delayed ACK
+    disable_nagle_algorithm = True
+    mock = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def __send(self, status, payload=None, body=None, content_type="application/json", headers=None):
+        if body is None:
+            body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in {**self.mock.rate_limit_headers(), **(headers or {})}.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def __body(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length)) if length else {}
+
+    def __reject(self, fault):
+        # Тело запроса дочитываем, иначе следующий запрос на этом keep-alive соединении разберётся неверно
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        headers = {}
+        if fault.get("retry_after") is not None:
+            headers["Retry-After"] = str(fault["retry_after"])
+        self.__send(fault["status"], {"message": fault["message"]}, headers=headers)
+
+    def __route(self, method):
+        with self.mock.lock:
+            self.mock.requests += 1
+            self.mock.connections.add(id(self.connection))
+        if self.mock.latency:
+            time.sleep(self.mock.latency)
+
+        fault = self.mock.take_fault(self.path)
+        if fault is not None:
+            return self.__reject(fault)
+
+        match = REPO_PATH.fullmatch(self.path.split("?")[0])
+        if not match:
+            return self.__send(404, {"message": "Not Found"})
+        rest = match.group(3) or ""
+        body = self.__body() if method != "GET" else {}
+        handler = getattr(self, f"_{method.lower()}_{rest.split('/')[0] or 'repository'}".replace("-", "_"), None)
+        if handler is None:
+            return self.__send(404, {"message": f"Unknown {method} {rest}"})
+        status, payload = handler(rest, body)
+        with self.mock.lock:
+            self.mock.handled[f"{method} {'/'.join(rest.split('/')[:2])}"] += 1
+        if isinstance(payload, bytes):
+            return self.__send(status, body=payload, content_type="application/gzip")
+        self.__send(status, payload)
+
+    def do_GET(self):
+        self.__route("GET")
+
+    def do_POST(self):
+        self.__route("POST")
+
+    def do_PUT(self):
+        self.__route("PUT")
+
+    def do_PATCH(self):
+        self.__route("PATCH")
+
+    def _get_repository(self, rest, body):
+        return 200, {"default_branch": "main"}
+
+    def _get_tarball(self, rest, body):
+        ref = rest.split("/", 1)[1]
+        commit_hash = self.mock.refs.get(ref, ref)
+        if commit_hash not in self.mock.objects:
+            return 404, {"message": "Not Found"}
+        return 200, self.mock.tarball(commit_hash)
+
+    def _put_contents(self, rest, body):
+        path = rest.split("/", 1)[1]
+        blob = self.mock.put("blob", base64.b64decode(body["content"]))
+        commit_hash = self.mock.commit(self.mock.build_tree({path: ("100644", blob)}), [], body["message"])
+        self.mock.refs[body.get("branch", "main")] = commit_hash
+        return 201, {"commit": {"sha": commit_hash}}
+
+    def _get_git(self, rest, body):
+        kind, _, name = rest[len("git/"):].partition("/")
+        if kind == "ref":
+            if not self.mock.refs:
+                return 409, {"message": "Git Repository is empty."}
+            branch = name[len("heads/"):]
+            if branch not in self.mock.refs:
+                return 404, {"message": "Not Found"}
+            return 200, {"object": {"sha": self.mock.refs[branch]}}
+
+        if name not in self.mock.objects:
+            return 404, {"message": "Not Found"}
+        if kind == "trees":
+            return 200, {"sha": name, "tree": [
+                {"path": entry_name, "mode": mode.zfill(6), "type": "tree" if mode == TREE_MODE else "blob", "sha": oid}
+                for mode, entry_name, oid in self.mock.read_tree(name)
+            ]}
+        if kind == "commits":
+            return 200, {
+                "sha": name,
+                "tree": {"sha": self.mock.commit_tree(name)},
+                "message": self.mock.objects[name][1].decode().split("\n\n", 1)[1].rstrip("\n"),
+                "author": {"name": "Benchmark", "email": "bench@example.com", "date": "2023-11-14T22:13:20Z"},
+            }
+        return 404, {"message": "Not Found"}
+
+    def _post_git(self, rest, body):
+        kind = rest[len("git/"):]
+        if kind == "blobs":
+            return 201, {"sha": self.mock.put("blob", base64.b64decode(body["content"]))}
+        if kind == "trees":
+            files = {}
+            if body.get("base_tree"):
+                files = {path: (mode, oid) for path, mode, oid in self.mock.walk(body["base_tree"])}
+            for entry in body["tree"]:
+                if entry.get("sha") is None:
+                    files.pop(entry["path"], None)
+                elif entry["sha"] not in self.mock.objects:
+                    return 422, {"message": f"tree.sha {entry['sha']} is invalid"}
+                else:
+                    files[entry["path"]] = (entry["mode"], entry["sha"])
+            return 201, {"sha": self.mock.build_tree(files)}
+        if kind == "commits":
+            return 201, {"sha": self.mock.commit(body["tree"], body["parents"], body["message"])}
+        if kind == "refs":
+            branch = body["ref"][len("refs/heads/"):]
+            if branch in self.mock.refs:
+                return 422, {"message": "Reference already exists"}
+            self.mock.refs[branch] = body["sha"]
+            return 201, {"object": {"sha": body["sha"]}}
+        return 404, {"message": "Not Found"}
+
+    def _patch_git(self, rest, body):
+        branch = rest[len("git/refs/heads/"):]
+        self.mock.refs[branch] = body["sha"]
+        return 200, {"object": {"sha": body["sha"]}}
@@ -0,0 +1,95 @@
+"""Замер времени запуска CLI через `python -X importtime`.
+
+Завершается с ошибкой, если локальная команда импортирует сетевые модули
+или время импорта выходит за бюджет:
+
+    python benchmarks/startup.py --budget-ms 40
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAIN = os.path.join(ROOT, "main.py")
+
+# Команды без сети: им не нужны requests, tarfile и HTTP-сервер
+LOCAL_COMMANDS = [
+    ["status"],
+    ["diff"],
+    ["add", "."],
+    ["commit", "-m", "bench"],
+    ["gc"],
+]
+FORBIDDEN_MODULES = (
+    "requests", "urllib3", "tarfile", "http.client", "http.server",
+    "core.github", "core.archive", "core.server", "commands.rest",
+)
+DEFAULT_BUDGET_MS = 40
+DEFAULT_RUNS = 5
+
+
+def parse_importtime(stderr):
+    """Разбирает вывод -X importtime в {module: self_us}"""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = int(self_us)
+    return modules
+
+
+def run_importtime(args, cwd):
+    env = dict(os.environ)
+    # Без байткода замер показывал бы время компиляции, а не импорта
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", *args], cwd=cwd, env=env, capture_output=True, text=True
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+    return parse_importtime(result.stderr), wall_ms
+
+
+def measure(command, cwd, baseline, runs):
+    best = None
+    for _ in range(runs):
+        modules, wall_ms = run_importtime([MAIN, *command], cwd)
+        # Модули интерпретатора (site и .pth-файлы) есть в любом запуске, их вычитаем
+        import_ms = sum(us for name, us in modules.items() if name not in baseline) / 1000
+        if best is None or import_ms < best["import_ms"]:
+            best = {"import_ms": round(import_ms, 2), "wall_ms": round(wall_ms, 2), "modules": modules}
+
+    forbidden = sorted(name for name in best.pop("modules") if name.startswith(FORBIDDEN_MODULES))
+    return {"command": " ".join(command), **best, "forbidden": forbidden}
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python benchmarks/startup.py")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS)
+    args = parser.parse_args()
+
+    baseline, _ = run_importtime(["-c", "pass"], ROOT)
+    failed = False
+
+    with tempfile.TemporaryDirectory() as workdir:
+        subprocess.run([sys.executable, MAIN, "init"], cwd=workdir, capture_output=True, check=True)
+        with open(os.path.join(workdir, "file.txt"), "w") as file:
+            file.write("benchmark\n")
+
+        for command in LOCAL_COMMANDS:
+            result = measure(command, workdir, baseline, args.runs)
+            result["ok"] = not result["forbidden"] and result["import_ms"] <= args.budget_ms
+            failed = failed or not result["ok"]
+            print(json.dumps(result))
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
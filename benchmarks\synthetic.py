@@ -0,0 +1,96 @@
+"""Генерация синтетических репозиториев для бенчмарков."""
+import math
+import os
+import random
+
+SIZE_DISTRIBUTIONS = ("fixed", "uniform", "lognormal")
+WORDS = [
+    "def", "class", "return", "import", "self", "value", "index", "tree", "commit", "object",
+    "for", "while", "if", "else", "path", "data", "file", "hash", "blob", "None", "True", "False",
+]
+
+
+class RepositorySpec:
+    """Параметры синтетического репозитория; одинаковые параметры и seed дают одинаковое дерево"""
+
+    def __init__(self, files=1000, mean_size=4096, size_distribution="lognormal", binary_ratio=0.1,
+                 ignore_patterns=20, ignored_ratio=0.1, files_per_dir=50, seed=1):
+        if size_distribution not in SIZE_DISTRIBUTIONS:
+            raise Exception(f"Unknown size distribution {size_distribution}")
+        self.files = files
+        self.mean_size = mean_size
+        self.size_distribution = size_distribution
+        self.binary_ratio = binary_ratio
+        self.ignore_patterns = ignore_patterns
+        self.ignored_ratio = ignored_ratio
+        self.files_per_dir = files_per_dir
+        self.seed = seed
+
+    def to_dict(self):
+        return dict(vars(self))
+
+
+def _file_size(rng, spec):
+    if spec.size_distribution == "fixed":
+        return spec.mean_size
+    if spec.size_distribution == "uniform":
+        return rng.randint(0, 2 * spec.mean_size)
+    # Логнормальное с заданным средним: много мелких файлов и длинный хвост крупных, как в реальных репозиториях
+    sigma = 1.0
+    return int(rng.lognormvariate(math.log(max(spec.mean_size, 1)) - sigma ** 2 / 2, sigma))
+
+
+def _text(rng, size):
+    lines = []
+    length = 0
+    while length < size:
+        line = " ".join(rng.choices(WORDS, k=rng.randint(3, 12))) + "\n"
+        lines.append(line)
+        length += len(line)
+    return "".join(lines).encode()[:size]
+
+
+def ignore_lines(count):
+    """Шаблоны .gitxignore разных видов: расширения, каталоги, ** и отрицания"""
+    kinds = ["*.tmp{0}", "build{0}/", "**/cache{0}/*.log", "!keep{0}.tmp{0}", "/generated{0}.txt"]
+    return [kinds[i % len(kinds)].format(i) for i in range(count)]
+
+
+def generate_repository(path, spec):
+    """Создаёт рабочее дерево по spec; возвращает (отслеживаемые пути, игнорируемые пути, общий размер)"""
+    rng = random.Random(spec.seed)
+    os.makedirs(path, exist_ok=True)
+    tracked, ignored = [], []
+    total_size = 0
+
+    patterns = ignore_lines(spec.ignore_patterns)
+    if patterns:
+        with open(os.path.join(path, ".gitxignore"), "w") as file:
+            file.write("\n".join(patterns) + "\n")
+        tracked.append(".gitxignore")
+
+    extensions = [f".tmp{i}" for i in range(0, spec.ignore_patterns, 5)]
+    for number in range(spec.files):
+        directory = f"dir{number // spec.files_per_dir // 10}/sub{number // spec.files_per_dir}"
+        is_ignored = bool(extensions) and rng.random() < spec.ignored_ratio
+        if is_ignored:
+            relative_path = f"{directory}/file{number}{rng.choice(extensions)}"
+        elif rng.random() < spec.binary_ratio:
+            relative_path = f"{directory}/file{number}.bin"
+        else:
+            relative_path = f"{directory}/file{number}.py"
+
+        size = _file_size(rng, spec)
+        content = rng.randbytes(size) if relative_path.endswith(".bin") else _text(rng, size)
+        full_path = os.path.join(path, *relative_path.split("/"))
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, "wb") as file:
+            file.write(content)
+
+        if is_ignored:
+            ignored.append(relative_path)
+        else:
+            tracked.append(relative_path)
+            total_size += size
+
+    return tracked, ignored, total_size
@@ -1,37 +1,90 @@
 from core.repository import Repository
-import os
-import hashlib
-import json
-from pathlib import Path
 
 def init(repository: Repository, e=None):
-    repository.init()
+    return repository.init()
 
 def add(repository: Repository, kwargs):
     files = kwargs.get('files', [])
-    repository.add(files)
+    jobs = kwargs.get('jobs')
+    return repository.add(files, jobs)
 
 def commit(repository: Repository, kwargs):
     message = kwargs.get('message', '')
-    repository.commit(message)
+    return repository.commit(message)
+
+def status(repository: Repository, kwargs):
+    return repository.status()
+
+def diff(repository: Repository, kwargs):
+    paths = kwargs.get('paths', [])
+    cached = kwargs.get('cached', False)
+    return repository.diff(paths, cached)
+
+def log(repository: Repository, kwargs):
+    max_count = kwargs.get('max_count')
+    paths = kwargs.get('paths', [])
+    oneline = kwargs.get('oneline', False)
+    return repository.log(max_count, paths, oneline)
+
+def merge_base(repository: Repository, kwargs):
+    first, second = kwargs.get('commits')
+    return repository.merge_base(first, second)
+
+def gc(repository: Repository, kwargs):
+    return repository.gc()
 
 def branch(repository: Repository, kwargs):
     new_name = kwargs.get('new_name')
-    repository.rename_branch(new_name)
+    name = kwargs.get('name')
+    if new_name:
+        return repository.rename_branch(new_name)
+    elif kwargs.get('delete') or kwargs.get('force_delete'):
+        return repository.delete_branch(name, kwargs.get('force_delete', False))
+    elif name:
+        return repository.create_branch(name, kwargs.get('start'))
+    else:
+        return repository.list_branches()
+
+def checkout(repository: Repository, kwargs):
+    branch = kwargs.get('branch')
+    create = kwargs.get('create', False)
+    jobs = kwargs.get('jobs')
+    return repository.checkout(branch, create, jobs)
 
 def remote(repository: Repository, kwargs):
     action = kwargs.get('action')
     name = kwargs.get('name')
     url = kwargs.get('url')
-    repository.remote(action, name, url)
+    return repository.remote(action, name, url)
 
 def push(repository: Repository, kwargs):
     remote = kwargs.get('remote')
     branch = kwargs.get('branch')
     set_upstream = kwargs.get('set_upstream', False)
-    repository.push(remote, branch, set_upstream)
+    jobs = kwargs.get('jobs')
+    force = kwargs.get('force', False)
+    return repository.push(remote, branch, set_upstream, jobs, force)
+
+def fetch(repository: Repository, kwargs):
+    remote = kwargs.get('remote')
+    branch = kwargs.get('branch')
+    return repository.fetch(remote, branch)
+
+def pull(repository: Repository, kwargs):
+    remote = kwargs.get('remote')
+    branch = kwargs.get('branch')
+    return repository.pull(remote, branch)
+
+def serve(repository: Repository, kwargs):
+    from core.server import serve as serve_repository
+    host = kwargs.get('host') or '127.0.0.1'
+    port = kwargs.get('port') or 8000
+    serve_repository(repository.path, host, port)
+
+def daemon(repository: Repository, kwargs):
+    return repository.daemon(kwargs.get('stop', False))
 
 def auth(repository: Repository, kwargs):
     token = kwargs.get('token')
-    repository.auth(token)
+    return repository.auth(token)
 
@@ -0,0 +1,89 @@
+import contextlib
+import io
+import json
+import shlex
+import sys
+
+from commands.parser import build_parser, parse_kwargs
+from core import output
+
+
+def batch(repository, kwargs):
+    """Выполняет команды со stdin в одном процессе, с общими Repository и кэшами.
+
+    Строка — либо аргументы как в командной строке (`add -j 4 src`), вывод идёт как есть;
+    либо JSON: {"command": "add", "files": ["src"]} или {"args": ["add", "src"]}, и тогда в ответ
+    печатается одна строка JSON с полями command, ok, output, result и error. Команда не удалась
+    (ok — false), если бросила исключение или вернула False; error тогда — исключение или последняя
+    строка её вывода.
+    """
+    from instance import handler
+
+    parser = build_parser()
+    # readline, а не итерация по sys.stdin: в конвейере ответ нужен до закрытия входа
+    for line in iter(sys.stdin.readline, ""):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if line.startswith("{"):
+            print(json.dumps(_run_json(handler, parser, line), default=str))
+        else:
+            _run_line(handler, parser, line)
+        sys.stdout.flush()
+
+
+def _parse(parser, argv):
+    try:
+        args = parser.parse_args(argv)
+    except SystemExit:
+        # argparse уже напечатал usage в stderr
+        raise Exception(f"Invalid command: {' '.join(argv)}")
+    if args.command in (None, "batch"):
+        raise Exception(f"Invalid command: {' '.join(argv)}")
+    return args
+
+
+def _execute(handler, command, kwargs, verbosity=0):
+    previous = output.verbosity
+    if verbosity:
+        output.set_verbosity(verbosity)
+    try:
+        return handler.execute(command, **kwargs)
+    finally:
+        output.set_verbosity(previous)
+
+
+def _run_line(handler, parser, line):
+    try:
+        args = _parse(parser, shlex.split(line))
+        _execute(handler, args.command, parse_kwargs(args), args.verbose)
+    except Exception as e:
+        print(f"error: {e}")
+
+
+def _run_json(handler, parser, line):
+    response = {"command": None, "ok": False, "output": "", "result": None, "error": None}
+    buffer = io.StringIO()
+    try:
+        request = json.loads(line)
+        if "args" in request:
+            args = _parse(parser, [str(arg) for arg in request["args"]])
+            command, kwargs, verbosity = args.command, parse_kwargs(args), args.verbose
+        else:
+            command = request.pop("command", None)
+            if command in (None, "batch"):
+                raise Exception(f"Invalid command: {command}")
+            kwargs, verbosity = request, 0
+        response["command"] = command
+
+        with contextlib.redirect_stdout(buffer):
+            response["result"] = _execute(handler, command, kwargs, verbosity)
+        # Операции Repository сообщают о неудаче, возвращая False после сообщения об ошибке
+        response["ok"] = response["result"] is not False
+        if not response["ok"]:
+            lines = buffer.getvalue().strip().splitlines()
+            response["error"] = lines[-1] if lines else f"{command} failed"
+    except Exception as e:
+        response["error"] = str(e)
+    response["output"] = buffer.getvalue()
+    return response
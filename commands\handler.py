@@ -1,28 +1,46 @@
-from commands.base import *
-from commands.rest import *
+import importlib
+
+from core.trace import span
 
 class CommandHandler:
     def __init__(self, sys):
+        # Модуль команды импортируется только при её вызове: rest тянет requests и tarfile,
+        # которые не нужны локальным командам вроде add и commit
         self.__commands = {
-            "init": init,
-            "clone": clone,
-            "add": add,
-            "commit": commit,
-            "branch": branch,
-            "remote": remote,
-            "push": push,
-            "auth": auth
+            "init": "commands.base",
+            "clone": "commands.rest",
+            "add": "commands.base",
+            "commit": "commands.base",
+            "status": "commands.base",
+            "diff": "commands.base",
+            "log": "commands.base",
+            "merge-base": "commands.base",
+            "gc": "commands.base",
+            "branch": "commands.base",
+            "checkout": "commands.base",
+            "remote": "commands.base",
+            "push": "commands.base",
+            "fetch": "commands.base",
+            "pull": "commands.base",
+            "serve": "commands.base",
+            "daemon": "commands.base",
+            "batch": "commands.batch",
+            "auth": "commands.base"
         }
         self.__sys = sys
 
+    def __load(self, command: str):
+        return getattr(importlib.import_module(self.__commands[command]), command.replace("-", "_"))
+
     def __execute(self, prompt: str):
         if prompt not in self.__commands:
             return
-        return self.__commands[prompt](self.__sys)
+        return self.__load(prompt)(self.__sys)
 
     def execute(self, command: str, **kwargs):
         if command not in self.__commands.keys():
             print(f"Command '{command}' not found")
-            return
+            return False
         from instance import repository
-        return self.__commands[command](repository, kwargs)
\ No newline at end of file
+        with span(f"command.{command}"):
+            return self.__load(command)(repository, kwargs)
\ No newline at end of file
@@ -0,0 +1,121 @@
+import argparse
+
+from core import trace
+
+
+def build_parser():
+    """Парсер командной строки; им же `gitx batch` разбирает строки со stdin"""
+    parser = argparse.ArgumentParser(prog='python main.py')
+    parser.add_argument('--trace', action='store_true')
+    parser.add_argument('--trace-file', default='stderr')
+    parser.add_argument('--trace-format', choices=trace.FORMATS)
+    parser.add_argument('-v', '--verbose', action='count', default=0)
+    subparsers = parser.add_subparsers(dest='command')
+
+    init_parser = subparsers.add_parser('init')
+    init_parser.add_argument('path', nargs='?', default='.')
+
+    clone_parser = subparsers.add_parser('clone')
+    clone_parser.add_argument('url')
+    clone_parser.add_argument('-j', '--jobs', type=int)
+
+    add_parser = subparsers.add_parser('add')
+    add_parser.add_argument('files', nargs='+')
+    add_parser.add_argument('-j', '--jobs', type=int)
+
+    commit_parser = subparsers.add_parser('commit')
+    commit_parser.add_argument('-m', '--message', required=True)
+
+    subparsers.add_parser('status')
+
+    diff_parser = subparsers.add_parser('diff')
+    diff_parser.add_argument('--cached', '--staged', dest='cached', action='store_true')
+    diff_parser.add_argument('paths', nargs='*')
+
+    log_parser = subparsers.add_parser('log')
+    log_parser.add_argument('-n', '--max-count', type=int)
+    log_parser.add_argument('--oneline', action='store_true')
+    log_parser.add_argument('paths', nargs='*')
+
+    merge_base_parser = subparsers.add_parser('merge-base')
+    merge_base_parser.add_argument('commits', nargs=2)
+
+    subparsers.add_parser('gc')
+
+    branch_parser = subparsers.add_parser('branch')
+    branch_parser.add_argument('-M', '--move', dest='new_name')
+    branch_parser.add_argument('-d', '--delete', action='store_true')
+    branch_parser.add_argument('-D', dest='force_delete', action='store_true')
+    branch_parser.add_argument('name', nargs='?')
+    branch_parser.add_argument('start', nargs='?')
+
+    checkout_parser = subparsers.add_parser('checkout')
+    checkout_parser.add_argument('-b', dest='create', action='store_true')
+    checkout_parser.add_argument('branch')
+    checkout_parser.add_argument('-j', '--jobs', type=int)
+
+    remote_parser = subparsers.add_parser('remote')
+    remote_parser.add_argument('action')
+    remote_parser.add_argument('name')
+    remote_parser.add_argument('url', nargs='?')
+
+    push_parser = subparsers.add_parser('push')
+    push_parser.add_argument('-u', '--set-upstream', action='store_true')
+    push_parser.add_argument('remote')
+    push_parser.add_argument('branch')
+    push_parser.add_argument('-j', '--jobs', type=int)
+    push_parser.add_argument('-f', '--force', action='store_true')
+
+    fetch_parser = subparsers.add_parser('fetch')
+    fetch_parser.add_argument('remote')
+    fetch_parser.add_argument('branch')
+
+    pull_parser = subparsers.add_parser('pull')
+    pull_parser.add_argument('remote')
+    pull_parser.add_argument('branch')
+
+    serve_parser = subparsers.add_parser('serve')
+    serve_parser.add_argument('--host', default='127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=8000)
+
+    daemon_parser = subparsers.add_parser('daemon')
+    daemon_parser.add_argument('--stop', action='store_true')
+
+    subparsers.add_parser('batch')
+
+    auth_parser = subparsers.add_parser('auth')
+    auth_parser.add_argument('token')
+    return parser
+
+
+def parse_kwargs(args):
+    kwargs = {}
+    if hasattr(args, 'url'):
+        if args.command == 'clone':
+            kwargs['repository_url'] = args.url
+        elif args.command == 'remote':
+            kwargs['url'] = args.url
+    if hasattr(args, 'files'): kwargs['files'] = args.files
+    if hasattr(args, 'jobs'): kwargs['jobs'] = args.jobs
+    if hasattr(args, 'message'): kwargs['message'] = args.message
+    if hasattr(args, 'paths'): kwargs['paths'] = args.paths
+    if hasattr(args, 'cached'): kwargs['cached'] = args.cached
+    if hasattr(args, 'max_count'): kwargs['max_count'] = args.max_count
+    if hasattr(args, 'oneline'): kwargs['oneline'] = args.oneline
+    if hasattr(args, 'commits'): kwargs['commits'] = args.commits
+    if hasattr(args, 'new_name'): kwargs['new_name'] = args.new_name
+    if hasattr(args, 'delete'): kwargs['delete'] = args.delete
+    if hasattr(args, 'force_delete'): kwargs['force_delete'] = args.force_delete
+    if hasattr(args, 'start'): kwargs['start'] = args.start
+    if hasattr(args, 'create'): kwargs['create'] = args.create
+    if hasattr(args, 'action'): kwargs['action'] = args.action
+    if hasattr(args, 'name'): kwargs['name'] = args.name
+    if hasattr(args, 'set_upstream'): kwargs['set_upstream'] = args.set_upstream
+    if hasattr(args, 'force'): kwargs['force'] = args.force
+    if hasattr(args, 'branch'): kwargs['branch'] = args.branch
+    if hasattr(args, 'remote'): kwargs['remote'] = args.remote
+    if hasattr(args, 'token'): kwargs['token'] = args.token
+    if hasattr(args, 'host'): kwargs['host'] = args.host
+    if hasattr(args, 'port'): kwargs['port'] = args.port
+    if hasattr(args, 'stop'): kwargs['stop'] = args.stop
+    return kwargs
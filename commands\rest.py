@@ -1,15 +1,26 @@
+from datetime import datetime
 from pathlib import Path
+from urllib.parse import urlparse
 import requests
-import tempfile
-import zipfile
-import os
+import tarfile
+
+from core.repository import Repository
+from core.github import GitHubClient
+from core.commit import make_signature
 
 
 def clone(repository, repository_url: str = ""):
+    jobs = repository_url.get('jobs')
     repository_url = repository_url['repository_url']
 
     if not repository_url.startswith(('https://github.com/', 'git@github.com:')):
-        raise ValueError("Only GitHub URLs are supported")
+        # Остальные адреса — gitx-репозитории: локальный путь, file:// или `gitx serve`
+        target_path = Path(urlparse(repository_url).path.rstrip('/')).name or "repository"
+        print(f"Cloning {repository_url} into {target_path}...")
+        try:
+            return Repository(target_path).clone_remote(repository_url)
+        except requests.RequestException as e:
+            raise Exception(f"Failed to fetch repository: {e}")
 
     if repository_url.startswith('https://github.com/'):
         parts = repository_url.replace('https://github.com/', '').split('/')
@@ -20,50 +31,37 @@ def clone(repository, repository_url: str = ""):
         raise ValueError("Invalid GitHub URL format")
 
     user, repo = parts[0], parts[1].replace('.git', '')
-    zip_url = f"https://api.github.com/repos/{user}/{repo}/zipball/main"
 
     print(f"Cloning {repository.path}/{user}/{repo}...")
 
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.zip') as tmp_file:
-        tmp_path = tmp_file.name
+    target_path = Path(f"./{user}/{repo}")
+    target_path.mkdir(parents=True, exist_ok=True)
 
     try:
-        response = requests.get(zip_url, stream=True)
-        response.raise_for_status()
-
-        with open(tmp_path, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                if chunk:
-                    f.write(chunk)
-
-        with zipfile.ZipFile(tmp_path, 'r') as zip_ref:
-            members = zip_ref.namelist()
-            if not members:
+        with GitHubClient(user, repo) as client:
+            branch = client.get_repository()["default_branch"]
+            remote_sha = client.get_ref(branch)
+            if remote_sha is None:
                 raise ValueError("Empty repository")
 
-            root_dir = members[0]
-
-            target_path = Path(f"./{user}/{repo}")
-            target_path.mkdir(parents=True, exist_ok=True)
-
-            for member in members:
-                if member != root_dir:
-                    relative_path = member[len(root_dir):]
-                    if relative_path:
-                        full_path = target_path / relative_path
+            commit = client.get_commit(remote_sha)
+            author = commit["author"]
+            timestamp = int(datetime.fromisoformat(author["date"].replace("Z", "+00:00")).timestamp())
+            signature = make_signature(f"{author['name']} <{author['email']}>", timestamp)
 
-                        if member.endswith('/'):
-                            full_path.mkdir(parents=True, exist_ok=True)
-                        else:
-                            with zip_ref.open(member) as source, open(full_path, 'wb') as target:
-                                target.write(source.read())
+            # Архив распаковывается прямо из HTTP-потока, без временного файла
+            with client.open_tarball(remote_sha) as response:
+                cloned = Repository(str(target_path)).clone_archive(
+                    response.raw, "origin", f"https://github.com/{user}/{repo}",
+                    branch, remote_sha, commit["message"], signature, jobs
+                )
 
+        if cloned is False:
+            return False
         print(f"Repository cloned successfully")
+        return True
 
     except requests.RequestException as e:
         raise Exception(f"Failed to download repository: {e}")
-    except zipfile.BadZipFile:
-        raise Exception("Invalid ZIP file downloaded")
-    finally:
-        if os.path.exists(tmp_path):
-            os.unlink(tmp_path)
+    except tarfile.TarError:
+        raise Exception("Invalid archive downloaded")
@@ -0,0 +1,84 @@
+import os
+import tarfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from core.objects import read_chunks
+
+STREAM_CHUNK = 1 << 20
+# Файлы до этого размера читаются из потока целиком и дописываются в пуле потоков,
+# более крупные копируются потоково частями
+BUFFERED_MEMBER_SIZE = 4 << 20
+
+
+def _safe_path(name):
+    # Первый компонент пути — корневой каталог архива GitHub вида owner-repo-sha
+    parts = name.split("/")[1:]
+    if not parts or any(part in ("", ".", "..") for part in parts) or os.path.isabs(name):
+        return None
+    return "/".join(parts)
+
+
+def _write_member(objects, full_path, relative_path, data, mode):
+    with open(full_path, 'wb') as file:
+        file.write(data)
+    if mode & 0o111:
+        os.chmod(full_path, mode & 0o777)
+    return relative_path, objects.write("blob", data), os.stat(full_path)
+
+
+def _write_large_member(objects, full_path, relative_path, source, size, mode):
+    def tee(file):
+        for chunk in read_chunks(source, STREAM_CHUNK):
+            file.write(chunk)
+            yield chunk
+
+    # Одна ограниченная по памяти копия: каждый кусок идёт и в рабочее дерево, и в объект
+    with open(full_path, 'wb') as file:
+        blob_hash = objects.write_stream("blob", size, tee(file))
+    if mode & 0o111:
+        os.chmod(full_path, mode & 0o777)
+    return relative_path, blob_hash, os.stat(full_path)
+
+
+def extract_tarball(fileobj, target, objects, jobs=None):
+    """Распаковывает tar.gz прямо из потока без временного файла, параллельно записывая файлы
+    в рабочее дерево и в хранилище объектов; возвращает [(relative_path, blob_hash, stat)]"""
+    jobs = jobs or os.cpu_count()
+    # Ограничиваем число прочитанных, но ещё не записанных файлов
+    slots = threading.BoundedSemaphore(jobs * 4)
+    futures = []
+    results = []
+
+    def release(_):
+        slots.release()
+
+    with tarfile.open(fileobj=fileobj, mode="r|gz", bufsize=STREAM_CHUNK) as archive, \
+            ThreadPoolExecutor(max_workers=jobs) as pool:
+        for member in archive:
+            relative_path = _safe_path(member.name)
+            if relative_path is None:
+                continue
+
+            full_path = os.path.join(target, relative_path)
+            if member.isdir():
+                os.makedirs(full_path, exist_ok=True)
+                continue
+            if not member.isfile():
+                continue
+
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            source = archive.extractfile(member)
+            if member.size > BUFFERED_MEMBER_SIZE:
+                results.append(_write_large_member(objects, full_path, relative_path, source, member.size, member.mode))
+                continue
+
+            data = source.read()
+            slots.acquire()
+            future = pool.submit(_write_member, objects, full_path, relative_path, data, member.mode)
+            future.add_done_callback(release)
+            futures.append(future)
+
+    results.extend(future.result() for future in futures)
+    results.sort()
+    return results
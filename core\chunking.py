@@ -0,0 +1,66 @@
+"""Разбиение больших файлов на части по содержимому (content-defined chunking).
+
+Кандидаты в границы ищутся на скорости C: каждый байт отображается в один бит псевдослучайной таблицей
+(bytes.translate), и bytes.find находит места, где биты последних байт совпали с коротким шаблоном, —
+такие есть в любом содержимом с разнообразными байтами, будь то текст, CSV или сжатые данные. В каждом
+кандидате граница ставится, если crc32 последних WINDOW байт делится на divisor; до среднего размера
+divisor больше, после — меньше, и размеры частей собираются вокруг среднего, как в FastCDC. Граница
+зависит только от соседних байт, поэтому вставка в начало файла сдвигает лишь ближайшие части, а
+остальные совпадают с прежними и дедуплицируются. Побайтовый gear-хеш на чистом Python в десятки раз
+медленнее хеширования, поэтому здесь не используется.
+"""
+import hashlib
+import zlib
+
+AVERAGE_CHUNK = 1 << 20
+MIN_CHUNK = AVERAGE_CHUNK // 4
+MAX_CHUNK = AVERAGE_CHUNK * 4
+WINDOW = 32
+
+# Бит каждого байта и шаблон неизменны, иначе границы частей в новых версиях не совпадут со старыми
+_TABLE = bytes(b"01"[hashlib.sha256(bytes([value])).digest()[0] & 1] for value in range(256))
+_CANDIDATE = b"011010"
+# В случайных данных кандидат встречается в среднем раз в 2 ** len(_CANDIDATE) байт
+CANDIDATE_SPACING = 1 << len(_CANDIDATE)
+
+
+def find_cut(data, minimum, limit, average):
+    """Длина первой части в data[:limit]: позиция после границы либо limit, если границы нет"""
+    if limit <= minimum:
+        return limit
+    candidates = max(1, (average - minimum) // CANDIDATE_SPACING)
+    strict, loose = 2 * candidates, max(1, candidates // 2)
+
+    start = max(0, minimum - len(_CANDIDATE))
+    stream = data[start:limit].translate(_TABLE)
+    pos = 0
+    while True:
+        pos = stream.find(_CANDIDATE, pos)
+        if pos < 0:
+            return limit
+        cut = start + pos + len(_CANDIDATE)
+        pos += 1
+        if cut < max(minimum, WINDOW):
+            continue
+        if zlib.crc32(data[cut - WINDOW:cut]) % (strict if cut < average else loose) == 0:
+            return cut
+
+
+def split_chunks(chunks, minimum=MIN_CHUNK, average=AVERAGE_CHUNK, maximum=MAX_CHUNK):
+    """Перенарезает поток байтов на части по содержимому; в памяти не больше maximum байт и одной входной порции"""
+    if not 0 < minimum < average < maximum:
+        raise Exception(f"Invalid chunk sizes: {minimum}, {average}, {maximum}")
+
+    buffer = bytearray()
+    for chunk in chunks:
+        buffer += chunk
+        # Режем только при полном окне поиска, чтобы границы не зависели от размера входных порций
+        while len(buffer) >= maximum:
+            cut = find_cut(buffer, minimum, maximum, average)
+            yield bytes(buffer[:cut])
+            del buffer[:cut]
+
+    while buffer:
+        cut = find_cut(buffer, minimum, len(buffer), average)
+        yield bytes(buffer[:cut])
+        del buffer[:cut]
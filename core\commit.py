@@ -0,0 +1,48 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+
+def make_signature(name, timestamp=None):
+    if timestamp is None:
+        timestamp = int(time.time())
+    if "<" not in name:
+        name = f"{name} <>"
+    return f"{name} {timestamp} {time.strftime('%z') or '+0000'}"
+
+
+def format_date(timestamp, offset):
+    """Дата в формате git log: Sat Oct 17 04:03:00 2026 +0300"""
+    sign = -1 if offset.startswith("-") else 1
+    delta = timedelta(hours=int(offset[1:3]), minutes=int(offset[3:5])) * sign
+    date = datetime.fromtimestamp(timestamp, timezone(delta))
+    return f"{date:%a %b} {date.day} {date:%H:%M:%S %Y} {offset}"
+
+
+def format_commit(tree, parents, author, message, committer=None):
+    lines = [f"tree {tree}"]
+    lines.extend(f"parent {parent}" for parent in parents)
+    lines.append(f"author {author}")
+    lines.append(f"committer {committer or author}")
+    return ("\n".join(lines) + "\n\n" + message + "\n").encode("utf-8")
+
+
+def parse_commit(data):
+    header, _, message = data.decode("utf-8").partition("\n\n")
+    commit = {"tree": None, "parents": [], "author": None, "committer": None, "message": message.rstrip("\n")}
+
+    for line in header.split("\n"):
+        key, _, value = line.partition(" ")
+        if key == "parent":
+            commit["parents"].append(value)
+        elif key in ("tree", "author", "committer"):
+            commit[key] = value
+
+    commit["timestamp"] = int(commit["committer"].rsplit(" ", 2)[1]) if commit["committer"] else 0
+    return commit
+
+
+def read_commit(objects, commit_hash):
+    obj_type, data = objects.read(commit_hash)
+    if obj_type != "commit":
+        raise Exception(f"Object {commit_hash} is not a commit")
+    return parse_commit(data)
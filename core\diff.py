@@ -0,0 +1,139 @@
+BINARY_CHECK_SIZE = 8000
+# Заглушка вместо содержимого большого файла: is_binary() считает её бинарной
+BIG_FILE = b"\0"
+
+
+def is_binary(data):
+    return b"\0" in data[:BINARY_CHECK_SIZE]
+
+
+# Дальше этой стоимости кратчайший скрипт не ищем, а делим участок по самой дальней точке (как GNU diff)
+MAX_COST = 256
+
+
+def _middle_snake(a, alo, ahi, b, blo, bhi):
+    """Средняя змейка Майерса (x, y, u, v) в линейной памяти: участок с x по u совпадает с участком с y по v"""
+    n, m = ahi - alo, bhi - blo
+    delta = n - m
+    odd = delta & 1
+    limit = min((n + m + 1) // 2, MAX_COST)
+    off = limit + 1
+    forward = [0] * (2 * off + 1)
+    backward = [0] * (2 * off + 1)
+
+    for d in range(limit + 1):
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and forward[off + k - 1] < forward[off + k + 1]):
+                x = forward[off + k + 1]
+            else:
+                x = forward[off + k - 1] + 1
+            y = x - k
+            start_x, start_y = x, y
+            while x < n and y < m and a[alo + x] == b[blo + y]:
+                x += 1
+                y += 1
+            forward[off + k] = x
+            if odd and -d < delta - k < d and x + backward[off + delta - k] >= n:
+                return alo + start_x, blo + start_y, alo + x, blo + y
+
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and backward[off + k - 1] < backward[off + k + 1]):
+                x = backward[off + k + 1]
+            else:
+                x = backward[off + k - 1] + 1
+            y = x - k
+            start_x, start_y = x, y
+            while x < n and y < m and a[ahi - 1 - x] == b[bhi - 1 - y]:
+                x += 1
+                y += 1
+            backward[off + k] = x
+            if not odd and -d <= delta - k <= d and x + forward[off + delta - k] >= n:
+                return ahi - x, bhi - y, ahi - start_x, bhi - start_y
+
+    # Правка слишком дорогая: режем по точке прямого прохода, дальше всех продвинувшейся к концу.
+    # Диагонали, ушедшие за границы участка, не годятся
+    x, y = max(
+        ((forward[off + k], forward[off + k] - k) for k in range(-limit, limit + 1, 2)
+         if forward[off + k] <= n and 0 <= forward[off + k] - k <= m),
+        key=sum,
+    )
+    return alo + x, blo + y, alo + x, blo + y
+
+
+def diff_lines(a, b):
+    """Скрипт правок по Майерсу: список ('=' | '-' | '+', i, j), O((N+M)D) по времени и O(N+M) по памяти"""
+    ops = []
+    # Участки разбираются по порядку: (alo, ahi, blo, bhi, совпадают ли они целиком)
+    stack = [(0, len(a), 0, len(b), False)]
+    while stack:
+        alo, ahi, blo, bhi, same = stack.pop()
+        if same:
+            ops.extend(("=", alo + i, blo + i) for i in range(ahi - alo))
+            continue
+
+        # Общие начало и конец отрезаем заранее: обычно правка затрагивает малую часть файла
+        while alo < ahi and blo < bhi and a[alo] == b[blo]:
+            ops.append(("=", alo, blo))
+            alo += 1
+            blo += 1
+        suffix = 0
+        while suffix < min(ahi - alo, bhi - blo) and a[ahi - 1 - suffix] == b[bhi - 1 - suffix]:
+            suffix += 1
+        if suffix:
+            stack.append((ahi - suffix, ahi, bhi - suffix, bhi, True))
+            ahi -= suffix
+            bhi -= suffix
+
+        if alo == ahi or blo == bhi:
+            ops.extend(("-", i, blo) for i in range(alo, ahi))
+            ops.extend(("+", ahi, j) for j in range(blo, bhi))
+            continue
+
+        x, y, u, v = _middle_snake(a, alo, ahi, b, blo, bhi)
+        stack.append((u, ahi, v, bhi, False))
+        stack.append((x, u, y, v, True))
+        stack.append((alo, x, blo, y, False))
+    return ops
+
+
+def _line(prefix, line):
+    if line.endswith("\n"):
+        return prefix + line
+    return prefix + line + "\n\\ No newline at end of file\n"
+
+
+def unified_diff(a, b, context=3):
+    """Построчно отдаёт ханки в формате unified diff для списков строк a и b"""
+    ops = diff_lines(a, b)
+    changes = [i for i, op in enumerate(ops) if op[0] != "="]
+    if not changes:
+        return
+
+    # Объединяем изменения, между которыми не больше 2*context общих строк
+    groups = []
+    start = end = changes[0]
+    for i in changes[1:]:
+        if i - end > 2 * context:
+            groups.append((start, end))
+            start = i
+        end = i
+    groups.append((start, end))
+
+    for start, end in groups:
+        hunk = ops[max(0, start - context):min(len(ops), end + context + 1)]
+        a_start = next((i for tag, i, _ in hunk if tag != "+"), None)
+        b_start = next((j for tag, _, j in hunk if tag != "-"), None)
+        a_len = sum(1 for op in hunk if op[0] != "+")
+        b_len = sum(1 for op in hunk if op[0] != "-")
+        # Для пустого диапазона unified diff указывает строку перед ним
+        a_start = a_start + 1 if a_len else hunk[0][1]
+        b_start = b_start + 1 if b_len else hunk[0][2]
+
+        yield f"@@ -{a_start},{a_len} +{b_start},{b_len} @@\n"
+        for tag, i, j in hunk:
+            if tag == "=":
+                yield _line(" ", a[i])
+            elif tag == "-":
+                yield _line("-", a[i])
+            else:
+                yield _line("+", b[j])
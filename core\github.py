@@ -0,0 +1,342 @@
+import base64
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from core.trace import span
+
+API_URL = os.environ.get("GITX_GITHUB_API", "https://api.github.com")
+PUSH_JOBS = 8
+MAX_RETRIES = int(os.environ.get("GITX_GITHUB_RETRIES") or 6)
+# Дольше этого ждать сброса лимита не будем: push завершится ошибкой, а журнал позволит продолжить позже
+MAX_WAIT = float(os.environ.get("GITX_GITHUB_MAX_WAIT") or 900)
+# Недостижимые блобы GitHub со временем удаляет, поэтому старый журнал не используем
+JOURNAL_TTL = 24 * 3600
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+RETRY_STATUSES = (500, 502, 503, 504)
+
+
+class RequestScheduler:
+    """Общий для потоков клиента регулятор запросов по лимитам GitHub.
+
+    Ответ 403/429 из-за лимита ставит на паузу все потоки: до Retry-After, до X-RateLimit-Reset
+    или на экспоненциальную задержку со случайным разбросом — и вдвое сокращает число одновременных
+    запросов (AIMD). Каждая серия успешных ответов снова добавляет по одному.
+    """
+
+    def __init__(self, concurrency, retries=MAX_RETRIES, max_wait=MAX_WAIT):
+        self.retries = retries
+        self.max_wait = max_wait
+        self.max_concurrency = max(1, concurrency)
+        self.concurrency = self.max_concurrency
+        self.__active = 0
+        self.__successes = 0
+        self.__resume_at = 0.0
+        self.__condition = threading.Condition()
+
+    def acquire(self):
+        with self.__condition:
+            while True:
+                delay = self.__resume_at - time.time()
+                if delay <= 0 and self.__active < self.concurrency:
+                    self.__active += 1
+                    return
+                self.__condition.wait(delay if delay > 0 else None)
+
+    def release(self, throttled=False):
+        with self.__condition:
+            self.__active -= 1
+            if throttled:
+                self.concurrency = max(1, self.concurrency // 2)
+                self.__successes = 0
+            else:
+                self.__successes += 1
+                if self.__successes >= self.concurrency and self.concurrency < self.max_concurrency:
+                    self.concurrency += 1
+                    self.__successes = 0
+            self.__condition.notify_all()
+
+    def backoff(self, attempt):
+        return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+    def is_throttled(self, response):
+        """Ответ об исчерпанном первичном или вторичном лимите, а не об отказе в доступе"""
+        if response.status_code == 429:
+            return True
+        if response.status_code != 403:
+            return False
+        if "Retry-After" in response.headers or response.headers.get("X-RateLimit-Remaining") == "0":
+            return True
+        try:
+            return "rate limit" in response.json().get("message", "").lower()
+        except ValueError:
+            return False
+
+    def throttle(self, response, attempt):
+        """Ставит паузу для всех потоков и возвращает её длительность"""
+        headers = response.headers
+        if "Retry-After" in headers:
+            delay = float(headers["Retry-After"])
+        elif headers.get("X-RateLimit-Remaining") == "0" and "X-RateLimit-Reset" in headers:
+            delay = max(0.0, int(headers["X-RateLimit-Reset"]) - time.time()) + 1
+        else:
+            delay = self.backoff(attempt)
+        if delay > self.max_wait:
+            raise Exception(f"GitHub rate limit exceeded, retry in {int(delay)}s")
+
+        with self.__condition:
+            self.__resume_at = max(self.__resume_at, time.time() + delay)
+        return delay
+
+    def observe(self, response):
+        """Исчерпанный лимит ставит паузу до его сброса, не дожидаясь отказа сервера"""
+        remaining = response.headers.get("X-RateLimit-Remaining")
+        reset = response.headers.get("X-RateLimit-Reset", "")
+        if remaining == "0" and reset.isdigit():
+            delay = int(reset) - time.time() + 1
+            if 0 < delay <= self.max_wait:
+                with self.__condition:
+                    self.__resume_at = max(self.__resume_at, time.time() + delay)
+
+
+class UploadJournal:
+    """Журнал уже загруженных на GitHub блобов: строка на sha, дописывается сразу после ответа.
+
+    sha блоба на GitHub совпадает с локальным, поэтому прерванный push при повторе пропускает
+    их загрузку. Журнал удаляется после успешного обновления ветки.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.__lock = threading.Lock()
+        self.__file = None
+        self.uploaded = set()
+        if os.path.exists(path) and time.time() - os.path.getmtime(path) > JOURNAL_TTL:
+            os.remove(path)
+        if os.path.exists(path):
+            with open(path) as file:
+                self.uploaded = {line.strip() for line in file if len(line.strip()) == 40}
+
+    def record(self, sha):
+        with self.__lock:
+            if self.__file is None:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                self.__file = open(self.path, "a")
+            self.__file.write(sha + "\n")
+            self.__file.flush()
+            self.uploaded.add(sha)
+
+    def close(self):
+        with self.__lock:
+            if self.__file is not None:
+                self.__file.close()
+                self.__file = None
+
+    def clear(self):
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.uploaded = set()
+
+
+class _BlobBody:
+    """JSON-тело POST git/blobs, кодирующее блоб в base64 по частям во время отправки.
+
+    Длина известна заранее, поэтому запрос уходит с Content-Length, а не chunked; каждая итерация
+    читает объект заново, так что тело можно отправить повторно.
+    """
+    PREFIX = b'{"encoding": "base64", "content": "'
+    SUFFIX = b'"}'
+
+    def __init__(self, objects, blob_hash, size):
+        self.objects = objects
+        self.blob_hash = blob_hash
+        self.size = size
+
+    def __len__(self):
+        return len(self.PREFIX) + (self.size + 2) // 3 * 4 + len(self.SUFFIX)
+
+    def __iter__(self):
+        yield self.PREFIX
+        rest = b""
+        for chunk in self.objects.stream(self.blob_hash)[2]:
+            data = rest + chunk
+            # base64 кодирует тройки байт, остаток переносим в следующую порцию
+            cut = len(data) - len(data) % 3
+            yield base64.b64encode(data[:cut])
+            rest = data[cut:]
+        yield base64.b64encode(rest)
+        yield self.SUFFIX
+
+
+class GitHubClient:
+    """Клиент Git Data API на одной requests.Session: соединения и заголовки переиспользуются между запросами"""
+
+    def __init__(self, owner, repo, token=None, jobs=PUSH_JOBS, api_url=API_URL, journal=None):
+        self.base_url = f"{api_url}/repos/{owner}/{repo}"
+        self.jobs = jobs
+        self.empty = False
+        self.journal = journal
+        self.scheduler = RequestScheduler(jobs)
+
+        self.session = requests.Session()
+        # Пул на все потоки загрузки, чтобы параллельные запросы не открывали новые TLS-соединения
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=jobs)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers["Accept"] = "application/vnd.github.v3+json"
+        if token:
+            self.session.headers["Authorization"] = f"token {token}"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.session.close()
+
+    def __send(self, method, url, **kwargs):
+        """Единая точка всех запросов: лимиты и повторы через scheduler, span со статусом и объёмом тела"""
+        path = url[len(self.base_url):] or "/"
+        # PUT contents создаёт коммит, поэтому после обрыва связи или 5xx его не повторяем;
+        # остальные запросы Git Data API адресуются содержимым и повторяются безопасно
+        idempotent = method != "PUT"
+        attempt = 0
+        while True:
+            self.scheduler.acquire()
+            throttled = False
+            try:
+                with span("http.request", method=method, path=path, attempt=attempt) as request_span:
+                    response = self.session.request(method, url, **kwargs)
+                    # Потоковое тело ещё не прочитано — берём объём из заголовка
+                    received = response.headers.get("Content-Length") if kwargs.get("stream") else len(response.content)
+                    request_span.set(
+                        status=response.status_code, sent=len(response.request.body or b""), received=received
+                    )
+                self.scheduler.observe(response)
+                throttled = self.scheduler.is_throttled(response)
+            except requests.ConnectionError:
+                if not idempotent or attempt >= self.scheduler.retries:
+                    raise
+                response = None
+            finally:
+                self.scheduler.release(throttled)
+
+            if attempt >= self.scheduler.retries:
+                return response
+            if throttled:
+                delay = self.scheduler.throttle(response, attempt)
+                if delay >= 5:
+                    print(f"GitHub rate limit reached, waiting {int(delay)}s")
+            elif response is None or (idempotent and response.status_code in RETRY_STATUSES):
+                time.sleep(self.scheduler.backoff(attempt))
+            else:
+                return response
+            if response is not None:
+                response.close()
+            attempt += 1
+
+    def __raise_for(self, response):
+        try:
+            message = response.json().get('message', f"HTTP {response.status_code}")
+        except ValueError:
+            message = f"HTTP {response.status_code}"
+        raise Exception(message)
+
+    def request(self, method, path, data=None):
+        response = self.__send(method, f"{self.base_url}/{path}", json=data)
+        if response.status_code in [200, 201]:
+            return response.json() if response.content else None
+        self.__raise_for(response)
+
+    def get_repository(self):
+        response = self.__send("GET", self.base_url)
+        if response.status_code == 200:
+            return response.json()
+        self.__raise_for(response)
+
+    def open_tarball(self, ref):
+        """Открывает архив ревизии потоком; тело не читается в память и не сохраняется на диск"""
+        response = self.__send("GET", f"{self.base_url}/tarball/{ref}", stream=True)
+        if response.status_code != 200:
+            self.__raise_for(response)
+        response.raw.decode_content = True
+        return response
+
+    def get_ref(self, branch):
+        """Возвращает sha коммита ветки или None; для пустого репозитория выставляет self.empty"""
+        response = self.__send("GET", f"{self.base_url}/git/ref/heads/{branch}")
+        if response.status_code == 200:
+            return response.json()["object"]["sha"]
+        if response.status_code in [404, 409]:
+            # 409 GitHub отвечает на любые запросы Git Data API к пустому репозиторию
+            self.empty = response.status_code == 409
+            return None
+        self.__raise_for(response)
+
+    def get_commit(self, sha):
+        return self.request("GET", f"git/commits/{sha}")
+
+    def get_tree(self, sha):
+        """Записи дерева без рекурсии как (mode, name, sha) в формате локальных деревьев"""
+        entries = self.request("GET", f"git/trees/{sha}")["tree"]
+        return [(entry["mode"].lstrip("0"), entry["path"], entry["sha"]) for entry in entries]
+
+    def put_file(self, path, content, message, branch):
+        return self.request("PUT", f"contents/{path}", {
+            "message": message,
+            "content": base64.b64encode(content).decode('utf-8'),
+            "branch": branch
+        })
+
+    def create_blob(self, content):
+        return self.request("POST", "git/blobs", {
+            "content": base64.b64encode(content).decode('utf-8'),
+            "encoding": "base64"
+        })["sha"]
+
+    def create_blob_stream(self, objects, blob_hash, size):
+        """Как create_blob, но ни содержимое, ни его base64 не собираются в памяти целиком"""
+        response = self.__send("POST", f"{self.base_url}/git/blobs", data=_BlobBody(objects, blob_hash, size),
+                               headers={"Content-Type": "application/json"})
+        if response.status_code in [200, 201]:
+            return response.json()["sha"]
+        self.__raise_for(response)
+
+    def upload_blobs(self, objects, blob_hashes):
+        """Загружает блобы параллельно, не больше self.jobs одновременно; содержимое читается внутри задачи.
+        Блобы из журнала прерванного push не загружаются повторно"""
+        def upload(blob_hash):
+            if self.journal is not None and blob_hash in self.journal.uploaded:
+                return blob_hash
+            _, size = objects.info(blob_hash)
+            if size >= objects.large_file_threshold:
+                sha = self.create_blob_stream(objects, blob_hash, size)
+            else:
+                sha = self.create_blob(objects.read(blob_hash)[1])
+            if self.journal is not None and sha == blob_hash:
+                self.journal.record(sha)
+            return sha
+
+        blob_hashes = list(dict.fromkeys(blob_hashes))
+        with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            return dict(zip(blob_hashes, pool.map(upload, blob_hashes)))
+
+    def create_tree(self, tree_data, base_tree=None):
+        data = {"tree": tree_data}
+        if base_tree:
+            data["base_tree"] = base_tree
+        return self.request("POST", "git/trees", data)["sha"]
+
+    def create_commit(self, message, tree, parents):
+        return self.request("POST", "git/commits", {"message": message, "tree": tree, "parents": parents})["sha"]
+
+    def set_ref(self, branch, sha, exists, force=False):
+        if exists:
+            return self.request("PATCH", f"git/refs/heads/{branch}", {"sha": sha, "force": force})
+        return self.request("POST", "git/refs", {"ref": f"refs/heads/{branch}", "sha": sha})
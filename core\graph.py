@@ -0,0 +1,367 @@
+import hashlib
+import heapq
+import mmap
+import os
+import struct
+
+from core.commit import read_commit
+
+SIGNATURE = b"GXCG"
+VERSION = 2
+# Заголовок слоя: сигнатура, версия, число коммитов в нижних слоях, число коммитов, число дополнительных рёбер
+HEADER = struct.Struct(">4sIIII")
+FANOUT = struct.Struct(">256I")
+# Запись фиксированной длины: дерево, первый родитель, второй родитель, поколение, время коммита
+RECORD = struct.Struct(">20sIIIQ")
+EDGE = struct.Struct(">I")
+# Как в commit-graph git: нет родителя / второе поле ссылается на список рёбер octopus-слияния
+PARENT_NONE = 0x70000000
+PARENT_EXTRA = 0x80000000
+LAST_EDGE = 0x80000000
+# Как split commit-graph в git: граф — цепочка слоёв, новые коммиты дописываются новым верхним слоем
+CHAIN = "commit-graph-chain"
+# Верхний слой сливается с нижним, когда становится больше его половины: слоёв O(log n), а каждый
+# коммит переписывается O(log n) раз
+MERGE_FACTOR = 2
+# Так назывался файл до разбиения на слои; по этому пути свой commit-graph читает git
+LEGACY_GRAPH = "commit-graph"
+
+
+class _GraphLayer:
+    """Один файл цепочки: отсортированные id коммитов и записи; позиции родителей — сквозные по всей цепочке"""
+
+    def __init__(self, path, base):
+        self.path = path
+        with open(path, 'rb') as file:
+            self.data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        signature, version, self.base, self.count, extra = HEADER.unpack_from(self.data, 0)
+        if signature != SIGNATURE or version != VERSION:
+            raise Exception(f"Unsupported commit-graph format in {path}")
+        if self.base != base:
+            raise Exception(f"Commit-graph chain is inconsistent at {path}")
+
+        self.fanout = FANOUT.unpack_from(self.data, HEADER.size)
+        self.oid_offset = HEADER.size + FANOUT.size
+        self.record_offset = self.oid_offset + 20 * self.count
+        self.edge_offset = self.record_offset + RECORD.size * self.count
+        if len(self.data) != self.edge_offset + EDGE.size * extra + 20:
+            raise Exception(f"Corrupted commit-graph {path}")
+
+    def lookup(self, sha):
+        low = self.fanout[sha[0] - 1] if sha[0] else 0
+        high = self.fanout[sha[0]]
+        while low < high:
+            middle = (low + high) // 2
+            start = self.oid_offset + 20 * middle
+            current = self.data[start:start + 20]
+            if current < sha:
+                low = middle + 1
+            elif current > sha:
+                high = middle
+            else:
+                return middle
+        return None
+
+    def oid(self, index):
+        start = self.oid_offset + 20 * index
+        return self.data[start:start + 20].hex()
+
+
+class CommitGraph:
+    """Бинарный кэш истории: коммиты по позициям с деревьями, родителями, поколениями и временем.
+    Хранится в каталоге цепочкой слоёв; позиция коммита — его номер в слое плюс число коммитов в нижних слоях"""
+
+    def __init__(self, path, names=None):
+        self.path = path
+        self.count = 0
+        self.layers = []
+        chain_path = os.path.join(path, CHAIN)
+        if names is None and os.path.exists(chain_path):
+            with open(chain_path) as file:
+                names = file.read().split()
+        for name in names or []:
+            self.layers.append(_GraphLayer(os.path.join(path, name), self.count))
+            self.count += self.layers[-1].count
+
+    def close(self):
+        for layer in self.layers:
+            layer.data.close()
+        self.layers = []
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, oid):
+        return self.lookup(oid) is not None
+
+    def __layer(self, position):
+        # Слоёв O(log n), так что линейный поиск сверху вниз дешевле бинарного
+        for layer in reversed(self.layers):
+            if position >= layer.base:
+                return layer, position - layer.base
+        raise IndexError(position)
+
+    def lookup(self, oid):
+        """Позиция коммита в графе или None — бинарный поиск по отсортированным id каждого слоя"""
+        sha = bytes.fromhex(oid)
+        for layer in self.layers:
+            index = layer.lookup(sha)
+            if index is not None:
+                return layer.base + index
+        return None
+
+    def find_prefix(self, prefix):
+        """Позиции коммитов, чей id начинается с prefix; больше двух не ищем — этого хватает для проверки однозначности"""
+        matches = []
+        for layer in self.layers:
+            low, high = 0, layer.count
+            while low < high:
+                middle = (low + high) // 2
+                if layer.oid(middle) < prefix:
+                    low = middle + 1
+                else:
+                    high = middle
+            found = 0
+            while low < layer.count and found < 2 and layer.oid(low).startswith(prefix):
+                matches.append(layer.base + low)
+                low += 1
+                found += 1
+        return sorted(matches, key=self.oid)[:2]
+
+    def oid(self, position):
+        layer, index = self.__layer(position)
+        return layer.oid(index)
+
+    def __record(self, position):
+        layer, index = self.__layer(position)
+        return layer, RECORD.unpack_from(layer.data, layer.record_offset + RECORD.size * index)
+
+    def tree(self, position):
+        return self.__record(position)[1][0].hex()
+
+    def generation(self, position):
+        return self.__record(position)[1][3]
+
+    def timestamp(self, position):
+        return self.__record(position)[1][4]
+
+    def parents(self, position):
+        layer, (_, first, second, _, _) = self.__record(position)
+        parents = []
+        if first != PARENT_NONE:
+            parents.append(first)
+        if second & PARENT_EXTRA and second != PARENT_NONE:
+            edge = second & ~PARENT_EXTRA
+            while True:
+                value = EDGE.unpack_from(layer.data, layer.edge_offset + EDGE.size * edge)[0]
+                parents.append(value & ~LAST_EDGE)
+                if value & LAST_EDGE:
+                    break
+                edge += 1
+        elif second != PARENT_NONE:
+            parents.append(second)
+        return parents
+
+
+def _write_layer(directory, base, commits):
+    """Пишет слой поверх base (CommitGraph нижних слоёв) для commits: {oid: (tree, [parent oids], timestamp)}.
+    Родители ищутся в слое и в base, остальные отбрасываются; возвращает имя файла"""
+    order = sorted(commits)
+    positions = {oid: len(base) + index for index, oid in enumerate(order)}
+
+    def position(oid):
+        return positions[oid] if oid in positions else base.lookup(oid)
+
+    # Поколение — 1 + максимум по родителям; считаем обходом в глубину без рекурсии
+    generations = {}
+    for start in order:
+        stack = [start]
+        while stack:
+            current = stack[-1]
+            if current in generations:
+                stack.pop()
+                continue
+            pending = [parent for parent in commits[current][1] if parent in commits and parent not in generations]
+            if pending:
+                stack.extend(pending)
+                continue
+            stack.pop()
+            generations[current] = 1 + max((
+                generations[parent] if parent in commits else base.generation(base.lookup(parent))
+                for parent in commits[current][1] if parent in commits or parent in base
+            ), default=0)
+
+    fanout = [0] * 256
+    for oid in order:
+        fanout[int(oid[:2], 16)] += 1
+    for byte in range(1, 256):
+        fanout[byte] += fanout[byte - 1]
+
+    records = []
+    edges = []
+    for oid in order:
+        tree, parents, timestamp = commits[oid]
+        parent_positions = [p for p in map(position, parents) if p is not None]
+        first = parent_positions[0] if parent_positions else PARENT_NONE
+        if len(parent_positions) > 2:
+            second = PARENT_EXTRA | len(edges)
+            edges.extend(parent_positions[1:-1])
+            edges.append(parent_positions[-1] | LAST_EDGE)
+        else:
+            second = parent_positions[1] if len(parent_positions) == 2 else PARENT_NONE
+        records.append(RECORD.pack(bytes.fromhex(tree), first, second, generations[oid], timestamp))
+
+    body = b"".join([
+        HEADER.pack(SIGNATURE, VERSION, len(base), len(order), len(edges)),
+        FANOUT.pack(*fanout),
+        b"".join(bytes.fromhex(oid) for oid in order),
+        b"".join(records),
+        b"".join(EDGE.pack(edge) for edge in edges),
+    ])
+    checksum = hashlib.sha1(body).digest()
+
+    name = f"graph-{checksum.hex()}.graph"
+    tmp_path = os.path.join(directory, f"{name}.lock")
+    with open(tmp_path, 'wb') as file:
+        file.write(body)
+        file.write(checksum)
+    os.replace(tmp_path, os.path.join(directory, name))
+    return name
+
+
+def _layer_commits(graph, layers):
+    """Коммиты из заданных слоёв графа в виде словаря для _write_layer"""
+    return {
+        graph.oid(position): (graph.tree(position), [graph.oid(p) for p in graph.parents(position)],
+                              graph.timestamp(position))
+        for layer in layers for position in range(layer.base, layer.base + layer.count)
+    }
+
+
+def update_commit_graph(objects, path, tips, graph=None, compact=False):
+    """Дописывает в граф коммиты, достижимые из tips, новым верхним слоем; разбираются только объекты,
+    которых в графе ещё нет. Слои, меньшие нового больше чем вдвое, сливаются с ним; compact сводит всё в один слой"""
+    if graph is None:
+        graph = CommitGraph(path)
+    new = {}
+    pending = [tip for tip in tips if tip]
+    while pending:
+        current = pending.pop()
+        if current in new or current in graph or not objects.exists(current):
+            continue
+        commit_data = read_commit(objects, current)
+        new[current] = (commit_data["tree"], commit_data["parents"], commit_data["timestamp"])
+        pending.extend(commit_data["parents"])
+
+    if not new and not (compact and len(graph.layers) > 1):
+        return graph
+
+    # Переписываются только верхние слои, сравнимые по размеру с добавляемыми коммитами
+    keep = len(graph.layers)
+    size = len(new)
+    while keep and (compact or graph.layers[keep - 1].count <= MERGE_FACTOR * size):
+        keep -= 1
+        size += graph.layers[keep].count
+    merged = graph.layers[keep:]
+    new.update(_layer_commits(graph, merged))
+
+    names = [os.path.basename(layer.path) for layer in graph.layers[:keep]]
+    base = CommitGraph(path, names)
+    os.makedirs(path, exist_ok=True)
+    names.append(_write_layer(path, base, new))
+    base.close()
+    graph.close()
+
+    chain_path = os.path.join(path, CHAIN)
+    with open(f"{chain_path}.lock", "w") as file:
+        file.write("".join(f"{name}\n" for name in names))
+    os.replace(f"{chain_path}.lock", chain_path)
+
+    # Слитые слои больше не нужны; открытый в другом процессе файл Windows удалить не даст — уберёт следующий раз
+    for filename in os.listdir(path):
+        if filename.endswith(".graph") and filename not in names:
+            try:
+                os.remove(os.path.join(path, filename))
+            except OSError:
+                pass
+    return CommitGraph(path)
+
+
+def remove_legacy_graph(info_dir):
+    """Удаляет commit-graph прежнего формата gitx: по этому пути git ищет свой файл и не может его прочитать"""
+    legacy_path = os.path.join(info_dir, LEGACY_GRAPH)
+    try:
+        with open(legacy_path, 'rb') as file:
+            if file.read(len(SIGNATURE)) != SIGNATURE:
+                return
+    except FileNotFoundError:
+        return
+    os.remove(legacy_path)
+
+
+def walk_commits(graph, tips):
+    """Позиции коммитов, достижимых из tips, от новых к старым"""
+    heap = [(-graph.timestamp(position), -graph.generation(position), position) for position in set(tips)]
+    heapq.heapify(heap)
+    seen = set(tips)
+    while heap:
+        _, _, position = heapq.heappop(heap)
+        yield position
+        for parent in graph.parents(position):
+            if parent not in seen:
+                seen.add(parent)
+                heapq.heappush(heap, (-graph.timestamp(parent), -graph.generation(parent), parent))
+
+
+def is_ancestor(graph, ancestor, descendant):
+    """Достижим ли ancestor из descendant; ветки с поколением ниже, чем у ancestor, не обходятся"""
+    floor = graph.generation(ancestor)
+    pending = [descendant]
+    seen = set()
+    while pending:
+        position = pending.pop()
+        if position == ancestor:
+            return True
+        if position in seen or graph.generation(position) <= floor:
+            continue
+        seen.add(position)
+        pending.extend(graph.parents(position))
+    return False
+
+
+def merge_bases(graph, first, second):
+    """Лучшие общие предки двух коммитов: обход от обоих по убыванию поколения с раскраской"""
+    if first == second:
+        return [first]
+
+    FIRST, SECOND, STALE = 1, 2, 4
+    flags = {first: FIRST, second: SECOND}
+    heap = [(-graph.generation(first), first), (-graph.generation(second), second)]
+    heapq.heapify(heap)
+    result = []
+    # Пока в очереди есть не помеченные STALE коммиты, ещё могут найтись общие предки; их число
+    # ведём по ходу обхода. Родитель, получивший флаги, всегда ещё в очереди: его поколение ниже
+    active = 2
+
+    while active:
+        _, position = heapq.heappop(heap)
+        state = flags[position]
+        if not state & STALE:
+            active -= 1
+        if state & (FIRST | SECOND) == FIRST | SECOND and not state & STALE:
+            result.append(position)
+            state |= STALE
+        for parent in graph.parents(position):
+            parent_state = flags.get(parent, 0)
+            if parent_state | state != parent_state:
+                if parent_state == 0:
+                    heapq.heappush(heap, (-graph.generation(parent), parent))
+                    active += 1
+                if state & STALE and not parent_state & STALE:
+                    active -= 1
+                flags[parent] = parent_state | state
+
+    # Общий предок, достижимый из другого найденного, — не лучший
+    return [base for base in result if not any(other != base and is_ancestor(graph, base, other) for other in result)]
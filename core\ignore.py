@@ -0,0 +1,129 @@
+import re
+
+DEFAULT_PATTERNS = ['.gitx/', '__pycache__/', '*.pyc', '.git']
+
+
+def translate(pattern):
+    """Переводит glob-шаблон gitignore в регулярное выражение для пути с '/'"""
+    out = []
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if c == '*':
+            if pattern.startswith('**', i) and (i == 0 or pattern[i - 1] == '/'):
+                if pattern.startswith('**/', i):
+                    out.append('(?:.*/)?')
+                    i += 3
+                    continue
+                if i + 2 == n:
+                    out.append('.*')
+                    i += 2
+                    continue
+            while i < n and pattern[i] == '*':
+                i += 1
+            out.append('[^/]*')
+            continue
+        if c == '?':
+            out.append('[^/]')
+        elif c == '[':
+            j = i + 1
+            if j < n and pattern[j] == '!':
+                j += 1
+            if j < n and pattern[j] == ']':
+                j += 1
+            j = pattern.find(']', j)
+            if j == -1:
+                out.append('\\[')
+            else:
+                body = pattern[i + 1:j].replace('\\', '\\\\')
+                if body.startswith('!'):
+                    body = '^' + body[1:]
+                out.append(f'[{body}]')
+                i = j
+        elif c == '\\' and i + 1 < n:
+            i += 1
+            out.append(re.escape(pattern[i]))
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return ''.join(out)
+
+
+def parse_pattern(line, base=""):
+    """Возвращает (regex, negate, dir_only) или None для пустых строк и комментариев"""
+    line = line.rstrip()
+    if not line or line.startswith('#'):
+        return None
+
+    negate = line.startswith('!')
+    if negate:
+        line = line[1:]
+    elif line.startswith('\\'):
+        line = line[1:]
+
+    dir_only = line.endswith('/')
+    line = line.rstrip('/')
+    if not line:
+        return None
+
+    # Шаблон со слэшем в начале или середине привязан к каталогу, где он объявлен
+    anchored = '/' in line
+    regex = translate(line.lstrip('/'))
+    if not anchored:
+        regex = '(?:.*/)?' + regex
+    if base:
+        regex = re.escape(base) + '/' + regex
+    return regex, negate, dir_only
+
+
+class IgnoreMatcher:
+    """Все шаблоны компилируются в одно регулярное выражение; как в git, побеждает последний совпавший"""
+
+    def __init__(self, patterns=()):
+        self.__rules = []
+        self.__compiled = None
+        self.__loaded_files = set()
+        self.add_patterns(patterns)
+
+    def add_file(self, filepath, base=""):
+        if filepath in self.__loaded_files:
+            return
+        self.__loaded_files.add(filepath)
+        with open(filepath, 'r', encoding='utf-8') as f:
+            self.add_patterns(f.read().splitlines(), base)
+
+    def add_patterns(self, patterns, base=""):
+        for line in patterns:
+            rule = parse_pattern(line, base)
+            if rule:
+                self.__rules.append(rule)
+        self.__compiled = None
+
+    def __build(self, rules):
+        if not rules:
+            return None, ()
+        # Альтернативы перебираются слева направо, поэтому последние шаблоны ставим первыми
+        rules = list(reversed(rules))
+        regex = re.compile('|'.join(f'({rule[0]})' for rule in rules), re.DOTALL)
+        return regex, tuple(rule[1] for rule in rules)
+
+    def match(self, path, is_dir=False):
+        """Проверяет сам путь, считая, что его родительские каталоги уже проверены"""
+        if self.__compiled is None:
+            self.__compiled = (
+                self.__build([rule for rule in self.__rules if not rule[2]]),
+                self.__build(self.__rules)
+            )
+
+        regex, negations = self.__compiled[1] if is_dir else self.__compiled[0]
+        if regex is None:
+            return False
+        match = regex.fullmatch(path)
+        return match is not None and not negations[match.lastindex - 1]
+
+    def is_ignored(self, path, is_dir=False):
+        parts = path.split('/')
+        for i in range(1, len(parts)):
+            if self.match('/'.join(parts[:i]), True):
+                return True
+        return self.match(path, is_dir)
@@ -0,0 +1,212 @@
+import hashlib
+import mmap
+import os
+import struct
+
+from core.trace import span
+
+SIGNATURE = b"GXIX"
+VERSION = 1
+
+# signature, version, количество записей
+HEADER = struct.Struct(">4sII")
+# sha1, mode, size, mtime_ns, inode, длина пути
+ENTRY = struct.Struct(">20sIQqQH")
+# сигнатура расширения, длина данных
+EXTENSION = struct.Struct(">4sI")
+# sha1 дерева, длина пути каталога
+TREE_ENTRY = struct.Struct(">20sH")
+TREE_EXTENSION = b"TREE"
+# Токен gitx daemon и пути, которые на момент токена отличались от индекса или не отслеживались
+MONITOR_EXTENSION = b"FSMN"
+
+
+class IndexEntry:
+    __slots__ = ("hash", "mode", "size", "mtime_ns", "ino", "record")
+
+    def __init__(self, hash, mode, size, mtime_ns, ino):
+        self.hash = hash
+        self.mode = mode
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.ino = ino
+        self.record = None
+
+    @classmethod
+    def from_stat(cls, hash, st):
+        return cls(hash, st.st_mode, st.st_size, st.st_mtime_ns, st.st_ino)
+
+    def matches(self, st):
+        return (self.size == st.st_size and self.mtime_ns == st.st_mtime_ns
+                and self.ino == st.st_ino and self.mode == st.st_mode & 0xFFFFFFFF)
+
+    @property
+    def git_mode(self):
+        return "100755" if self.mode & 0o111 else "100644"
+
+    def pack(self, path):
+        if self.record is None:
+            encoded = path.encode("utf-8")
+            self.record = ENTRY.pack(
+                bytes.fromhex(self.hash), self.mode & 0xFFFFFFFF, self.size,
+                self.mtime_ns, self.ino, len(encoded)
+            ) + encoded
+        return self.record
+
+
+class Index:
+    """Компактный бинарный индекс: путь, id объекта и stat-данные файла"""
+
+    def __init__(self, path):
+        self.path = path
+        self.__entries = {}
+        # Кэш id деревьев по каталогам: пока в каталоге ничего не менялось, его дерево переиспользуется
+        self.trees = {}
+        self.monitor_token = None
+        self.monitor_dirty = ()
+        self.__dirty = False
+        self.mtime_ns = 0
+        self.__load()
+
+    def __load(self):
+        if not os.path.exists(self.path):
+            return
+
+        with open(self.path, "rb") as file:
+            st = os.fstat(file.fileno())
+            self.mtime_ns = st.st_mtime_ns
+            if st.st_size < HEADER.size + 20:
+                raise Exception(f"Corrupted index file {self.path}")
+
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                self.__parse(data)
+
+    def __parse(self, data):
+        body_end = len(data) - 20
+        if hashlib.sha1(data[:body_end]).digest() != data[body_end:]:
+            raise Exception(f"Index checksum mismatch in {self.path}")
+
+        signature, version, count = HEADER.unpack_from(data, 0)
+        if signature != SIGNATURE or version != VERSION:
+            raise Exception(f"Unsupported index format in {self.path}")
+
+        offset = HEADER.size
+        for _ in range(count):
+            sha, mode, size, mtime_ns, ino, path_len = ENTRY.unpack_from(data, offset)
+            end = offset + ENTRY.size + path_len
+            path = data[offset + ENTRY.size:end].decode("utf-8")
+
+            entry = IndexEntry(sha.hex(), mode, size, mtime_ns, ino)
+            # Запоминаем исходную запись, чтобы не упаковывать неизменённые заново
+            entry.record = data[offset:end]
+            self.__entries[path] = entry
+            offset = end
+
+        while offset < body_end:
+            signature, length = EXTENSION.unpack_from(data, offset)
+            offset += EXTENSION.size
+            if signature == TREE_EXTENSION:
+                self.__parse_trees(data, offset, offset + length)
+            elif signature == MONITOR_EXTENSION:
+                token, *paths = data[offset:offset + length].decode("utf-8").split("\0")
+                self.monitor_token = token
+                self.monitor_dirty = tuple(paths)
+            # Неизвестные расширения пропускаем
+            offset += length
+
+    def __parse_trees(self, data, offset, end):
+        while offset < end:
+            sha, path_len = TREE_ENTRY.unpack_from(data, offset)
+            offset += TREE_ENTRY.size
+            self.trees[data[offset:offset + path_len].decode("utf-8")] = sha.hex()
+            offset += path_len
+
+    @property
+    def dirty(self):
+        return self.__dirty
+
+    def __contains__(self, path):
+        return path in self.__entries
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def __iter__(self):
+        return iter(sorted(self.__entries))
+
+    def get(self, path):
+        return self.__entries.get(path)
+
+    def is_unchanged(self, path, st):
+        entry = self.__entries.get(path)
+        if entry is None or not entry.matches(st):
+            return False
+        # Racy-git: файл, изменённый не раньше записи индекса, мог поменяться
+        # в пределах той же отметки mtime, поэтому stat ему не доверяем
+        return entry.mtime_ns < self.mtime_ns
+
+    def items(self):
+        return [(path, self.__entries[path]) for path in sorted(self.__entries)]
+
+    def set(self, path, entry):
+        previous = self.__entries.get(path)
+        if previous is None or previous.hash != entry.hash or previous.git_mode != entry.git_mode:
+            self.__invalidate_trees(path)
+        self.__entries[path] = entry
+        self.__dirty = True
+
+    def remove(self, path):
+        if self.__entries.pop(path, None) is not None:
+            self.__invalidate_trees(path)
+            self.__dirty = True
+
+    def cache_tree(self, directory, tree_hash):
+        if self.trees.get(directory) != tree_hash:
+            self.trees[directory] = tree_hash
+            self.__dirty = True
+
+    def set_monitor(self, token, dirty_paths):
+        dirty_paths = tuple(sorted(set(dirty_paths)))
+        if token != self.monitor_token or dirty_paths != self.monitor_dirty:
+            self.monitor_token = token
+            self.monitor_dirty = dirty_paths
+            self.__dirty = True
+
+    def __invalidate_trees(self, path):
+        directory = path
+        while directory:
+            directory = directory.rpartition("/")[0]
+            self.trees.pop(directory, None)
+
+    def __pack_trees(self):
+        records = []
+        for directory in sorted(self.trees):
+            encoded = directory.encode("utf-8")
+            records.append(TREE_ENTRY.pack(bytes.fromhex(self.trees[directory]), len(encoded)) + encoded)
+        payload = b"".join(records)
+        return EXTENSION.pack(TREE_EXTENSION, len(payload)) + payload
+
+    def save(self):
+        if not self.__dirty:
+            return
+
+        with span("index.save", entries=len(self.__entries)) as save_span:
+            chunks = [HEADER.pack(SIGNATURE, VERSION, len(self.__entries))]
+            for path in sorted(self.__entries):
+                chunks.append(self.__entries[path].pack(path))
+            if self.trees:
+                chunks.append(self.__pack_trees())
+            if self.monitor_token is not None:
+                payload = "\0".join((self.monitor_token, *self.monitor_dirty)).encode("utf-8")
+                chunks.append(EXTENSION.pack(MONITOR_EXTENSION, len(payload)) + payload)
+            body = b"".join(chunks)
+
+            tmp_path = f"{self.path}.lock"
+            with open(tmp_path, "wb") as file:
+                file.write(body)
+                file.write(hashlib.sha1(body).digest())
+            os.replace(tmp_path, self.path)
+            save_span.set(bytes=len(body) + 20)
+
+        self.mtime_ns = os.stat(self.path).st_mtime_ns
+        self.__dirty = False
@@ -0,0 +1,307 @@
+"""Монитор рабочего дерева для `gitx daemon`: inotify следит за каталогами, а клиенты по Unix-сокету
+спрашивают, какие пути менялись с выданного ранее токена.
+
+Токен — "<эпоха>:<номер события>". Эпоха меняется при каждом запуске и полном пересканировании
+(переполнение очереди inotify, правка .gitxignore), и тогда клиент получает "full" и обходит дерево сам.
+Перед ответом демон создаёт cookie-файл в .gitx и ждёт его события: inotify доставляет события по порядку,
+так что все изменения, сделанные до запроса, к этому моменту уже учтены.
+"""
+import json
+import os
+import selectors
+import socket
+import struct
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_EXCL_UNLINK = 0x04000000
+IN_ISDIR = 0x40000000
+
+# struct inotify_event: wd, mask, cookie, длина имени; имя дополнено нулями
+EVENT = struct.Struct("iIII")
+
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+              | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR | IN_DONT_FOLLOW | IN_EXCL_UNLINK)
+COOKIE_PREFIX = "monitor-cookie-"
+SYNC_TIMEOUT = 1.0
+QUERY_TIMEOUT = 2.0
+
+
+class _Inotify:
+    """Минимальная обёртка inotify через ctypes, без сторонних пакетов"""
+
+    def __init__(self):
+        import ctypes
+        import ctypes.util
+
+        self.__libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        if not hasattr(self.__libc, "inotify_init1"):
+            raise Exception("File system monitor requires Linux inotify")
+        self.__ctypes = ctypes
+        self.fd = self.__libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+    def add_watch(self, path, mask=WATCH_MASK):
+        wd = self.__libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            raise OSError(self.__ctypes.get_errno(), f"Cannot watch {path}")
+        return wd
+
+    def rm_watch(self, wd):
+        # Для удалённого каталога ядро уже сняло наблюдение сам, ошибка здесь не важна
+        self.__libc.inotify_rm_watch(self.fd, wd)
+
+    def read(self):
+        """Возвращает список (wd, mask, name) из всех уже накопленных событий"""
+        events = []
+        while True:
+            try:
+                data = os.read(self.fd, 1 << 16)
+            except BlockingIOError:
+                return events
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = EVENT.unpack_from(data, offset)
+                offset += EVENT.size
+                events.append((wd, mask, os.fsdecode(data[offset:offset + length].rstrip(b"\0"))))
+                offset += length
+
+    def close(self):
+        os.close(self.fd)
+
+
+class FileMonitor:
+    def __init__(self, root, vcs_dir, matcher_factory):
+        self.root = root
+        self.vcs_dir = vcs_dir
+        self.matcher_factory = matcher_factory
+        self.inotify = _Inotify()
+        # wd -> относительный путь каталога и обратно
+        self.__dirs = {}
+        self.__watches = {}
+        # Путь -> номер последнего события; порядок вставки совпадает с порядком номеров
+        self.__changed = {}
+        self.__seq = 0
+        self.__epoch = None
+        self.__cookies = set()
+        self.__cookie_count = 0
+        self.__cookie_wd = self.inotify.add_watch(vcs_dir, IN_CREATE | IN_ONLYDIR)
+        self.running = True
+        self.rescan()
+
+    @property
+    def token(self):
+        return f"{self.__epoch}:{self.__seq}"
+
+    def rescan(self):
+        """Заново ставит наблюдение на всё дерево; все выданные токены становятся недействительными"""
+        for wd in list(self.__dirs):
+            self.inotify.rm_watch(wd)
+        self.__dirs.clear()
+        self.__watches.clear()
+        self.__changed.clear()
+        self.__epoch = os.urandom(8).hex()
+        self.matcher = self.matcher_factory()
+        self.__watch_tree("", report=False)
+
+    def __watch_tree(self, top, report):
+        stack = [top]
+        while stack:
+            directory = stack.pop()
+            try:
+                wd = self.inotify.add_watch(os.path.join(self.root, directory) if directory else self.root)
+            except FileNotFoundError:
+                continue
+            self.__dirs[wd] = directory
+            self.__watches[directory] = wd
+
+            prefix = f"{directory}/" if directory else ""
+            try:
+                with os.scandir(os.path.join(self.root, directory) if directory else self.root) as iterator:
+                    entries = sorted(iterator, key=lambda entry: entry.name)
+            except (FileNotFoundError, NotADirectoryError, PermissionError):
+                continue
+            if directory and any(entry.name == ".gitxignore" for entry in entries):
+                self.matcher.add_file(os.path.join(self.root, directory, ".gitxignore"), directory)
+
+            for entry in entries:
+                path = prefix + entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    if not self.matcher.match(path, True):
+                        stack.append(path)
+                elif report and not self.matcher.match(path):
+                    # Файлы появились в каталоге раньше, чем на него поставлено наблюдение
+                    self.__touch(path)
+
+    def __unwatch_tree(self, top):
+        prefix = top + "/"
+        for directory in [d for d in self.__watches if d == top or d.startswith(prefix)]:
+            wd = self.__watches.pop(directory)
+            self.__dirs.pop(wd, None)
+            self.inotify.rm_watch(wd)
+
+    def __touch(self, path):
+        self.__seq += 1
+        self.__changed.pop(path, None)
+        self.__changed[path] = self.__seq
+
+    def process(self, events):
+        for wd, mask, name in events:
+            if mask & IN_Q_OVERFLOW:
+                self.rescan()
+                continue
+            if wd == self.__cookie_wd:
+                if name.startswith(COOKIE_PREFIX):
+                    self.__cookies.add(name)
+                continue
+
+            directory = self.__dirs.get(wd)
+            if directory is None:
+                continue
+            if mask & IN_IGNORED:
+                self.__dirs.pop(wd, None)
+                if self.__watches.get(directory) == wd:
+                    del self.__watches[directory]
+                continue
+            if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                # Подкаталоги обрабатываются по событию в родителе, здесь важен только сам корень
+                if directory == "":
+                    self.running = False
+                continue
+
+            path = f"{directory}/{name}" if directory else name
+            if name == ".gitxignore":
+                self.rescan()
+            elif mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    if not self.matcher.match(path, True):
+                        self.__watch_tree(path, report=True)
+                elif mask & (IN_DELETE | IN_MOVED_FROM):
+                    self.__unwatch_tree(path)
+                    # Путь с '/' на конце означает «всё внутри каталога»
+                    self.__touch(path + "/")
+            elif not self.matcher.match(path):
+                self.__touch(path)
+
+    def sync(self):
+        """Дожидается, пока будут обработаны все события, произошедшие до вызова"""
+        self.__cookie_count += 1
+        name = f"{COOKIE_PREFIX}{os.getpid()}-{self.__cookie_count}"
+        cookie = os.path.join(self.vcs_dir, name)
+        open(cookie, "w").close()
+        try:
+            with selectors.DefaultSelector() as selector:
+                selector.register(self.inotify.fd, selectors.EVENT_READ)
+                while name not in self.__cookies:
+                    if not selector.select(SYNC_TIMEOUT):
+                        # События не пришли — ответ по неполным данным опасен, просим полный обход
+                        self.rescan()
+                        return
+                    self.process(self.inotify.read())
+        finally:
+            self.__cookies.discard(name)
+            os.remove(cookie)
+
+    def changes_since(self, token):
+        epoch, _, seq = (token or "").partition(":")
+        if epoch != self.__epoch or not seq.isdigit():
+            return {"token": self.token, "full": True}
+
+        seq = int(seq)
+        paths = []
+        for path in reversed(self.__changed):
+            if self.__changed[path] <= seq:
+                break
+            paths.append(path)
+        return {"token": self.token, "full": False, "paths": sorted(paths)}
+
+    def close(self):
+        self.inotify.close()
+
+
+def _read_line(connection):
+    data = b""
+    while not data.endswith(b"\n"):
+        chunk = connection.recv(1 << 16)
+        if not chunk:
+            break
+        data += chunk
+    return data
+
+
+def serve_monitor(root, vcs_dir, matcher_factory, socket_path):
+    """Запускает демон в текущем процессе до Ctrl+C, `gitx daemon --stop` или удаления корня дерева"""
+    if not hasattr(socket, "AF_UNIX"):
+        raise Exception("File system monitor requires Unix domain sockets")
+    if query_monitor(socket_path, None) is not None:
+        print("Daemon is already running")
+        return
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+
+    monitor = FileMonitor(root, vcs_dir, matcher_factory)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(socket_path)
+    server.listen()
+    print(f"Watching {os.path.abspath(root)}")
+    try:
+        with selectors.DefaultSelector() as selector:
+            selector.register(monitor.inotify.fd, selectors.EVENT_READ, "events")
+            selector.register(server, selectors.EVENT_READ, "client")
+            while monitor.running:
+                for key, _ in selector.select():
+                    if key.data == "events":
+                        monitor.process(monitor.inotify.read())
+                    else:
+                        _answer(monitor, server)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        monitor.close()
+
+
+def _answer(monitor, server):
+    connection, _ = server.accept()
+    with connection:
+        connection.settimeout(QUERY_TIMEOUT)
+        try:
+            request = json.loads(_read_line(connection))
+            if request.get("stop"):
+                monitor.running = False
+                response = {"stopped": True}
+            else:
+                monitor.sync()
+                response = monitor.changes_since(request.get("since"))
+            connection.sendall(json.dumps(response).encode() + b"\n")
+        except (OSError, ValueError):
+            # Оборванный или некорректный запрос не должен останавливать демон
+            pass
+
+
+def query_monitor(socket_path, token, request=None):
+    """Ответ демона {"token", "full", "paths"} либо None, если демон не запущен или не ответил"""
+    if not hasattr(socket, "AF_UNIX"):
+        return None
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+            connection.settimeout(QUERY_TIMEOUT)
+            connection.connect(socket_path)
+            connection.sendall(json.dumps(request or {"since": token}).encode() + b"\n")
+            return json.loads(_read_line(connection))
+    except (OSError, ValueError):
+        return None
@@ -0,0 +1,326 @@
+import hashlib
+import os
+import tempfile
+import threading
+import zlib
+from collections import OrderedDict
+
+from core.chunking import split_chunks
+from core.pack import Pack, TYPE_CODES, write_pack
+
+CHUNK_SIZE = 1 << 20
+# Как и git (core.looseCompression), для loose-объектов выбираем скорость, а не степень сжатия
+LOOSE_COMPRESSION = 1
+# LRU распакованных объектов: деревья и коммиты читаются многократно при diff, status и push
+CACHE_SIZE = 32 << 20
+CACHE_MAX_OBJECT = 1 << 20
+# Блобы от этого размера хранятся частями по содержимому: правка большого файла добавляет лишь изменённые части
+LARGE_FILE_THRESHOLD = int(os.environ.get("GITX_LARGE_FILE_THRESHOLD") or 16 << 20)
+# Тип loose-объекта со списком частей; наружу такой объект виден как обычный blob
+CHUNKED = "chunked"
+
+
+def read_chunks(file, chunk_size=CHUNK_SIZE):
+    while True:
+        chunk = file.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+def object_header(obj_type, size):
+    return f"{obj_type} {size}\0".encode()
+
+
+class ObjectStore:
+    """Хранилище объектов в формате git: objects/ab/cdef..., zlib, sha1 от заголовка и содержимого"""
+
+    def __init__(self, path, cache_size=CACHE_SIZE, large_file_threshold=LARGE_FILE_THRESHOLD):
+        self.path = path
+        self.large_file_threshold = large_file_threshold
+        self.pack_dir = os.path.join(path, "pack")
+        self.__packs = None
+        self.__packs_lock = threading.Lock()
+        self.__cache = OrderedDict()
+        self.__cache_size = cache_size
+        self.__cache_bytes = 0
+        self.__cache_lock = threading.Lock()
+
+    def object_path(self, oid):
+        return os.path.join(self.path, oid[:2], oid[2:])
+
+    @property
+    def packs(self):
+        # Потоки checkout читают объекты одновременно — список pack-файлов открываем один раз
+        with self.__packs_lock:
+            if self.__packs is None:
+                names = sorted(os.listdir(self.pack_dir)) if os.path.isdir(self.pack_dir) else []
+                self.__packs = [Pack(os.path.join(self.pack_dir, name)) for name in names if name.endswith(".idx")]
+            return self.__packs
+
+    def close_packs(self):
+        for pack in self.__packs or []:
+            pack.close()
+        self.__packs = None
+
+    def __find_pack(self, oid):
+        for pack in self.packs:
+            if oid in pack:
+                return pack
+        return None
+
+    def exists(self, oid):
+        return os.path.exists(self.object_path(oid)) or self.__find_pack(oid) is not None
+
+    def loose_oids(self):
+        if not os.path.isdir(self.path):
+            return
+        for fanout in sorted(os.listdir(self.path)):
+            if len(fanout) != 2:
+                continue
+            for name in sorted(os.listdir(os.path.join(self.path, fanout))):
+                if not name.startswith("tmp_"):
+                    yield fanout + name
+
+    def all_oids(self):
+        oids = set(self.loose_oids())
+        for pack in self.packs:
+            oids.update(pack.oids())
+        return oids
+
+    def hash_file(self, filepath, obj_type="blob"):
+        with open(filepath, 'rb') as file:
+            size = os.fstat(file.fileno()).st_size
+            sha = hashlib.sha1(object_header(obj_type, size))
+            for chunk in read_chunks(file):
+                sha.update(chunk)
+        return sha.hexdigest()
+
+    def write(self, obj_type, data):
+        # Большой блоб из памяти (clone, pull, собранный в коде) хранится частями так же, как записанный из файла
+        if obj_type == "blob" and len(data) >= self.large_file_threshold:
+            view = memoryview(data)
+            return self.__write_chunked(len(data), (view[i:i + CHUNK_SIZE] for i in range(0, len(data), CHUNK_SIZE)))
+        return self.__write_loose(obj_type, data)
+
+    def __write_loose(self, obj_type, data):
+        header = object_header(obj_type, len(data))
+        oid = hashlib.sha1(header + data).hexdigest()
+        if not self.exists(oid):
+            compressor = zlib.compressobj(LOOSE_COMPRESSION)
+            self.__commit_temp(oid, [compressor.compress(header), compressor.compress(data), compressor.flush()])
+        # Только что записанные деревья и коммиты обычно сразу читаются снова; блобы add не кэшируем
+        if obj_type != "blob":
+            self.__remember(oid, obj_type, data)
+        return oid
+
+    def write_file(self, filepath, obj_type="blob"):
+        with open(filepath, 'rb') as file:
+            size = os.fstat(file.fileno()).st_size
+            return self.write_stream(obj_type, size, read_chunks(file))
+
+    def write_stream(self, obj_type, size, chunks):
+        """Хеширует и сжимает объект по частям за один проход, не держа его в памяти целиком"""
+        if obj_type == "blob" and size >= self.large_file_threshold:
+            return self.__write_chunked(size, chunks)
+
+        header = object_header(obj_type, size)
+        sha = hashlib.sha1(header)
+        compressor = zlib.compressobj(LOOSE_COMPRESSION)
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.path, prefix="tmp_obj_")
+        try:
+            written = 0
+            with os.fdopen(fd, 'wb') as tmp:
+                tmp.write(compressor.compress(header))
+                for chunk in chunks:
+                    written += len(chunk)
+                    sha.update(chunk)
+                    tmp.write(compressor.compress(chunk))
+                tmp.write(compressor.flush())
+
+            if written != size:
+                raise Exception(f"Object size changed while writing: expected {size}, got {written}")
+
+            oid = sha.hexdigest()
+            if self.exists(oid):
+                os.remove(tmp_path)
+            else:
+                os.makedirs(os.path.dirname(self.object_path(oid)), exist_ok=True)
+                os.replace(tmp_path, self.object_path(oid))
+            return oid
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def __write_chunked(self, size, chunks):
+        """Пишет большой блоб частями-блобами и манифестом под sha1 всего содержимого, как у обычного blob"""
+        sha = hashlib.sha1(object_header("blob", size))
+        manifest = []
+        written = 0
+        for piece in split_chunks(chunks):
+            written += len(piece)
+            sha.update(piece)
+            # Совпавшие с прежними версиями части уже есть в хранилище, write их не перезаписывает
+            manifest.append(f"{self.__write_loose('blob', piece)} {len(piece)}\n")
+
+        if written != size:
+            raise Exception(f"Object size changed while writing: expected {size}, got {written}")
+
+        oid = sha.hexdigest()
+        if not self.exists(oid):
+            header = object_header(CHUNKED, size)
+            compressor = zlib.compressobj(LOOSE_COMPRESSION)
+            self.__commit_temp(oid, [compressor.compress(header + "".join(manifest).encode()), compressor.flush()])
+        return oid
+
+    def __read_manifest(self, rest, chunks):
+        body = rest + b"".join(chunks)
+        return [(line[:40], int(line[41:])) for line in body.decode().splitlines()]
+
+    def __join_chunks(self, manifest):
+        for chunk_oid, _ in manifest:
+            yield from self.stream(chunk_oid)[2]
+
+    def __commit_temp(self, oid, parts):
+        fd, tmp_path = tempfile.mkstemp(dir=self.path, prefix="tmp_obj_")
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                for part in parts:
+                    tmp.write(part)
+            os.makedirs(os.path.dirname(self.object_path(oid)), exist_ok=True)
+            os.replace(tmp_path, self.object_path(oid))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def __inflate(self, file):
+        decompressor = zlib.decompressobj()
+        for data in read_chunks(file):
+            # Ограничиваем размер выхода, чтобы хорошо сжатые данные не раздувались в памяти
+            while data:
+                out = decompressor.decompress(data, CHUNK_SIZE)
+                if out:
+                    yield out
+                data = decompressor.unconsumed_tail
+        tail = decompressor.flush()
+        if tail:
+            yield tail
+
+    def __chain(self, file, rest, chunks):
+        with file:
+            if rest:
+                yield rest
+            yield from chunks
+
+    def stream(self, oid):
+        """Возвращает (type, size, итератор по частям содержимого)"""
+        try:
+            file = open(self.object_path(oid), 'rb')
+        except FileNotFoundError:
+            # Loose-объекта нет — ищем в pack-файлах
+            pack = self.__find_pack(oid)
+            if pack is None:
+                raise Exception(f"Object {oid} not found")
+            return pack.stream(oid)
+
+        chunks = self.__inflate(file)
+        head = b""
+        for chunk in chunks:
+            head += chunk
+            if b"\0" in head:
+                break
+        else:
+            file.close()
+            raise Exception(f"Corrupted object {oid}")
+
+        header, rest = head.split(b"\0", 1)
+        obj_type, size = header.decode().split(" ")
+        if obj_type == CHUNKED:
+            # Манифест мал, его читаем сразу; сами части распаковываются по одной при чтении
+            with file:
+                manifest = self.__read_manifest(rest, chunks)
+            return "blob", int(size), self.__join_chunks(manifest)
+        return obj_type, int(size), self.__chain(file, rest, chunks)
+
+    def read(self, oid):
+        with self.__cache_lock:
+            cached = self.__cache.get(oid)
+            if cached is not None:
+                self.__cache.move_to_end(oid)
+                return cached
+
+        obj_type, size, chunks = self.stream(oid)
+        data = b"".join(chunks)
+        if len(data) != size:
+            raise Exception(f"Corrupted object {oid}")
+        self.__remember(oid, obj_type, data)
+        return obj_type, data
+
+    def __remember(self, oid, obj_type, data):
+        # Объекты адресуются содержимым и не меняются, поэтому кэш не нужно сбрасывать при записи
+        if len(data) > CACHE_MAX_OBJECT or len(data) > self.__cache_size:
+            return
+        with self.__cache_lock:
+            if oid in self.__cache:
+                return
+            self.__cache[oid] = (obj_type, data)
+            self.__cache_bytes += len(data)
+            while self.__cache_bytes > self.__cache_size:
+                _, (_, evicted) = self.__cache.popitem(last=False)
+                self.__cache_bytes -= len(evicted)
+
+    def info(self, oid):
+        """Возвращает (type, size) объекта, не читая содержимое целиком"""
+        try:
+            obj_type, size = self.__loose_header(oid)
+        except FileNotFoundError:
+            pack = self.__find_pack(oid)
+            if pack is None:
+                raise Exception(f"Object {oid} not found")
+            return pack.info(oid)
+        return "blob" if obj_type == CHUNKED else obj_type, size
+
+    def __loose_header(self, oid):
+        with open(self.object_path(oid), 'rb') as file:
+            head = zlib.decompressobj().decompress(file.read(1024), 64)
+        obj_type, size = head.split(b"\0", 1)[0].decode().split(" ")
+        return obj_type, int(size)
+
+    def repack(self, names=None):
+        """Собирает все объекты в один pack-файл и удаляет упакованные loose-объекты и старые pack-файлы"""
+        names = names or {}
+        # Манифесты остаются loose-объектами: в pack попадают их части, а не склеенное содержимое
+        manifests = {oid for oid in self.loose_oids() if self.__loose_header(oid)[0] == CHUNKED}
+        loose = [oid for oid in self.loose_oids() if oid not in manifests]
+        old_packs = list(self.packs)
+        oids = self.all_oids() - manifests
+        if not oids:
+            return None
+
+        info = {oid: self.info(oid) for oid in oids}
+        # Как в git: группируем по типу и имени файла, крупные версии раньше, чтобы меньшие дельтировались от них
+        order = sorted(oids, key=lambda oid: (
+            TYPE_CODES[info[oid][0]],
+            names.get(oid, "").rpartition("/")[2],
+            names.get(oid, ""),
+            -info[oid][1],
+            oid
+        ))
+        idx_path = write_pack(self.pack_dir, self, order)
+
+        self.close_packs()
+        for pack in old_packs:
+            if pack.idx_path != idx_path:
+                os.remove(pack.idx_path)
+                os.remove(pack.pack_path)
+        for oid in loose:
+            os.remove(self.object_path(oid))
+        for fanout in os.listdir(self.path):
+            fanout_path = os.path.join(self.path, fanout)
+            if len(fanout) == 2 and os.path.isdir(fanout_path) and not os.listdir(fanout_path):
+                os.rmdir(fanout_path)
+
+        return idx_path, len(order)
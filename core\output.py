@@ -0,0 +1,14 @@
+import os
+
+# 0 — только итоговые сообщения, 1 — ещё и построчный вывод по файлам (-v или GITX_VERBOSE=1)
+verbosity = int(os.environ.get("GITX_VERBOSE") or 0)
+
+
+def set_verbosity(level):
+    global verbosity
+    verbosity = level
+
+
+def verbose(message, level=1):
+    if verbosity >= level:
+        print(message)
@@ -0,0 +1,486 @@
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+import zlib
+
+from core.trace import span
+
+TYPE_CODES = {"commit": 1, "tree": 2, "blob": 3, "tag": 4}
+TYPE_NAMES = {code: name for name, code in TYPE_CODES.items()}
+OFS_DELTA = 6
+REF_DELTA = 7
+
+PACK_SIGNATURE = b"PACK"
+IDX_SIGNATURE = b"\377tOc"
+PACK_COMPRESSION = zlib.Z_DEFAULT_COMPRESSION
+CHUNK_SIZE = 1 << 20
+
+DELTA_BLOCK = 16
+DELTA_WINDOW = 10
+DELTA_DEPTH = 50
+# Крупные объекты не дельтируем: поиск совпадений на Python для них слишком дорог
+DELTA_MAX_SIZE = 4 << 20
+# Сколько блоков базы ищем в цели, прежде чем строить дельту, и какая их доля должна найтись
+DELTA_SAMPLES = 16
+DELTA_MIN_SHARED = 4
+COPY_MAX = 0xFFFFFF
+
+
+def encode_size(size):
+    out = bytearray()
+    while True:
+        byte = size & 0x7F
+        size >>= 7
+        if size:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def decode_size(data, pos):
+    size = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        size |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            return size, pos
+
+
+def _match_length(source, src, target, pos):
+    length = 0
+    limit = min(len(source) - src, len(target) - pos)
+    step = 4096
+    # Сравниваем срезами убывающей длины вместо побайтового цикла
+    while step:
+        while length + step <= limit and source[src + length:src + length + step] == target[pos + length:pos + length + step]:
+            length += step
+        step //= 2
+    return length
+
+
+def _copy_op(offset, size):
+    op = 0x80
+    args = bytearray()
+    for i in range(4):
+        byte = (offset >> (8 * i)) & 0xFF
+        if byte:
+            op |= 1 << i
+            args.append(byte)
+    for i in range(3):
+        byte = (size >> (8 * i)) & 0xFF
+        if byte:
+            op |= 0x10 << i
+            args.append(byte)
+    return bytes([op]) + args
+
+
+def _insert_ops(data):
+    out = bytearray()
+    for start in range(0, len(data), 127):
+        chunk = data[start:start + 127]
+        out.append(len(chunk))
+        out += chunk
+    return out
+
+
+def create_delta(source, target, max_size=None):
+    """Строит дельту в формате git (copy/insert) или возвращает None, если она не меньше max_size"""
+    blocks = {}
+    for offset in range(0, len(source) - DELTA_BLOCK + 1, DELTA_BLOCK):
+        blocks.setdefault(source[offset:offset + DELTA_BLOCK], offset)
+
+    out = bytearray(encode_size(len(source)) + encode_size(len(target)))
+    insert_start = pos = 0
+    end = len(target)
+    # Позиция, после которой одни только вставки уже превысят max_size
+    budget = end if max_size is None else max_size - len(out)
+
+    while pos + DELTA_BLOCK <= end:
+        src = blocks.get(target[pos:pos + DELTA_BLOCK])
+        if src is None:
+            pos += 1
+            if pos >= budget:
+                return None
+            continue
+
+        length = _match_length(source, src, target, pos)
+        while pos > insert_start and src > 0 and target[pos - 1] == source[src - 1]:
+            pos -= 1
+            src -= 1
+            length += 1
+
+        out += _insert_ops(target[insert_start:pos])
+        while length:
+            size = min(length, COPY_MAX)
+            out += _copy_op(src, size)
+            src += size
+            pos += size
+            length -= size
+        insert_start = pos
+
+        if max_size is not None:
+            if len(out) >= max_size:
+                return None
+            budget = insert_start + max_size - len(out)
+
+    out += _insert_ops(target[insert_start:])
+    if max_size is not None and len(out) >= max_size:
+        return None
+    return bytes(out)
+
+
+def apply_delta(source, delta):
+    src_size, pos = decode_size(delta, 0)
+    target_size, pos = decode_size(delta, pos)
+    if src_size != len(source):
+        raise Exception("Delta base size mismatch")
+
+    out = bytearray()
+    while pos < len(delta):
+        op = delta[pos]
+        pos += 1
+        if op & 0x80:
+            offset = size = 0
+            for i in range(4):
+                if op & (1 << i):
+                    offset |= delta[pos] << (8 * i)
+                    pos += 1
+            for i in range(3):
+                if op & (0x10 << i):
+                    size |= delta[pos] << (8 * i)
+                    pos += 1
+            out += source[offset:offset + (size or 0x10000)]
+        elif op:
+            out += delta[pos:pos + op]
+            pos += op
+        else:
+            raise Exception("Invalid delta opcode")
+
+    if len(out) != target_size:
+        raise Exception("Delta result size mismatch")
+    return bytes(out)
+
+
+def encode_entry_header(type_code, size):
+    byte = (type_code << 4) | (size & 0x0F)
+    size >>= 4
+    out = bytearray()
+    while size:
+        out.append(byte | 0x80)
+        byte = size & 0x7F
+        size >>= 7
+    out.append(byte)
+    return bytes(out)
+
+
+def decode_entry_header(data, pos):
+    byte = data[pos]
+    pos += 1
+    type_code = (byte >> 4) & 0x07
+    size = byte & 0x0F
+    shift = 4
+    while byte & 0x80:
+        byte = data[pos]
+        pos += 1
+        size |= (byte & 0x7F) << shift
+        shift += 7
+    return type_code, size, pos
+
+
+def encode_offset(offset):
+    out = [offset & 0x7F]
+    offset >>= 7
+    while offset:
+        offset -= 1
+        out.append(0x80 | (offset & 0x7F))
+        offset >>= 7
+    return bytes(reversed(out))
+
+
+def decode_offset(data, pos):
+    byte = data[pos]
+    pos += 1
+    offset = byte & 0x7F
+    while byte & 0x80:
+        byte = data[pos]
+        pos += 1
+        offset = ((offset + 1) << 7) | (byte & 0x7F)
+    return offset, pos
+
+
+class Pack:
+    """Pack-файл git v2 с индексом .idx v2; поиск объекта — бинарный поиск по mmap индекса"""
+
+    def __init__(self, idx_path):
+        self.idx_path = idx_path
+        self.pack_path = idx_path[:-4] + ".pack"
+
+        with open(idx_path, 'rb') as file:
+            self.__idx = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        with open(self.pack_path, 'rb') as file:
+            self.__pack = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self.__idx[:4] != IDX_SIGNATURE or struct.unpack_from(">I", self.__idx, 4)[0] != 2:
+            raise Exception(f"Unsupported pack index {idx_path}")
+
+        self.__fanout = struct.unpack_from(">256I", self.__idx, 8)
+        self.count = self.__fanout[255]
+        self.__sha_offset = 8 + 256 * 4
+        self.__crc_offset = self.__sha_offset + 20 * self.count
+        self.__offsets_offset = self.__crc_offset + 4 * self.count
+        self.__large_offset = self.__offsets_offset + 4 * self.count
+
+    def close(self):
+        self.__idx.close()
+        self.__pack.close()
+
+    def __sha_at(self, position):
+        start = self.__sha_offset + 20 * position
+        return self.__idx[start:start + 20]
+
+    def __find(self, oid):
+        sha = bytes.fromhex(oid)
+        low = self.__fanout[sha[0] - 1] if sha[0] else 0
+        high = self.__fanout[sha[0]]
+        while low < high:
+            middle = (low + high) // 2
+            current = self.__sha_at(middle)
+            if current < sha:
+                low = middle + 1
+            elif current > sha:
+                high = middle
+            else:
+                return self.__offset_at(middle)
+        return None
+
+    def __offset_at(self, position):
+        offset = struct.unpack_from(">I", self.__idx, self.__offsets_offset + 4 * position)[0]
+        if offset & 0x80000000:
+            offset = struct.unpack_from(">Q", self.__idx, self.__large_offset + 8 * (offset & 0x7FFFFFFF))[0]
+        return offset
+
+    def __contains__(self, oid):
+        return self.__find(oid) is not None
+
+    def oids(self):
+        for position in range(self.count):
+            yield self.__sha_at(position).hex()
+
+    def __inflate(self, pos):
+        decompressor = zlib.decompressobj()
+        while not decompressor.eof:
+            data = self.__pack[pos:pos + CHUNK_SIZE]
+            if not data:
+                raise Exception(f"Truncated pack {self.pack_path}")
+            pos += len(data)
+            while data and not decompressor.eof:
+                out = decompressor.decompress(data, CHUNK_SIZE)
+                if out:
+                    yield out
+                data = decompressor.unconsumed_tail
+
+    def __base_offset(self, offset, type_code, pos):
+        if type_code == OFS_DELTA:
+            distance, pos = decode_offset(self.__pack, pos)
+            return offset - distance, pos
+        base_oid = self.__pack[pos:pos + 20].hex()
+        base_offset = self.__find(base_oid)
+        if base_offset is None:
+            raise Exception(f"Delta base {base_oid} not found in {self.pack_path}")
+        return base_offset, pos + 20
+
+    def read_at(self, offset):
+        type_code, size, pos = decode_entry_header(self.__pack, offset)
+        if type_code in (OFS_DELTA, REF_DELTA):
+            base_offset, pos = self.__base_offset(offset, type_code, pos)
+            base_type, base = self.read_at(base_offset)
+            return base_type, apply_delta(base, b"".join(self.__inflate(pos)))
+        return TYPE_NAMES[type_code], b"".join(self.__inflate(pos))
+
+    def info(self, oid):
+        """Возвращает (type, size) без распаковки содержимого"""
+        offset = self.__find(oid)
+        type_code, size, pos = decode_entry_header(self.__pack, offset)
+        if type_code not in (OFS_DELTA, REF_DELTA):
+            return TYPE_NAMES[type_code], size
+
+        # Размер результата лежит в заголовке дельты, тип — у базы в конце цепочки
+        base_offset, pos = self.__base_offset(offset, type_code, pos)
+        head = next(self.__inflate(pos))
+        _, head_pos = decode_size(head, 0)
+        target_size, _ = decode_size(head, head_pos)
+        while True:
+            type_code, _, pos = decode_entry_header(self.__pack, base_offset)
+            if type_code not in (OFS_DELTA, REF_DELTA):
+                return TYPE_NAMES[type_code], target_size
+            base_offset, _ = self.__base_offset(base_offset, type_code, pos)
+
+    def stream(self, oid):
+        offset = self.__find(oid)
+        if offset is None:
+            raise Exception(f"Object {oid} not found")
+        type_code, size, pos = decode_entry_header(self.__pack, offset)
+        if type_code in (OFS_DELTA, REF_DELTA):
+            obj_type, data = self.read_at(offset)
+            return obj_type, len(data), iter([data])
+        return TYPE_NAMES[type_code], size, self.__inflate(pos)
+
+    def read(self, oid):
+        offset = self.__find(oid)
+        if offset is None:
+            raise Exception(f"Object {oid} not found")
+        return self.read_at(offset)
+
+
+class _PackWriter:
+    def __init__(self, file):
+        self.file = file
+        self.sha = hashlib.sha1()
+        self.offset = 0
+
+    def write(self, data):
+        self.file.write(data)
+        self.sha.update(data)
+        self.offset += len(data)
+
+
+def _write_entry(writer, header, chunks):
+    crc = zlib.crc32(header)
+    writer.write(header)
+    compressor = zlib.compressobj(PACK_COMPRESSION)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            crc = zlib.crc32(compressed, crc)
+            writer.write(compressed)
+    compressed = compressor.flush()
+    crc = zlib.crc32(compressed, crc)
+    writer.write(compressed)
+    return crc
+
+
+def _similar(source, target):
+    """Дешёвая проверка перед create_delta: встречаются ли в цели равномерно взятые блоки базы"""
+    count = len(source) // DELTA_BLOCK
+    if count <= DELTA_SAMPLES:
+        return True
+    step = count // DELTA_SAMPLES
+    shared = 0
+    for i in range(DELTA_SAMPLES):
+        offset = i * step * DELTA_BLOCK
+        # bytes.find работает на C, это на порядки быстрее побайтового поиска create_delta
+        if target.find(source[offset:offset + DELTA_BLOCK]) >= 0:
+            shared += 1
+            if shared >= DELTA_MIN_SHARED:
+                return True
+    return False
+
+
+def _find_delta(window, obj_type, data):
+    best = None
+    best_size = len(data) // 2
+    for candidate in reversed(window):
+        base_type, base_data, base_offset, base_depth = candidate
+        if base_type != obj_type or base_depth >= DELTA_DEPTH:
+            continue
+        # Байты цели сверх размера базы можно только вставить, так что дельта не короче этой разницы
+        if len(data) - len(base_data) >= best_size or not _similar(base_data, data):
+            continue
+        delta = create_delta(base_data, data, best_size)
+        if delta is not None:
+            best, best_size = (candidate, delta), len(delta)
+    return best
+
+
+def write_pack(pack_dir, objects, order):
+    """Пишет объекты в указанном порядке в pack-файл, дельтируя похожие объекты в скользящем окне"""
+    with span("pack.write", objects=len(order)):
+        return _write_pack(pack_dir, objects, order)
+
+
+def _write_pack(pack_dir, objects, order):
+    os.makedirs(pack_dir, exist_ok=True)
+    fd, tmp_pack = tempfile.mkstemp(dir=pack_dir, prefix="tmp_pack_")
+    entries = []
+    window = []
+
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            writer = _PackWriter(file)
+            writer.write(PACK_SIGNATURE + struct.pack(">II", 2, len(order)))
+
+            for oid in order:
+                offset = writer.offset
+                obj_type, size, chunks = objects.stream(oid)
+
+                if size > DELTA_MAX_SIZE:
+                    crc = _write_entry(writer, encode_entry_header(TYPE_CODES[obj_type], size), chunks)
+                    entries.append((bytes.fromhex(oid), crc, offset))
+                    continue
+
+                data = b"".join(chunks)
+                depth = 0
+                found = _find_delta(window, obj_type, data)
+                if found:
+                    (_, _, base_offset, base_depth), delta = found
+                    depth = base_depth + 1
+                    header = encode_entry_header(OFS_DELTA, len(delta)) + encode_offset(offset - base_offset)
+                    crc = _write_entry(writer, header, [delta])
+                else:
+                    crc = _write_entry(writer, encode_entry_header(TYPE_CODES[obj_type], size), [data])
+
+                entries.append((bytes.fromhex(oid), crc, offset))
+                window.append((obj_type, data, offset, depth))
+                if len(window) > DELTA_WINDOW:
+                    window.pop(0)
+
+            pack_sha = writer.sha.digest()
+            file.write(pack_sha)
+
+        name = os.path.join(pack_dir, f"pack-{pack_sha.hex()}")
+        os.replace(tmp_pack, f"{name}.pack")
+    except BaseException:
+        if os.path.exists(tmp_pack):
+            os.remove(tmp_pack)
+        raise
+
+    _write_index(f"{name}.idx", entries, pack_sha)
+    return f"{name}.idx"
+
+
+def _write_index(idx_path, entries, pack_sha):
+    entries.sort()
+    fanout = [0] * 256
+    for sha, _, _ in entries:
+        fanout[sha[0]] += 1
+    for i in range(1, 256):
+        fanout[i] += fanout[i - 1]
+
+    offsets = []
+    large_offsets = []
+    for _, _, offset in entries:
+        if offset < 0x80000000:
+            offsets.append(offset)
+        else:
+            offsets.append(0x80000000 | len(large_offsets))
+            large_offsets.append(offset)
+
+    body = b"".join([
+        IDX_SIGNATURE, struct.pack(">I", 2), struct.pack(">256I", *fanout),
+        b"".join(sha for sha, _, _ in entries),
+        struct.pack(f">{len(entries)}I", *(crc & 0xFFFFFFFF for _, crc, _ in entries)),
+        struct.pack(f">{len(offsets)}I", *offsets),
+        struct.pack(f">{len(large_offsets)}Q", *large_offsets),
+        pack_sha,
+    ])
+
+    tmp_path = f"{idx_path}.lock"
+    with open(tmp_path, 'wb') as file:
+        file.write(body)
+        file.write(hashlib.sha1(body).digest())
+    os.replace(tmp_path, idx_path)
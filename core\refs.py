@@ -0,0 +1,252 @@
+import mmap
+import os
+import re
+
+HEADS = "refs/heads/"
+PACKED_REFS = "packed-refs"
+PACKED_HEADER = b"# pack-refs with: sorted\n"
+# Те же ограничения, что у git check-ref-format, в упрощённом виде
+INVALID_NAME = re.compile(r"(^[-/.])|(\.\.)|(//)|([\x00-\x20~^:?*\[\\\x7f])|(@\{)|(\.lock$)|(\.lock/)|([/.]$)")
+
+
+def is_detached(head):
+    return re.fullmatch(r"[0-9a-f]{40}", head) is not None
+
+
+def ref_name(branch):
+    return branch if branch.startswith("refs/") else f"{HEADS}{branch}"
+
+
+def branch_name(ref):
+    return ref[len(HEADS):] if ref.startswith(HEADS) else ref
+
+
+def check_branch_name(branch):
+    if not branch or INVALID_NAME.search(branch):
+        raise Exception(f"'{branch}' is not a valid branch name")
+    return branch
+
+
+def checked_ref(branch):
+    """Полное имя ветки в refs/heads/ или исключение: через имя нельзя выйти за пределы каталога ссылок"""
+    ref = ref_name(branch)
+    if not ref.startswith(HEADS):
+        raise Exception(f"'{branch}' is not a branch")
+    check_branch_name(branch_name(ref))
+    return ref
+
+
+def ref_path(vcs_dir, ref):
+    return os.path.join(vcs_dir, *ref_name(ref).split("/"))
+
+
+def _legacy_path(vcs_dir, ref):
+    # Раньше вершина ветки лежала прямо в .gitx/<branch>
+    return os.path.join(vcs_dir, branch_name(ref_name(ref)))
+
+
+def read_head(vcs_dir):
+    head_path = os.path.join(vcs_dir, "HEAD")
+    if os.path.exists(head_path):
+        with open(head_path, "r") as file:
+            return file.read().strip()
+    return "refs/heads/main"
+
+
+def _read_sha(path):
+    try:
+        with open(path, "r") as file:
+            value = file.read().strip()
+    except (FileNotFoundError, IsADirectoryError, NotADirectoryError):
+        return None
+    return value if re.fullmatch(r"[0-9a-f]{40}", value) else None
+
+
+def _find_packed(data, name):
+    """Бинарный поиск по отсортированному packed-refs: строки вида '<sha> <ref>'"""
+    low = data.find(b"\n") + 1 if data[:1] == b"#" else 0
+    high = len(data)
+    while low < high:
+        middle = (low + high) // 2
+        start = data.rfind(b"\n", low, middle) + 1 or low
+        end = data.find(b"\n", start)
+        if end == -1:
+            end = len(data)
+        current = data[start + 41:end]
+        if current < name:
+            low = end + 1
+        elif current > name:
+            high = start
+        else:
+            return data[start:start + 40].decode()
+    return None
+
+
+def read_packed_ref(vcs_dir, ref):
+    path = os.path.join(vcs_dir, PACKED_REFS)
+    try:
+        with open(path, "rb") as file:
+            if os.fstat(file.fileno()).st_size == 0:
+                return None
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                return _find_packed(data, ref_name(ref).encode())
+    except FileNotFoundError:
+        return None
+
+
+def read_ref(vcs_dir, branch):
+    """Вершина ветки: loose-файл в refs/, затем packed-refs — по одному обращению к каждому, без обхода каталогов"""
+    return (
+        _read_sha(ref_path(vcs_dir, branch))
+        or read_packed_ref(vcs_dir, branch)
+        or _read_sha(_legacy_path(vcs_dir, branch))
+    )
+
+
+def read_packed_refs(vcs_dir):
+    refs = {}
+    path = os.path.join(vcs_dir, PACKED_REFS)
+    if os.path.exists(path):
+        with open(path, "r") as file:
+            for line in file:
+                if line.startswith(("#", "^")) or not line.strip():
+                    continue
+                sha, name = line.rstrip("\n").split(" ", 1)
+                refs[name] = sha
+    return refs
+
+
+def list_refs(vcs_dir, prefix=HEADS):
+    """Все ссылки с префиксом: packed-refs, поверх них loose-файлы; {ref: sha} по имени"""
+    refs = {name: sha for name, sha in read_packed_refs(vcs_dir).items() if name.startswith(prefix)}
+    root = os.path.join(vcs_dir, *prefix.rstrip("/").split("/"))
+    for directory, _, files in os.walk(root):
+        for filename in files:
+            if filename.endswith(".lock"):
+                continue
+            name = os.path.relpath(os.path.join(directory, filename), vcs_dir).replace(os.sep, "/")
+            sha = _read_sha(os.path.join(directory, filename))
+            if sha:
+                refs[name] = sha
+
+    if prefix == HEADS:
+        # Ветки старого формата видны, пока их не перепишет update_ref
+        head = ref_name(read_head(vcs_dir))
+        if head not in refs and _read_sha(_legacy_path(vcs_dir, head)):
+            refs[head] = _read_sha(_legacy_path(vcs_dir, head))
+    return dict(sorted(refs.items()))
+
+
+class _RefLock:
+    """Lock-файл рядом с обновляемым файлом; запись видна другим только после os.replace"""
+
+    def __init__(self, path, name):
+        self.path = path
+        self.lock_path = f"{path}.lock"
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            self.fd = os.open(self.lock_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+        except FileExistsError:
+            raise Exception(f"Unable to lock {name}: {self.lock_path} exists")
+
+    def commit(self, data):
+        with os.fdopen(self.fd, "w") as file:
+            self.fd = None
+            file.write(data)
+        os.replace(self.lock_path, self.path)
+
+    def release(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+        if os.path.exists(self.lock_path):
+            os.remove(self.lock_path)
+
+
+def lock_ref(vcs_dir, branch, old_hash=None, check_old=False):
+    """Берёт lock-файл ветки; с check_old — только если она всё ещё указывает на old_hash.
+    Пока lock держится, ветку никто не изменит: его передают в update_ref или снимают через release()"""
+    ref = checked_ref(branch)
+    lock = _RefLock(ref_path(vcs_dir, ref), branch_name(ref))
+    if check_old and read_ref(vcs_dir, ref) != old_hash:
+        lock.release()
+        raise Exception(f"Branch {branch_name(ref)} was updated concurrently")
+    return lock
+
+
+def update_ref(vcs_dir, branch, new_hash, old_hash=None, check_old=False, lock=None):
+    """Атомарно обновляет ветку через lock-файл; с check_old — только если она всё ещё указывает на old_hash.
+    Уже взятый через lock_ref lock используется вместо нового"""
+    ref = checked_ref(branch)
+    if lock is None:
+        lock = lock_ref(vcs_dir, ref, old_hash, check_old)
+    try:
+        lock.commit(new_hash + "\n")
+    finally:
+        lock.release()
+
+    legacy_path = _legacy_path(vcs_dir, ref)
+    if _read_sha(legacy_path):
+        os.remove(legacy_path)
+
+
+def _write_packed_refs(vcs_dir, lock, refs):
+    lines = [PACKED_HEADER.decode()]
+    lines.extend(f"{sha} {name}\n" for name, sha in sorted(refs.items()))
+    lock.commit("".join(lines))
+
+
+def delete_ref(vcs_dir, branch, old_hash=None, check_old=False):
+    ref = checked_ref(branch)
+    path = ref_path(vcs_dir, ref)
+    lock = _RefLock(path, branch_name(ref))
+    try:
+        if check_old and read_ref(vcs_dir, ref) != old_hash:
+            raise Exception(f"Branch {branch_name(ref)} was updated concurrently")
+
+        packed = read_packed_refs(vcs_dir)
+        if ref in packed:
+            packed_lock = _RefLock(os.path.join(vcs_dir, PACKED_REFS), PACKED_REFS)
+            try:
+                del packed[ref]
+                _write_packed_refs(vcs_dir, packed_lock, packed)
+            finally:
+                packed_lock.release()
+
+        for stale in (path, _legacy_path(vcs_dir, ref)):
+            if _read_sha(stale):
+                os.remove(stale)
+    finally:
+        lock.release()
+    _remove_empty_dirs(os.path.dirname(path), os.path.join(vcs_dir, "refs", "heads"))
+
+
+def pack_refs(vcs_dir):
+    """Переносит loose-ветки в packed-refs и удаляет их файлы; возвращает число ссылок"""
+    packed_lock = _RefLock(os.path.join(vcs_dir, PACKED_REFS), PACKED_REFS)
+    try:
+        refs = list_refs(vcs_dir)
+        _write_packed_refs(vcs_dir, packed_lock, refs)
+    finally:
+        packed_lock.release()
+
+    for ref, sha in refs.items():
+        path = ref_path(vcs_dir, ref)
+        try:
+            lock = _RefLock(path, branch_name(ref))
+        except Exception:
+            # Ветку сейчас обновляют — её loose-файл останется и перекроет упакованное значение
+            continue
+        try:
+            if _read_sha(path) == sha:
+                os.remove(path)
+        finally:
+            lock.release()
+        _remove_empty_dirs(os.path.dirname(path), os.path.join(vcs_dir, "refs", "heads"))
+    return len(refs)
+
+
+def _remove_empty_dirs(directory, stop):
+    while os.path.abspath(directory) != os.path.abspath(stop) and os.path.isdir(directory) and not os.listdir(directory):
+        os.rmdir(directory)
+        directory = os.path.dirname(directory)
@@ -1,110 +1,206 @@
 import json
 import os
-import hashlib
-import re
+import stat
 import time
+from concurrent.futures import ThreadPoolExecutor
 
-import requests
-from pathlib import Path
 import base64
 
+from core.index import Index, IndexEntry
+from core.objects import ObjectStore
+from core.ignore import DEFAULT_PATTERNS, IgnoreMatcher
+from core.tree import TREE_MODE, diff_trees, lookup_path, read_tree, walk_tree, write_tree
+from core.commit import format_commit, format_date, make_signature, read_commit
+from core.diff import BIG_FILE, is_binary, unified_diff
+from core.walk import compile_pathspecs, walk_worktree
+from core.refs import (
+    branch_name, check_branch_name, delete_ref, is_detached, list_refs, pack_refs, read_head, read_ref, ref_name,
+    update_ref
+)
+from core.transport import open_transport, recent_commits
+from core.graph import is_ancestor, merge_bases, remove_legacy_graph, update_commit_graph, walk_commits
+from core.output import verbose
+from core.trace import span
+
 class Repository:
+    """Репозиторий gitx. Публичные методы — стабильный API для встраивания: команды CLI и `gitx batch`
+    вызывают их же, а методы get_*/iter_*/resolve возвращают данные, ничего не печатая"""
+
     def __init__(self, path: str):
         self.path = path
         self.vcs_dir = os.path.join(path, ".gitx")
         self.__config_path = f"{self.vcs_dir}/config.json"
-        self.__index_path = f"{self.vcs_dir}/index.json"
+        self.__index_path = f"{self.vcs_dir}/index"
+        self.__legacy_index_path = f"{self.vcs_dir}/index.json"
         self.__head_path = f"{self.vcs_dir}/HEAD"
         self.__auth_path = f"{self.vcs_dir}/auth.json"
+        self.__remote_refs_path = f"{self.vcs_dir}/remote_refs.json"
+        # Не objects/info/commit-graph: по этому пути git ищет файл своего формата
+        self.__graph_path = os.path.join(self.vcs_dir, "objects", "info", "gitx-commit-graphs")
+        self.__monitor_socket = os.path.join(self.vcs_dir, "daemon.sock")
+        self.objects = ObjectStore(os.path.join(self.vcs_dir, "objects"))
+        # Кэш разобранных служебных файлов: path -> ((mtime_ns, size), значение)
+        self.__file_cache = {}
+        self.__index = None
+        self.__graph = None
 
     def __register_user(self):
         if not os.path.exists(self.__config_path):
-            with open(self.__config_path, "w") as file:
-                json.dump({"author": None, "remotes": {}}, file, indent=4)
+            self.__write_json(self.__config_path, {"author": None, "remotes": {}})
 
-    def __get_config(self):
-        with open(self.__config_path, "r") as file:
+    def __read_cached(self, path, loader, default=None):
+        """Читает файл через кэш; запись считается актуальной, пока не изменились mtime и размер файла"""
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            self.__file_cache.pop(path, None)
+            if default is None:
+                raise
+            return default()
+
+        signature = (st.st_mtime_ns, st.st_size)
+        cached = self.__file_cache.get(path)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+
+        value = loader(path)
+        self.__file_cache[path] = (signature, value)
+        return value
+
+    def __load_json(self, path):
+        with open(path, "r") as file:
             return json.load(file)
 
+    def __write_json(self, path, data):
+        self.__file_cache.pop(path, None)
+        with open(path, "w") as file:
+            json.dump(data, file, indent=4)
+
+    def __get_config(self):
+        return self.__read_cached(self.__config_path, self.__load_json)
+
     def __save_config(self, config):
-        with open(self.__config_path, "w") as file:
-            json.dump(config, file, indent=4)
+        self.__write_json(self.__config_path, config)
 
     def __get_auth(self):
-        if os.path.exists(self.__auth_path):
-            with open(self.__auth_path, "r") as file:
-                return json.load(file)
-        return {"token": None}
+        return self.__read_cached(self.__auth_path, self.__load_json, lambda: {"token": None})
 
-    def __get_ignore_patterns(self):
-        ignore_file = os.path.join(self.path, ".gitxignore")
-        patterns = []
-
-        if os.path.exists(ignore_file):
-            with open(ignore_file, 'r', encoding='utf-8') as f:
-                for line in f:
-                    line = line.strip()
-                    if line and not line.startswith('#'):
-                        patterns.append(line)
+    def __get_remote_refs(self):
+        return self.__read_cached(self.__remote_refs_path, self.__load_json, dict)
 
-        patterns.extend(['.gitx/', '__pycache__/', '*.pyc', '.git'])
-        return patterns
+    def __save_remote_refs(self, remote_refs):
+        self.__write_json(self.__remote_refs_path, remote_refs)
 
-    def __should_ignore(self, filepath, patterns):
-        relative_path = str(filepath.relative_to(self.path))
+    def __get_ignore_matcher(self):
+        ignore_file = os.path.join(self.path, ".gitxignore")
+        with span("ignore.load"):
+            matcher = IgnoreMatcher()
+
+            if os.path.exists(ignore_file):
+                matcher.add_file(ignore_file)
+
+            matcher.add_patterns(DEFAULT_PATTERNS)
+        return matcher
+
+    def iter_worktree(self, pathspecs=None):
+        """Общий для add и status проход по рабочему дереву: (relative_path, stat) неигнорируемых файлов"""
+        return walk_worktree(self.path, self.__get_ignore_matcher(), pathspecs)
+
+    def __query_monitor(self, index):
+        """Спрашивает gitx daemon: (token, пути для проверки) или (token, None), если нужен полный обход;
+        None — демон не запущен"""
+        if not os.path.exists(self.__monitor_socket):
+            return None
+        from core.monitor import query_monitor
+
+        with span("monitor.query") as query_span:
+            answer = query_monitor(self.__monitor_socket, index.monitor_token)
+            if answer is None:
+                return None
+            if answer["full"]:
+                query_span.set(full=True)
+                return answer["token"], None
+
+            # Пути, грязные на прошлый токен, проверяются снова вместе с новыми изменениями
+            candidates = set(index.monitor_dirty)
+            for path in answer["paths"]:
+                if path.endswith("/"):
+                    # Каталог удалён или перемещён целиком — проверяем всё, что в нём отслеживалось
+                    candidates.update(tracked for tracked in index if tracked.startswith(path))
+                else:
+                    candidates.add(path)
+            query_span.set(full=False, changed=len(answer["paths"]), candidates=len(candidates))
+        return answer["token"], candidates
 
-        for pattern in patterns:
-            regex_pattern = pattern.replace('.', '\\.').replace('*', '.*').replace('?', '.')
-            if re.match(regex_pattern, relative_path) or regex_pattern in relative_path:
-                return True
-            # Проверяем совпадение с путем
-            if pattern in relative_path:
-                return True
+    def daemon(self, stop=False):
+        if not os.path.exists(self.vcs_dir):
+            print("Not a gitx repository")
+            return False
+        from core.monitor import query_monitor, serve_monitor
 
-        return False
+        if stop:
+            stopped = query_monitor(self.__monitor_socket, None, {"stop": True})
+            print("Daemon stopped" if stopped else "Daemon is not running")
+            return bool(stopped)
+        else:
+            serve_monitor(self.path, self.vcs_dir, self.__get_ignore_matcher, self.__monitor_socket)
 
     def __save_auth(self, auth):
-        with open(self.__auth_path, "w") as file:
-            json.dump(auth, file, indent=4)
+        self.__write_json(self.__auth_path, auth)
 
     def __get_index(self):
-        if os.path.exists(self.__index_path):
-            with open(self.__index_path, "r") as file:
-                return json.load(file)
-        return {}
+        # Несохранённые изменения от прерванной операции не переиспользуем — перечитываем файл
+        index = self.__index
+        if index is not None and not index.dirty and index.mtime_ns == self.__stat_mtime(self.__index_path):
+            return index
+
+        index = Index(self.__index_path)
+        if os.path.exists(self.__legacy_index_path):
+            self.__migrate_legacy_index(index)
+        self.__index = index
+        return index
+
+    def __stat_mtime(self, path):
+        try:
+            return os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return 0
+
+    def __migrate_legacy_index(self, index):
+        """Переносит старый index.json с содержимым файлов в хранилище объектов"""
+        from pathlib import Path
+
+        with open(self.__legacy_index_path, "r") as file:
+            legacy = json.load(file)
+
+        for filepath, fileinfo in legacy.items():
+            if fileinfo.get("binary"):
+                content = base64.b64decode(fileinfo["content"])
+            else:
+                content = fileinfo["content"].encode('utf-8')
+            blob_hash = self.objects.write("blob", content)
+            # Нулевые stat-данные заставят перехешировать файл при следующем add
+            index.set(Path(filepath).as_posix(), IndexEntry(blob_hash, 0o100644, 0, 0, 0))
+
+        index.save()
+        os.remove(self.__legacy_index_path)
 
     def __save_index(self, index):
-        with open(self.__index_path, "w") as file:
-            json.dump(index, file, indent=4)
+        index.save()
 
     def __get_head(self):
-        if os.path.exists(self.__head_path):
-            with open(self.__head_path, "r") as file:
-                return file.read().strip()
-        return "refs/heads/main"
-
-    def __hash_file(self, filepath):
-        with open(filepath, 'rb') as f:
-            return hashlib.sha1(f.read()).hexdigest()
-
-    def __get_github_headers(self):
-        auth = self.__get_auth()
-        token = auth.get("token")
-        headers = {"Accept": "application/vnd.github.v3+json"}
-        if token:
-            headers["Authorization"] = f"token {token}"
-        return headers
-
-    def __github_api_request(self, method, url, data=None):
-        headers = self.__get_github_headers()
-        response = requests.request(method, url, headers=headers, json=data)
-
-        if response.status_code in [200, 201]:
-            return response.json() if response.content else None
-        else:
-            # Пробрасываем ошибку для обработки в основном методе
-            error_msg = response.json().get('message', f"HTTP {response.status_code}")
-            raise Exception(error_msg)
+        return self.__read_cached(self.__head_path, lambda path: read_head(self.vcs_dir), lambda: read_head(self.vcs_dir))
+
+    def __set_head(self, head):
+        self.__file_cache.pop(self.__head_path, None)
+        with open(self.__head_path, "w") as file:
+            file.write(head)
+
+    def __get_branch_commit(self, head):
+        # В отсоединённом состоянии HEAD хранит сам id коммита
+        if is_detached(head):
+            return head
+        return read_ref(self.vcs_dir, head)
 
     def init(self) -> bool:
         try:
@@ -114,8 +210,7 @@ class Repository:
 
             self.__register_user()
 
-            with open(self.__head_path, "w") as file:
-                file.write("refs/heads/main")
+            self.__set_head("refs/heads/main")
 
             print(f"Initialized empty gitx repository")
             return True
@@ -123,115 +218,561 @@ class Repository:
             print("Repository already exists")
             return False
 
-    def add(self, files):
-        index = self.__get_index()
-        ignore_patterns = self.__get_ignore_patterns()
+    def clone_archive(self, fileobj, remote_name, remote_url, branch, remote_sha, message, author, jobs=None):
+        """Распаковывает архив ревизии и сразу заполняет объекты, индекс и ссылки, без отдельного add"""
+        from core.archive import extract_tarball
 
-        # Если добавляется .gitxignore, добавляем его в первую очередь
-        if '.gitxignore' in files or '.gitxignore' in [f for pattern in files for f in Path(self.path).glob(pattern)]:
-            gitxignore_path = Path(self.path) / ".gitxignore"
-            if gitxignore_path.exists():
-                self.__add_single_file(gitxignore_path, index, ignore_patterns)
+        if not self.init():
+            return False
 
-        for pattern in files:
-            # Рекурсивно ищем файлы включая подпапки
-            for filepath in Path(self.path).rglob(pattern):
-                if filepath.is_file():
-                    # Пропускаем .gitxignore так как уже добавили выше
-                    if filepath.name == ".gitxignore":
-                        continue
+        index = self.__get_index()
+        with span("clone.extract") as extract_span:
+            for relative_path, blob_hash, st in extract_tarball(fileobj, self.path, self.objects, jobs):
+                index.set(relative_path, IndexEntry.from_stat(blob_hash, st))
+            extract_span.set(files=len(index))
 
-                    self.__add_single_file(filepath, index, ignore_patterns)
+        self.__set_head(f"refs/heads/{branch}")
 
+        tree_hash = write_tree(self.objects, index)
+        commit_hash = self.objects.write("commit", format_commit(tree_hash, [], author, message))
         self.__save_index(index)
+        update_ref(self.vcs_dir, branch, commit_hash)
 
-    def __add_single_file(self, filepath, index, ignore_patterns):
-        """Добавляет один файл в индекс с проверкой игнорирования"""
-        try:
-            # Проверяем не в ignore ли файл
-            if self.__should_ignore(filepath, ignore_patterns):
-                return
-
-            # Читаем файл как текст
-            with open(filepath, 'r', encoding='utf-8') as f:
-                content = f.read()
-
-            # Получаем относительный путь
-            relative_path = str(filepath.relative_to(self.path))
-
-            file_hash = hashlib.sha1(content.encode('utf-8')).hexdigest()
-            index[relative_path] = {
-                "hash": file_hash,
-                "timestamp": os.path.getmtime(filepath),
-                "content": content
-            }
-            print(f"Added {relative_path}")
-
-        except UnicodeDecodeError:
-            # Если файл бинарный, читаем как bytes
-            with open(filepath, 'rb') as f:
-                content = f.read()
-
-            relative_path = str(filepath.relative_to(self.path))
-            file_hash = hashlib.sha1(content).hexdigest()
-            index[relative_path] = {
-                "hash": file_hash,
-                "timestamp": os.path.getmtime(filepath),
-                "content": base64.b64encode(content).decode('utf-8'),
-                "binary": True
-            }
-            print(f"Added binary file {relative_path}")
+        self.remote("add", remote_name, remote_url)
+        # Клон соответствует удалённому коммиту — следующий push будет инкрементальным
+        self.__save_remote_refs({f"{remote_name}/{branch}": {"local": commit_hash, "remote": remote_sha}})
+        print(f"Checked out {len(index)} files on branch {branch}")
+        return True
 
+    def add(self, files, jobs=None):
+        index = self.__get_index()
+        # Как в git: путь или шаблон, которому не соответствует ни один файл, — ошибка, а не пустой add
+        for pathspec in files:
+            if not self.__pathspec_matches(pathspec, index):
+                print(f"pathspec '{pathspec}' did not match any files")
+                return False
+
+        # Один проход по дереву сразу для всех шаблонов; файлы с неизменёнными stat-данными не перечитываем
+        with span("add.walk") as walk_span:
+            changed, removed, monitor = self.__changed_files(index, files)
+            walk_span.set(changed=len(changed), removed=len(removed))
+
+        # Отслеживаемый файл, которого больше нет на диске, индексируется как удаление
+        for relative_path in removed:
+            index.remove(relative_path)
+            verbose(f"Removed {relative_path}")
+
+        # hashlib и zlib отпускают GIL на больших буферах, поэтому потоки хешируют параллельно;
+        # map отдаёт результаты в исходном порядке, так что вывод и индекс детерминированы
+        added = []
+        with span("add.write_objects", files=len(changed), bytes=sum(st.st_size for _, st in changed)):
+            with ThreadPoolExecutor(max_workers=jobs or os.cpu_count()) as pool:
+                for (relative_path, st), result in zip(changed, pool.map(self.__write_worktree_file, changed)):
+                    if self.__add_single_file(relative_path, st, result, index):
+                        added.append(relative_path)
+                    if monitor and isinstance(result, Exception):
+                        monitor[1].append(relative_path)
+
+        if monitor:
+            index.set_monitor(*monitor)
+        self.__save_index(index)
+        if added:
+            print(f"Added {len(added)} file{'' if len(added) == 1 else 's'}")
+        if removed:
+            print(f"Removed {len(removed)} file{'' if len(removed) == 1 else 's'}")
+        return added
+
+    def __pathspec_matches(self, pathspec, index):
+        spec = compile_pathspecs([pathspec])
+        if spec is None or os.path.exists(os.path.join(self.path, pathspec)):
+            return True
+        # Удалённый отслеживаемый файл тоже подходит: add проиндексирует удаление
+        if any(spec.fullmatch(path) for path in index):
+            return True
+        return next(iter(self.iter_worktree([pathspec])), None) is not None
+
+    def __changed_files(self, index, pathspecs):
+        """Изменённые файлы, удалённые отслеживаемые пути и состояние монитора (token, грязные пути) —
+        либо None вместо него, если дерево обходилось целиком"""
+        spec = compile_pathspecs(pathspecs)
+        monitor = self.__query_monitor(index)
+        if monitor is None or monitor[1] is None:
+            changed, seen = [], set()
+            for path, st in self.iter_worktree(pathspecs):
+                seen.add(path)
+                if not index.is_unchanged(path, st):
+                    changed.append((path, st))
+            # Обход не заходит в игнорируемые каталоги, поэтому непройденный путь проверяем на диске
+            removed = [
+                path for path in index
+                if path not in seen and (spec is None or spec.fullmatch(path))
+                and not os.path.isfile(os.path.join(self.path, path))
+            ]
+            return changed, removed, None
+
+        token, candidates = monitor
+        changed, removed, dirty = [], [], []
+        for path in sorted(candidates):
+            if spec is not None and not spec.fullmatch(path):
+                dirty.append(path)
+                continue
+            try:
+                st = os.stat(os.path.join(self.path, path))
+            except (FileNotFoundError, NotADirectoryError):
+                if path in index:
+                    removed.append(path)
+                continue
+            if stat.S_ISREG(st.st_mode) and not index.is_unchanged(path, st):
+                changed.append((path, st))
+        return changed, removed, (token, dirty)
+
+    def __write_worktree_file(self, item):
+        try:
+            with span("object.write_file", path=item[0], size=item[1].st_size):
+                return self.objects.write_file(os.path.join(self.path, item[0]))
         except Exception as e:
-            print(f"Error adding {filepath}: {e}")
+            return e
+
+    def __add_single_file(self, relative_path, st, result, index):
+        """Добавляет один файл в индекс по результату записи его объекта"""
+        if isinstance(result, Exception):
+            print(f"Error adding {relative_path}: {result}")
+            return False
+
+        previous = index.get(relative_path)
+        # Содержимое уже в хранилище объектов, в индексе остаются только stat-данные
+        index.set(relative_path, IndexEntry.from_stat(result, st))
+        if previous is None or previous.hash != result:
+            verbose(f"Added {relative_path}")
+            return True
+        return False
 
     def commit(self, message):
         index = self.__get_index()
         head = self.__get_head()
+        parent = self.__get_branch_commit(head)
+
+        # Объекты файлов уже записаны при add, пишутся только деревья изменённых каталогов
+        with span("commit.write_tree", entries=len(index)):
+            tree_hash = write_tree(self.objects, index)
+        if parent and read_commit(self.objects, parent)["tree"] == tree_hash:
+            print("Nothing to commit")
+            return False
+
+        author = make_signature(self.__get_config().get("author") or "Unknown", int(time.time()))
+        commit_hash = self.objects.write("commit", format_commit(tree_hash, [parent] if parent else [], author, message))
+        self.__save_index(index)
+        if is_detached(head):
+            self.__set_head(commit_hash)
+        else:
+            # Ветка сдвигается, только если её не успел сдвинуть параллельный commit или pull
+            update_ref(self.vcs_dir, head, commit_hash, parent, check_old=True)
 
-        commit_data = {
-            "tree": {},
-            "parent": None,
-            "author": "Unknown",
-            "message": message,
-            "timestamp": int(time.time())
+        print(f"Committed {commit_hash[:8]} {message}")
+        return commit_hash
+
+    def gc(self):
+        with span("gc.repack") as repack_span:
+            names = self.__collect_object_names(list(list_refs(self.vcs_dir).values()))
+            result = self.objects.repack(names)
+            repack_span.set(objects=len(names))
+        if result is None:
+            print("Nothing to pack")
+        else:
+            idx_path, count = result
+            print(f"Packed {count} objects into {os.path.basename(idx_path)[:-4]}")
+
+        print(f"Packed {pack_refs(self.vcs_dir)} refs")
+        print(f"Commit graph holds {len(self.__get_commit_graph(compact=True))} commits")
+
+    def __get_commit_graph(self, tips=None, compact=False):
+        """Граф коммитов, дополненный коммитами из tips (по умолчанию — из всех веток); разбираются только новые.
+        compact сливает слои графа в один"""
+        if tips is None:
+            tips = list(list_refs(self.vcs_dir).values())
+        if self.__graph is None:
+            remove_legacy_graph(os.path.dirname(self.__graph_path))
+        self.__graph = update_commit_graph(self.objects, self.__graph_path, tips, self.__graph, compact)
+        return self.__graph
+
+    def is_ancestor(self, ancestor, descendant):
+        """Достижим ли коммит ancestor из descendant; проверка идёт по графу коммитов"""
+        graph = self.__get_commit_graph([ancestor, descendant])
+        ancestor_position, descendant_position = graph.lookup(ancestor), graph.lookup(descendant)
+        if ancestor_position is None or descendant_position is None:
+            return False
+        return is_ancestor(graph, ancestor_position, descendant_position)
+
+    def __resolve_revision(self, revision):
+        """HEAD, имя ветки, полный id коммита или его однозначный префикс (от 4 символов)"""
+        if revision == "HEAD":
+            commit_hash = self.__get_branch_commit(self.__get_head())
+        else:
+            commit_hash = read_ref(self.vcs_dir, revision)
+
+        if not commit_hash and len(revision) == 40 and self.objects.exists(revision):
+            commit_hash = revision
+        elif not commit_hash and 4 <= len(revision) < 40 and all(c in "0123456789abcdef" for c in revision):
+            graph = self.__get_commit_graph()
+            matches = graph.find_prefix(revision)
+            if len(matches) > 1:
+                raise Exception(f"Short commit id {revision} is ambiguous")
+            commit_hash = graph.oid(matches[0]) if matches else None
+
+        if not commit_hash:
+            raise Exception(f"Unknown revision {revision}")
+        return commit_hash
+
+    def resolve(self, revision):
+        return self.__resolve_revision(revision)
+
+    def get_commit(self, revision):
+        """Разобранный коммит: id, tree, parents, author, committer, message"""
+        commit_hash = self.__resolve_revision(revision)
+        return {"id": commit_hash, **read_commit(self.objects, commit_hash)}
+
+    def iter_log(self, max_count=None, paths=None):
+        """id коммитов истории HEAD от новых к старым; paths оставляет только коммиты, менявшие эти пути"""
+        tip = self.__get_branch_commit(self.__get_head())
+        if not tip:
+            return
+
+        # Обход идёт по графу; объекты коммитов читаются только для выводимых записей
+        graph = self.__get_commit_graph([tip])
+        paths = [os.path.normpath(path).replace(os.sep, "/") for path in paths or []]
+        paths = [path for path in paths if path != "."]
+        shown = 0
+        for position in walk_commits(graph, [graph.lookup(tip)]):
+            if max_count is not None and shown >= max_count:
+                break
+            if paths and not self.__touches_paths(graph, position, paths):
+                continue
+            yield graph.oid(position)
+            shown += 1
+
+    def log(self, max_count=None, paths=None, oneline=False):
+        if not self.__get_branch_commit(self.__get_head()):
+            print("No commits yet")
+            return False
+
+        for commit_hash in self.iter_log(max_count, paths):
+            self.__print_log_entry(commit_hash, oneline)
+
+    def __touches_paths(self, graph, position, paths):
+        """Меняет ли коммит хотя бы один из путей относительно каждого из родителей"""
+        parents = graph.parents(position)
+        tree_hash = graph.tree(position)
+        for path in paths:
+            entry = lookup_path(self.objects, tree_hash, path)
+            if not parents:
+                if entry is not None:
+                    return True
+            elif all(lookup_path(self.objects, graph.tree(parent), path) != entry for parent in parents):
+                return True
+        return False
+
+    def __print_log_entry(self, commit_hash, oneline):
+        commit_data = read_commit(self.objects, commit_hash)
+        if oneline:
+            print(f"{commit_hash[:8]} {commit_data['message'].splitlines()[0] if commit_data['message'] else ''}")
+            return
+
+        author, timestamp, offset = commit_data["author"].rsplit(" ", 2)
+        print(f"commit {commit_hash}")
+        if len(commit_data["parents"]) > 1:
+            print(f"Merge: {' '.join(parent[:8] for parent in commit_data['parents'])}")
+        print(f"Author: {author}")
+        print(f"Date:   {format_date(int(timestamp), offset)}")
+        print()
+        for line in commit_data["message"].splitlines():
+            print(f"    {line}")
+        print()
+
+    def get_merge_bases(self, first, second):
+        first, second = self.__resolve_revision(first), self.__resolve_revision(second)
+        graph = self.__get_commit_graph([first, second])
+        return [graph.oid(position) for position in merge_bases(graph, graph.lookup(first), graph.lookup(second))]
+
+    def merge_base(self, first, second):
+        try:
+            bases = self.get_merge_bases(first, second)
+        except Exception as e:
+            print(e)
+            return False
+
+        for commit_hash in bases:
+            print(commit_hash)
+        return bases
+
+    def __collect_object_names(self, tips):
+        """Сопоставляет объектам пути из истории, чтобы gc дельтировал версии одного файла между собой"""
+        names = {}
+        pending = list(tips)
+        while pending:
+            current = pending.pop()
+            if current in names or not self.objects.exists(current):
+                continue
+            names[current] = ""
+            commit_data = read_commit(self.objects, current)
+            pending.extend(commit_data["parents"])
+
+            trees = [(commit_data["tree"], "")]
+            while trees:
+                tree_hash, prefix = trees.pop()
+                if tree_hash in names:
+                    continue
+                names[tree_hash] = prefix
+                for mode, name, oid in read_tree(self.objects, tree_hash):
+                    if mode == TREE_MODE:
+                        trees.append((oid, f"{prefix}{name}/"))
+                    else:
+                        names.setdefault(oid, f"{prefix}{name}")
+        return names
+
+    def __get_head_tree(self):
+        parent = self.__get_branch_commit(self.__get_head())
+        return read_commit(self.objects, parent)["tree"] if parent else None
+
+    def __is_modified(self, relative_path, st, index):
+        """Сравнивает файл с индексом: сначала по stat, и только при расхождении — по хешу"""
+        if index.is_unchanged(relative_path, st):
+            return False
+
+        entry = index.get(relative_path)
+        file_hash = self.objects.hash_file(os.path.join(self.path, relative_path))
+        if file_hash != entry.hash:
+            return True
+
+        # Содержимое то же — обновляем stat, чтобы в следующий раз не хешировать файл
+        index.set(relative_path, IndexEntry.from_stat(file_hash, st))
+        return False
+
+    def __staged_changes(self, index):
+        # Деревья индекса берутся из кэша, так что неизменённые каталоги отсекаются по id
+        index_tree = write_tree(self.objects, index)
+        for path, old, new in diff_trees(self.objects, self.__get_head_tree(), index_tree):
+            yield path, old and old[1], new and new[1]
+
+    def __unstaged_changes(self, index, pathspecs=None, candidates=None):
+        spec = compile_pathspecs(pathspecs)
+        # С монитором проверяются только пути, о которых сообщил gitx daemon
+        if candidates is None:
+            entries = index.items()
+        else:
+            entries = [(path, index.get(path)) for path in sorted(candidates) if path in index]
+        for path, entry in entries:
+            if spec is not None and not spec.fullmatch(path):
+                continue
+            full_path = os.path.join(self.path, path)
+            if not os.path.isfile(full_path):
+                yield path, entry.hash, None
+            elif self.__is_modified(path, os.stat(full_path), index):
+                yield path, entry.hash, full_path
+
+    def get_status(self):
+        """{"branch", "head", "staged": [(status, path)], "unstaged": [(status, path)], "untracked": [path]};
+        status — "added", "modified" или "deleted", branch — None при отсоединённом HEAD"""
+        index = self.__get_index()
+        head = self.__get_head()
+
+        with span("status.staged"):
+            staged = list(self.__staged_changes(index))
+        monitor = self.__query_monitor(index)
+        candidates = monitor[1] if monitor else None
+        with span("status.unstaged"):
+            unstaged = list(self.__unstaged_changes(index, candidates=candidates))
+        with span("status.untracked"):
+            if candidates is None:
+                untracked = [path for path, _ in self.iter_worktree() if path not in index]
+            else:
+                untracked = sorted(path for path in candidates
+                                   if path not in index and os.path.isfile(os.path.join(self.path, path)))
+        if monitor:
+            index.set_monitor(monitor[0], [path for path, _, _ in unstaged] + untracked)
+        self.__save_index(index)
+
+        return {
+            "branch": None if is_detached(head) else branch_name(head),
+            "head": self.__get_branch_commit(head),
+            "staged": [("added" if old is None else "deleted" if new is None else "modified", path)
+                       for path, old, new in staged],
+            "unstaged": [("deleted" if new is None else "modified", path) for path, _, new in unstaged],
+            "untracked": untracked,
         }
 
-        for filepath, fileinfo in index.items():
-            commit_data["tree"][filepath] = {
-                "hash": fileinfo["hash"],
-                "content": fileinfo["content"],
-                "binary": fileinfo.get("binary", False)  # сохраняем флаг бинарности
-            }
-
-            # Сохраняем объект файла
-            obj_path = os.path.join(self.vcs_dir, "objects", fileinfo["hash"])
-            if not os.path.exists(obj_path):
-                if fileinfo.get("binary"):
-                    # Для бинарных файлов сохраняем как есть
-                    with open(obj_path, 'wb') as f:
-                        f.write(base64.b64decode(fileinfo["content"]))
-                else:
-                    # Для текстовых файлов сохраняем как текст
-                    with open(obj_path, 'w', encoding='utf-8') as f:
-                        f.write(fileinfo["content"])
+    def status(self):
+        result = self.get_status()
+        if result["branch"] is None:
+            print(f"HEAD detached at {result['head'][:8]}")
+        else:
+            print(f"On branch {result['branch']}")
 
-        commit_hash = hashlib.sha1(json.dumps(commit_data, sort_keys=True).encode()).hexdigest()
-        commit_path = os.path.join(self.vcs_dir, "objects", commit_hash)
-        with open(commit_path, 'w', encoding='utf-8') as file:
-            json.dump(commit_data, file, indent=2, ensure_ascii=False)
+        for title, key in (("Changes to be committed", "staged"), ("Changes not staged for commit", "unstaged")):
+            if result[key]:
+                print(f"\n{title}:")
+                for label, path in result[key]:
+                    label = "new file" if label == "added" else label
+                    print(f"  {label + ':':<12}{path}")
 
-        branch_path = os.path.join(self.vcs_dir, head.replace('refs/heads/', ''))
-        with open(branch_path, 'w') as file:
-            file.write(commit_hash)
+        if result["untracked"]:
+            print("\nUntracked files:")
+            for path in result["untracked"]:
+                print(f"  {path}")
+
+        if not result["staged"] and not result["unstaged"] and not result["untracked"]:
+            print("nothing to commit, working tree clean")
+
+    def diff(self, paths=None, cached=False):
+        index = self.__get_index()
+
+        if cached:
+            spec = compile_pathspecs(paths)
+            for path, old, new in self.__staged_changes(index):
+                if spec is None or spec.fullmatch(path):
+                    self.__print_diff(path, old and self.__read_for_diff(old), new and self.__read_for_diff(new))
+        else:
+            for path, old, full_path in self.__unstaged_changes(index, paths):
+                new_data = self.__read_for_diff(full_path=full_path) if full_path else None
+                self.__print_diff(path, self.__read_for_diff(old), new_data)
+
+        self.__save_index(index)
+
+    def __read_for_diff(self, oid=None, full_path=None):
+        """Как core.bigFileThreshold в git: большие файлы не читаются и в diff показываются бинарными"""
+        size = os.path.getsize(full_path) if full_path else self.objects.info(oid)[1]
+        if size >= self.objects.large_file_threshold:
+            return BIG_FILE
+        if full_path:
+            with open(full_path, 'rb') as f:
+                return f.read()
+        return self.objects.read(oid)[1]
+
+    def __print_diff(self, path, old_data, new_data):
+        old_name = "/dev/null" if old_data is None else f"a/{path}"
+        new_name = "/dev/null" if new_data is None else f"b/{path}"
+        print(f"diff --git a/{path} b/{path}")
+
+        if any(data is not None and is_binary(data) for data in (old_data, new_data)):
+            print(f"Binary files {old_name} and {new_name} differ")
+            return
+
+        print(f"--- {old_name}")
+        print(f"+++ {new_name}")
+        old_lines = (old_data or b"").decode('utf-8', errors='replace').splitlines(keepends=True)
+        new_lines = (new_data or b"").decode('utf-8', errors='replace').splitlines(keepends=True)
+        # Ханки печатаются по мере вычисления, без сборки всего вывода в памяти
+        for line in unified_diff(old_lines, new_lines):
+            print(line, end="")
+
+    def current_branch(self):
+        """Имя текущей ветки или None при отсоединённом HEAD"""
+        head = self.__get_head()
+        return None if is_detached(head) else branch_name(head)
+
+    def get_branches(self):
+        """Имя ветки -> id её коммита"""
+        return {branch_name(ref): commit_hash for ref, commit_hash in list_refs(self.vcs_dir).items()}
+
+    def list_branches(self):
+        head = self.__get_head()
+        if is_detached(head):
+            print(f"* (HEAD detached at {head[:8]})")
+        for ref in list_refs(self.vcs_dir):
+            print(f"{'*' if ref == head else ' '} {branch_name(ref)}")
+
+    def create_branch(self, name, start=None):
+        try:
+            check_branch_name(name)
+            if read_ref(self.vcs_dir, name):
+                raise Exception(f"A branch named '{name}' already exists")
+            commit_hash = self.__resolve_revision(start or "HEAD")
+            update_ref(self.vcs_dir, name, commit_hash, None, check_old=True)
+        except Exception as e:
+            print(e)
+            return False
+
+        print(f"Created branch {name} at {commit_hash[:8]}")
+        return True
+
+    def delete_branch(self, name, force=False):
+        if ref_name(name) == self.__get_head():
+            print(f"Cannot delete the checked out branch '{name}'")
+            return False
+
+        commit_hash = read_ref(self.vcs_dir, name)
+        if not commit_hash:
+            print(f"Branch '{name}' not found")
+            return False
+
+        head_commit = self.__get_branch_commit(self.__get_head())
+        if not force and not (head_commit and self.is_ancestor(commit_hash, head_commit)):
+            print(f"The branch '{name}' is not fully merged. Use 'gitx branch -D {name}' to delete it")
+            return False
+
+        delete_ref(self.vcs_dir, name, commit_hash, check_old=True)
+        print(f"Deleted branch {name} (was {commit_hash[:8]})")
+        return True
 
-        print(f"Committed {commit_hash[:8]} {message}")
 
     def rename_branch(self, new_name):
-        if new_name:
-            with open(self.__head_path, "w") as file:
-                file.write(f"refs/heads/{new_name}")
-            print(f"Renamed branch to {new_name}")
+        if not new_name:
+            return False
+
+        head = self.__get_head()
+        # При отсоединённом HEAD переименовывать нечего; проверяем до того, как записана хоть одна ссылка
+        if is_detached(head):
+            print("You are not currently on a branch; use 'gitx checkout -b <name>' to create one")
+            return False
+        commit_hash = self.__get_branch_commit(head)
+        try:
+            check_branch_name(new_name)
+            if ref_name(new_name) != head and read_ref(self.vcs_dir, new_name):
+                raise Exception(f"A branch named '{new_name}' already exists")
+            if commit_hash and ref_name(new_name) != head:
+                update_ref(self.vcs_dir, new_name, commit_hash, None, check_old=True)
+                delete_ref(self.vcs_dir, head, commit_hash, check_old=True)
+        except Exception as e:
+            print(e)
+            return False
+
+        self.__set_head(ref_name(new_name))
+        print(f"Renamed branch to {new_name}")
+        return True
+
+
+    def checkout(self, target, create=False, jobs=None):
+        if create and not self.create_branch(target):
+            return False
+
+        # Сначала ищем ветку, затем коммит — во втором случае HEAD становится отсоединённым
+        ref = ref_name(target)
+        commit_hash = read_ref(self.vcs_dir, ref)
+        if commit_hash is None:
+            try:
+                commit_hash = self.__resolve_revision(target)
+            except Exception as e:
+                print(e)
+                return False
+            ref = commit_hash
+
+        head = self.__get_head()
+        if ref == head:
+            print(f"Already on '{target}'")
+            return True
+
+        current = self.__get_branch_commit(head)
+        old_tree = read_commit(self.objects, current)["tree"] if current else None
+        new_tree = read_commit(self.objects, commit_hash)["tree"]
+        if not self.__update_worktree(self.__get_index(), old_tree, new_tree, jobs):
+            return False
+
+        self.__set_head(ref)
+        if is_detached(ref):
+            print(f"HEAD is now at {commit_hash[:8]}")
+        else:
+            print(f"Switched to branch '{target}'")
+        return True
+
 
     def remote(self, action, name, url):
         config = self.__get_config()
@@ -247,164 +788,325 @@ class Repository:
         self.__save_auth(auth_data)
         print("GitHub token saved")
 
-    def push(self, remote_name, branch, set_upstream):
-        config = self.__get_config()
-        if "remotes" not in config or remote_name not in config["remotes"]:
+    def __get_remote_url(self, remote_name):
+        remote_url = self.__get_config().get("remotes", {}).get(remote_name)
+        if remote_url is None:
             print(f"Remote {remote_name} not found")
-            return
+        return remote_url
+
+    def clone_remote(self, url):
+        """Клонирует gitx-репозиторий по file:// или http(s)-адресу `gitx serve`"""
+        transport = open_transport(url)
+        branch = transport.get_head()
+        remote_sha = transport.get_ref(branch)
+        if not self.init():
+            return False
+
+        self.__set_head(f"refs/heads/{branch}")
+        self.remote("add", "origin", url)
+        if remote_sha is None:
+            print("Cloned an empty repository")
+            return True
+
+        count = transport.fetch(self.objects, remote_sha, [])
+        index = self.__get_index()
+        self.__update_worktree(index, None, read_commit(self.objects, remote_sha)["tree"])
+        update_ref(self.vcs_dir, branch, remote_sha)
+        self.__save_remote_refs({f"origin/{branch}": {"local": remote_sha, "remote": remote_sha}})
+        print(f"Received {count} objects, checked out {len(index)} files on branch {branch}")
+        return True
+
+    def fetch(self, remote_name, branch):
+        remote_url = self.__get_remote_url(remote_name)
+        if remote_url is None:
+            return False
+        if remote_url.startswith("https://github.com/"):
+            print("Fetching from GitHub remotes is not supported, use clone")
+            return False
+
+        transport = open_transport(remote_url)
+        remote_sha = transport.get_ref(branch)
+        if remote_sha is None:
+            print(f"Remote branch {branch} not found")
+            return False
+
+        remote_refs = self.__get_remote_refs()
+        tracking_key = f"{remote_name}/{branch}"
+        if not self.objects.exists(remote_sha):
+            # Сервер останавливает обход на первом общем коммите и отдаёт только недостающее
+            tracked = remote_refs.get(tracking_key, {}).get("remote")
+            haves = recent_commits(self.objects, [self.__get_branch_commit(self.__get_head()), tracked])
+            count = transport.fetch(self.objects, remote_sha, haves)
+            print(f"Received {count} objects")
+
+        remote_refs[tracking_key] = {"local": remote_sha, "remote": remote_sha}
+        self.__save_remote_refs(remote_refs)
+        print(f"From {remote_url}: {branch} -> {tracking_key} {remote_sha[:8]}")
+        return remote_sha
+
+    def pull(self, remote_name, branch):
+        remote_sha = self.fetch(remote_name, branch)
+        if not remote_sha:
+            return False
+
+        head = self.__get_head()
+        if is_detached(head):
+            print("You are not currently on a branch")
+            return False
+        local_sha = self.__get_branch_commit(head)
+        if local_sha == remote_sha or (local_sha and self.is_ancestor(remote_sha, local_sha)):
+            print("Already up to date")
+            return True
+        if local_sha and not self.is_ancestor(local_sha, remote_sha):
+            print("Cannot fast-forward: local and remote branches have diverged")
+            return False
+
+        index = self.__get_index()
+        old_tree = read_commit(self.objects, local_sha)["tree"] if local_sha else None
+        if not self.__update_worktree(index, old_tree, read_commit(self.objects, remote_sha)["tree"]):
+            return False
+        update_ref(self.vcs_dir, head, remote_sha, local_sha, check_old=True)
+        print(f"Fast-forward {local_sha[:8] if local_sha else '(none)'}..{remote_sha[:8]}")
+        return True
+
+
+    def apply_update(self, old_commit, new_commit):
+        """Переводит рабочее дерево с old_commit на new_commit; False, если это затёрло бы локальные изменения"""
+        old_tree = read_commit(self.objects, old_commit)["tree"] if old_commit else None
+        return self.__update_worktree(self.__get_index(), old_tree, read_commit(self.objects, new_commit)["tree"])
+
+    def __update_worktree(self, index, old_tree, new_tree, jobs=None):
+        """Переводит рабочее дерево и индекс с old_tree на new_tree, трогая только различающиеся файлы"""
+        changes = list(diff_trees(self.objects, old_tree, new_tree))
+
+        conflicts = []
+        for relative_path, old, new in changes:
+            entry = index.get(relative_path)
+            full_path = os.path.join(self.path, relative_path)
+            if (entry.hash if entry else None) != (old[1] if old else None):
+                conflicts.append(relative_path)
+            elif entry and os.path.exists(full_path) and self.__is_modified(relative_path, os.stat(full_path), index):
+                conflicts.append(relative_path)
+            elif not entry and os.path.exists(full_path):
+                conflicts.append(relative_path)
+        if conflicts:
+            print("Your local changes to the following files would be overwritten:")
+            for relative_path in conflicts:
+                print(f"  {relative_path}")
+            return False
+
+        # Сначала удаления: файл мог смениться каталогом с тем же именем и наоборот
+        for relative_path, old, new in changes:
+            if new is None:
+                full_path = os.path.join(self.path, relative_path)
+                if os.path.exists(full_path):
+                    os.remove(full_path)
+                index.remove(relative_path)
+                self.__remove_empty_dirs(os.path.dirname(full_path))
+
+        # Блобы пишутся параллельно, stat каждого файла сразу попадает в индекс — повторный add не нужен
+        additions = [(relative_path, new) for relative_path, _, new in changes if new is not None]
+        with span("worktree.update", changes=len(changes), writes=len(additions)):
+            with ThreadPoolExecutor(max_workers=jobs or os.cpu_count()) as pool:
+                for (relative_path, new), st in zip(additions, pool.map(self.__write_blob, additions)):
+                    index.set(relative_path, IndexEntry.from_stat(new[1], st))
+
+        self.__save_index(index)
+        return True
+
+    def __write_blob(self, item):
+        relative_path, (mode, blob_hash) = item
+        full_path = os.path.join(self.path, relative_path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        _, _, chunks = self.objects.stream(blob_hash)
+        with open(full_path, 'wb') as file:
+            for chunk in chunks:
+                file.write(chunk)
+            os.chmod(full_path, 0o755 if mode == "100755" else 0o644)
+            return os.fstat(file.fileno())
+
+    def __remove_empty_dirs(self, directory):
+        root = os.path.abspath(self.path)
+        directory = os.path.abspath(directory)
+        while directory != root and os.path.isdir(directory) and not os.listdir(directory):
+            os.rmdir(directory)
+            directory = os.path.dirname(directory)
+
+    def __push_transport(self, remote_url, remote_name, branch, commit_hash, force):
+        """push в gitx-репозиторий: передаётся один pack с объектами, которых у удалённой стороны нет"""
+        transport = open_transport(remote_url)
+        remote_sha = transport.get_ref(branch)
+        if remote_sha == commit_hash:
+            print("Everything up-to-date")
+            return True
+
+        known = []
+        if remote_sha and self.objects.exists(remote_sha) and self.is_ancestor(remote_sha, commit_hash):
+            known = [remote_sha]
+        elif remote_sha and not force:
+            print("Updates were rejected because the remote contains work that you do not have locally")
+            print("Use 'gitx push --force' to overwrite it")
+            return False
+
+        count = transport.push(self.objects, branch, remote_sha, commit_hash, known, force)
+        remote_refs = self.__get_remote_refs()
+        remote_refs[f"{remote_name}/{branch}"] = {"local": commit_hash, "remote": commit_hash}
+        self.__save_remote_refs(remote_refs)
+        print(f"Push completed successfully: {count} objects, {(remote_sha or '(none)')[:8]}..{commit_hash[:8]}")
+        return True
+
+    def push(self, remote_name, branch, set_upstream, jobs=None, force=False):
+        remote_url = self.__get_remote_url(remote_name)
+        if remote_url is None:
+            return False
 
-        remote_url = config["remotes"][remote_name]
         if not remote_url.startswith("https://github.com/"):
-            print("Only GitHub remotes supported")
-            return
+            commit_hash = self.__get_branch_commit(self.__get_head())
+            if not commit_hash:
+                print("No commits to push")
+                return False
+            print(f"Pushing to {remote_url}...")
+            try:
+                return self.__push_transport(remote_url, remote_name, branch, commit_hash, force)
+            except Exception as e:
+                print(f"Push failed: {e}")
+                return False
 
         parts = remote_url.replace("https://github.com/", "").split("/")
         if len(parts) < 2:
             print("Invalid remote URL")
-            return
+            return False
+
+        # requests нужен только сетевым командам, поэтому загружается здесь, а не при старте
+        from core.github import PUSH_JOBS, GitHubClient, UploadJournal
 
         owner, repo = parts[0], parts[1].replace(".git", "")
         branch_ref = self.__get_head().replace("refs/heads/", "")
 
         print(f"Pushing to {remote_url}...")
 
+        journal = None
         try:
-            branch_file = os.path.join(self.vcs_dir, branch_ref)
-            if not os.path.exists(branch_file):
+            commit_hash = self.__get_branch_commit(branch_ref)
+            if not commit_hash:
                 print("No commits to push")
-                return
-
-            with open(branch_file, "r") as f:
-                commit_hash = f.read().strip()
+                return False
 
-            commit_path = os.path.join(self.vcs_dir, "objects", commit_hash)
-            if not os.path.exists(commit_path):
+            if not self.objects.exists(commit_hash):
                 print(f"Commit {commit_hash} not found")
-                return
-
-            with open(commit_path, "r", encoding='utf-8') as f:
-                commit_data = json.load(f)
+                return False
 
             auth = self.__get_auth()
             if not auth.get("token"):
                 print("GitHub token not set. Use: gitx auth <token>")
-                return
+                return False
 
             print(f"Pushing commit {commit_hash[:8]} to {owner}/{repo} on branch {branch}")
 
-            base_url = f"https://api.github.com/repos/{owner}/{repo}"
-
-            tree_data = self.__build_tree_data(commit_data["tree"])
-
-            if not tree_data:
-                print("No files to push")
-                return
-
-            self.__push_to_empty_repo(base_url, tree_data, commit_data["message"], branch)
+            remote_refs = self.__get_remote_refs()
+            tracking_key = f"{remote_name}/{branch}"
+            tracked = remote_refs.get(tracking_key)
+
+            journal = UploadJournal(os.path.join(self.vcs_dir, "journal", "github", owner, repo))
+            if journal.uploaded:
+                print(f"Resuming interrupted push: {len(journal.uploaded)} blobs already uploaded")
+
+            with GitHubClient(owner, repo, auth["token"], jobs or PUSH_JOBS, journal=journal) as client:
+                remote_head = client.get_ref(branch)
+                remote_parent = remote_tree = None
+                stop_at = None
+
+                if client.empty:
+                    # Коммит-заглушка будет перезаписан, но его дерево уже есть на сервере
+                    remote_head = self.__initialize_empty_remote(client, commit_hash, branch)
+                    remote_tree = client.get_commit(remote_head)["tree"]["sha"]
+                    force = True
+                elif remote_head and tracked and tracked["remote"] == remote_head and (
+                        tracked["local"] == commit_hash or self.is_ancestor(tracked["local"], commit_hash)):
+                    # Коммиты до tracked["local"] уже на сервере, только если пушим его потомка — иначе это не fast-forward
+                    if tracked["local"] == commit_hash:
+                        print("Everything up-to-date")
+                        return True
+                    remote_parent, stop_at = remote_head, tracked["local"]
+                    remote_tree = read_commit(self.objects, stop_at)["tree"]
+                elif remote_head and not force:
+                    print("Updates were rejected because the remote contains work that you do not have locally")
+                    print("Use 'gitx push --force' to overwrite it")
+                    return False
+                elif remote_head:
+                    # При принудительной перезаписи удалённое дерево служит базой, чтобы не загружать то, что уже есть
+                    remote_tree = client.get_commit(remote_head)["tree"]["sha"]
+
+                for local_commit in self.__commits_to_push(commit_hash, stop_at):
+                    with span("push.commit", commit=local_commit):
+                        commit_data = read_commit(self.objects, local_commit)
+                        remote_tree = self.__push_tree(client, remote_tree, commit_data["tree"])
+                        remote_parent = client.create_commit(
+                            commit_data["message"], remote_tree, [remote_parent] if remote_parent else []
+                        )
+
+                client.set_ref(branch, remote_parent, remote_head is not None, force=force)
+
+            # Ветка обновлена, все загруженные блобы достижимы — журнал больше не нужен
+            journal.clear()
+            remote_refs[tracking_key] = {"local": commit_hash, "remote": remote_parent}
+            self.__save_remote_refs(remote_refs)
+            print(f"Push completed successfully: {remote_parent[:8]}")
+            return True
 
         except Exception as e:
             print(f"Push failed: {e}")
+            if journal is not None:
+                journal.close()
+                if journal.uploaded:
+                    print(f"{len(journal.uploaded)} uploaded blobs are journaled, run push again to resume")
+            return False
 
-    def __build_tree_data(self, commit_tree):
-        tree_data = []
-
-        for filepath, file_info in commit_tree.items():
-            is_binary = file_info.get("binary", False)
-            content = file_info["content"]
+    def __commits_to_push(self, commit_hash, stop_at):
+        """Локальные коммиты от stop_at (не включая) до commit_hash, от старых к новым"""
+        commits = []
+        current = commit_hash
+        while current and current != stop_at:
+            commits.append(current)
+            parents = read_commit(self.objects, current)["parents"]
+            current = parents[0] if parents else None
+        commits.reverse()
+        return commits
+
+    def __initialize_empty_remote(self, client, commit_hash, branch):
+        """Git Data API не работает с пустым репозиторием, поэтому первый файл создаётся через contents API"""
+        tree_hash = read_commit(self.objects, commit_hash)["tree"]
+        filepath, _, blob_hash = next(walk_tree(self.objects, tree_hash))
+        client.put_file(filepath, self.objects.read(blob_hash)[1], "Initial commit", branch)
+        return client.get_ref(branch)
+
+    def __push_tree(self, client, remote_tree, local_tree):
+        """Создаёт на сервере дерево local_tree поверх remote_tree, загружая только изменённые файлы"""
+        if remote_tree == local_tree:
+            return remote_tree
+
+        # Локальные id деревьев совпадают с id GitHub, поэтому известные поддеревья сравниваются локально,
+        # а неизвестные читаются через API; одинаковые поддеревья пропускаются целиком
+        def read_remote(tree_hash):
+            if self.objects.exists(tree_hash):
+                return read_tree(self.objects, tree_hash)
+            return client.get_tree(tree_hash)
+
+        changes = list(diff_trees(self.objects, remote_tree, local_tree, read_old=read_remote))
+        tree_data = self.__build_tree_data(client, changes)
+        return client.create_tree(tree_data, base_tree=remote_tree)
+
+    def __build_tree_data(self, client, changes):
+        # Новые блобы загружаются параллельно, затем дерево ссылается на них по sha одним запросом
+        with span("push.upload_blobs") as upload_span:
+            blob_shas = client.upload_blobs(self.objects, [new[1] for _, _, new in changes if new is not None])
+            upload_span.set(blobs=len(blob_shas))
+        verbose(f"Uploaded {len(blob_shas)} blobs")
 
-            if is_binary:
-                encoded_content = content
+        tree_data = []
+        for filepath, old, new in changes:
+            if new is None:
+                tree_data.append({"path": filepath, "mode": old[0], "type": "blob", "sha": None})
             else:
-                encoded_content = base64.b64encode(content.encode('utf-8')).decode('utf-8')
-
-            tree_data.append({
-                "path": filepath,
-                "mode": "100644",
-                "type": "blob",
-                "content": encoded_content
-            })
-            file_type = "binary" if is_binary else "text"
-            print(f"Preparing {filepath} ({file_type})")
-
+                tree_data.append({"path": filepath, "mode": new[0], "type": "blob", "sha": blob_shas[new[1]]})
         return tree_data
-
-    def __push_to_empty_repo(self, base_url, tree_data, message, branch):
-        try:
-            tree_response = requests.post(
-                f"{base_url}/git/trees",
-                headers=self.__get_github_headers(),
-                json={"tree": tree_data}
-            )
-
-            if tree_response.status_code not in [200, 201]:
-                raise Exception(f"Failed to create tree: {tree_response.text}")
-
-            tree_sha = tree_response.json()["sha"]
-
-            commit_response = requests.post(
-                f"{base_url}/git/commits",
-                headers=self.__get_github_headers(),
-                json={
-                    "message": message,
-                    "tree": tree_sha,
-                    "parents": []
-                }
-            )
-
-            if commit_response.status_code not in [200, 201]:
-                raise Exception(f"Failed to create commit: {commit_response.text}")
-
-            commit_sha = commit_response.json()["sha"]
-
-            ref_response = requests.post(
-                f"{base_url}/git/refs",
-                headers=self.__get_github_headers(),
-                json={"ref": f"refs/heads/{branch}", "sha": commit_sha}
-            )
-
-            if ref_response.status_code not in [200, 201]:
-                raise Exception(f"Failed to create branch: {ref_response.text}")
-
-            print(f"Push completed successfully: {commit_sha[:8]}")
-
-        except Exception as e:
-            if "empty" in str(e).lower() or "409" in str(e):
-                self.__push_via_contents_api_with_dirs(base_url, tree_data, message, branch)
-            else:
-                raise e
-
-    def __push_via_contents_api_with_dirs(self, base_url, tree_data, message, branch):
-        created_dirs = set()
-
-        for file_data in tree_data:
-            filepath = file_data["path"]
-            dir_path = os.path.dirname(filepath)
-
-            if dir_path and dir_path not in created_dirs:
-                parts = dir_path.split('/')
-                current_path = ""
-                for part in parts:
-                    current_path = os.path.join(current_path, part).replace('\\', '/')
-                    if current_path and current_path not in created_dirs:
-                        created_dirs.add(current_path)
-
-            try:
-                response = requests.put(
-                    f"{base_url}/contents/{filepath}",
-                    headers=self.__get_github_headers(),
-                    json={
-                        "message": message,
-                        "content": file_data["content"],
-                        "branch": branch
-                    }
-                )
-
-                if response.status_code in [200, 201]:
-                    print(f"Created {filepath}")
-                else:
-                    print(f"Failed to create {filepath}: {response.text}")
-
-            except Exception as e:
-                print(f"Error creating {filepath}: {e}")
-
-
@@ -0,0 +1,116 @@
+import json
+import os
+import tempfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+from core.transport import LocalEndpoint, check_update, store_payload, write_payload
+
+
+class _LimitedReader:
+    """Читает из сокета не больше Content-Length байт, чтобы не ждать закрытия соединения"""
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size) if size else b""
+        self.remaining -= len(data)
+        return data
+
+
+class ProtocolHandler(BaseHTTPRequestHandler):
+    repository_path = None
+
+    def setup(self):
+        super().setup()
+        # Своё хранилище на каждое соединение: pack-файлы перечитываются после push
+        self.endpoint = LocalEndpoint(self.repository_path)
+
+    def finish(self):
+        super().finish()
+        self.endpoint.objects.close_packs()
+
+    def __send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def __body(self):
+        return _LimitedReader(self.rfile, int(self.headers.get("Content-Length", 0)))
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == "/head":
+            self.__send_json(200, {"branch": self.endpoint.get_head()})
+        elif path.startswith("/refs/"):
+            try:
+                sha = self.endpoint.get_ref(unquote(path[len("/refs/"):]))
+            except Exception as e:
+                return self.__send_json(400, {"message": str(e)})
+            self.__send_json(200, {"sha": sha})
+        else:
+            self.__send_json(404, {"message": "Not Found"})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        try:
+            if url.path == "/fetch":
+                self.__fetch()
+            elif url.path == "/push":
+                self.__push({key: values[0] for key, values in parse_qs(url.query).items()})
+            else:
+                self.__send_json(404, {"message": "Not Found"})
+        except Exception as e:
+            self.__send_json(409, {"message": str(e)})
+
+    def __fetch(self):
+        request = json.loads(self.__body().read())
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            idx_path, count = self.endpoint.upload_pack(tmp_dir, request["want"], request.get("haves", []))
+            payload_path = os.path.join(tmp_dir, "payload")
+            with open(payload_path, 'wb') as payload:
+                write_payload(idx_path, payload)
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(os.path.getsize(payload_path)))
+            self.send_header("X-Gitx-Objects", str(count))
+            self.end_headers()
+            with open(payload_path, 'rb') as payload:
+                while chunk := payload.read(1 << 20):
+                    self.wfile.write(chunk)
+
+    def __push(self, params):
+        branch, old, new = params.get("branch", ""), params.get("old") or None, params.get("new", "")
+        # Имя ветки ведёт к файлу в .gitx, поэтому проверяем его до того, как принять pack-файл
+        try:
+            check_update(branch, old, new)
+        except Exception as e:
+            return self.__send_json(400, {"message": str(e)})
+        store_payload(self.endpoint.objects.pack_dir, self.__body())
+        self.endpoint.receive_pack(branch, old, new, bool(params.get("force")))
+        self.__send_json(200, {"ref": branch, "sha": new})
+
+    def log_message(self, format, *args):
+        print(f"{self.address_string()} {format % args}")
+
+
+def serve(path, host="127.0.0.1", port=8000):
+    # Проверяем, что каталог — репозиторий, до запуска сервера
+    LocalEndpoint(path)
+    handler = type("Handler", (ProtocolHandler,), {"repository_path": path})
+    server = ThreadingHTTPServer((host, port), handler)
+    print(f"Serving {os.path.abspath(path)} on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
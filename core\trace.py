@@ -0,0 +1,129 @@
+"""Трассировка по фазам: GITX_TRACE=1 (stderr) или GITX_TRACE=<файл>, формат — GITX_TRACE_FORMAT=json|chrome.
+
+json — по строке JSON на завершённый span; chrome — массив событий для chrome://tracing и Perfetto.
+Пока трассировка выключена, span() возвращает общий пустой объект и почти ничего не стоит.
+"""
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+
+FORMATS = ("json", "chrome")
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span:
+    __slots__ = ("tracer", "name", "attrs", "start")
+
+    def __init__(self, tracer, name, attrs):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+        self.start = 0
+
+    def set(self, **attrs):
+        """Добавляет атрибуты, известные только к концу фазы: число файлов, HTTP-статус, байты"""
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        self.tracer.emit(self.name, self.start, time.perf_counter_ns() - self.start, self.attrs)
+        return False
+
+
+class Tracer:
+    def __init__(self, file, trace_format="json"):
+        if trace_format not in FORMATS:
+            raise Exception(f"Unknown trace format {trace_format}")
+        self.file = file
+        self.format = trace_format
+        self.origin = time.perf_counter_ns()
+        self.pid = os.getpid()
+        self.lock = threading.Lock()
+        if self.format == "chrome":
+            self.file.write("[\n")
+
+    def emit(self, name, start, duration, attrs):
+        if self.format == "chrome":
+            record = {
+                "name": name, "cat": name.split(".", 1)[0], "ph": "X", "pid": self.pid, "tid": threading.get_ident(),
+                "ts": (start - self.origin) / 1000, "dur": duration / 1000, "args": attrs,
+            }
+            line = json.dumps(record, default=str) + ",\n"
+        else:
+            record = {
+                "name": name, "thread": threading.current_thread().name,
+                "start_us": (start - self.origin) // 1000, "duration_us": duration // 1000, **attrs,
+            }
+            line = json.dumps(record, default=str) + "\n"
+        with self.lock:
+            self.file.write(line)
+
+    def close(self):
+        with self.lock:
+            if self.format == "chrome":
+                # Завершающее событие без запятой делает файл корректным JSON-массивом
+                end = {"name": "trace.end", "ph": "i", "s": "g", "pid": self.pid, "tid": threading.get_ident(),
+                       "ts": (time.perf_counter_ns() - self.origin) / 1000}
+                self.file.write(json.dumps(end) + "\n]\n")
+            if self.file is sys.stderr:
+                self.file.flush()
+            else:
+                self.file.close()
+
+
+_tracer = None
+
+
+def enable(target="stderr", trace_format=None):
+    """Включает трассировку в stderr или в файл; повторный вызов заменяет прежнего получателя"""
+    global _tracer
+    disable()
+    if target in ("1", "true", "stderr", "-"):
+        file = sys.stderr
+    else:
+        file = open(target, "w", buffering=1 << 16)
+    _tracer = Tracer(file, trace_format or "json")
+
+
+def disable():
+    global _tracer
+    if _tracer is not None:
+        _tracer.close()
+        _tracer = None
+
+
+def enabled():
+    return _tracer is not None
+
+
+def span(name, **attrs):
+    if _tracer is None:
+        return _NULL_SPAN
+    return Span(_tracer, name, attrs)
+
+
+atexit.register(disable)
+
+if os.environ.get("GITX_TRACE"):
+    enable(os.environ["GITX_TRACE"], os.environ.get("GITX_TRACE_FORMAT"))
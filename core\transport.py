@@ -0,0 +1,262 @@
+import hashlib
+import os
+import re
+import shutil
+import struct
+import tempfile
+
+from core.commit import read_commit
+from core.objects import ObjectStore, read_chunks
+from core.pack import write_pack
+from core.refs import check_branch_name, lock_ref, read_head, read_ref, update_ref
+from core.tree import TREE_MODE, read_tree
+from core.trace import span
+
+# Сколько последних коммитов клиент сообщает серверу как уже имеющиеся
+MAX_HAVES = 256
+
+
+def check_update(branch, old, new):
+    """Проверяет присланные клиентом имя ветки и id коммитов до того, как они коснутся файловой системы"""
+    check_branch_name(branch)
+    if not re.fullmatch(r"[0-9a-f]{40}", new or "") or (old and not re.fullmatch(r"[0-9a-f]{40}", old)):
+        raise Exception("Invalid commit id")
+
+
+def recent_commits(objects, tips, limit=MAX_HAVES):
+    commits = []
+    pending = [tip for tip in tips if tip]
+    while pending and len(commits) < limit:
+        current = pending.pop(0)
+        if current in commits or not objects.exists(current):
+            continue
+        commits.append(current)
+        pending.extend(read_commit(objects, current)["parents"])
+    return commits
+
+
+def _tree_objects(objects, tree_hash, base_hash, result, seen):
+    # Поддеревья, совпадающие по id с деревом родителя, у получателя уже есть
+    if tree_hash == base_hash or tree_hash in seen:
+        return
+    seen.add(tree_hash)
+    result.append(tree_hash)
+
+    base = {name: (mode, oid) for mode, name, oid in read_tree(objects, base_hash)} if base_hash else {}
+    for mode, name, oid in read_tree(objects, tree_hash):
+        base_entry = base.get(name)
+        if base_entry == (mode, oid):
+            continue
+        if mode == TREE_MODE:
+            _tree_objects(objects, oid, base_entry[1] if base_entry and base_entry[0] == TREE_MODE else None, result, seen)
+        elif oid not in seen:
+            seen.add(oid)
+            result.append(oid)
+
+
+def missing_objects(objects, tip, known):
+    """Объекты, достижимые из tip, но не из коммитов known; для каждого нового коммита
+    берутся только отличия от дерева родителя, так что объём пропорционален изменениям"""
+    known = set(known)
+    commits = []
+    pending = [tip]
+    visited = set()
+    while pending:
+        current = pending.pop()
+        if current in known or current in visited:
+            continue
+        visited.add(current)
+        commits.append(current)
+        pending.extend(read_commit(objects, current)["parents"])
+
+    result = []
+    seen = set()
+    for commit_hash in commits:
+        commit_data = read_commit(objects, commit_hash)
+        result.append(commit_hash)
+        parents = commit_data["parents"]
+        base_tree = read_commit(objects, parents[0])["tree"] if parents and objects.exists(parents[0]) else None
+        _tree_objects(objects, commit_data["tree"], base_tree, result, seen)
+    return result
+
+
+def write_payload(idx_path, file):
+    """Формат передачи pack-файла: длина .idx (4 байта), .idx, затем сам .pack"""
+    if idx_path is None:
+        file.write(struct.pack(">I", 0))
+        return
+    with open(idx_path, 'rb') as idx:
+        idx_data = idx.read()
+    file.write(struct.pack(">I", len(idx_data)))
+    file.write(idx_data)
+    with open(idx_path[:-4] + ".pack", 'rb') as pack:
+        shutil.copyfileobj(pack, file)
+
+
+def store_payload(pack_dir, fileobj):
+    """Принимает pack-файл из потока, проверяет контрольные суммы и кладёт его в pack_dir"""
+    idx_size = struct.unpack(">I", fileobj.read(4))[0]
+    if not idx_size:
+        return None
+    idx_data = fileobj.read(idx_size)
+
+    os.makedirs(pack_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=pack_dir, prefix="tmp_pack_")
+    try:
+        sha = hashlib.sha1()
+        tail = b""
+        with os.fdopen(fd, 'wb') as pack:
+            for chunk in read_chunks(fileobj):
+                pack.write(chunk)
+                # Последние 20 байт — сама контрольная сумма, в хеш они не входят
+                data = tail + chunk
+                sha.update(data[:-20])
+                tail = data[-20:]
+
+        if sha.digest() != tail or idx_data[-40:-20] != tail:
+            raise Exception("Received pack is corrupted")
+
+        name = os.path.join(pack_dir, f"pack-{tail.hex()}")
+        os.replace(tmp_path, f"{name}.pack")
+        with open(f"{name}.idx", 'wb') as idx:
+            idx.write(idx_data)
+        return f"{name}.idx"
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class LocalEndpoint:
+    """Серверная сторона протокола над репозиторием на диске; её используют file:// и HTTP-сервер"""
+
+    def __init__(self, path):
+        self.path = path
+        self.vcs_dir = os.path.join(path, ".gitx")
+        if not os.path.isdir(self.vcs_dir):
+            raise Exception(f"Not a gitx repository: {path}")
+        self.objects = ObjectStore(os.path.join(self.vcs_dir, "objects"))
+
+    def get_head(self):
+        return read_head(self.vcs_dir).replace("refs/heads/", "")
+
+    def get_ref(self, branch):
+        return read_ref(self.vcs_dir, check_branch_name(branch))
+
+    def upload_pack(self, pack_dir, want, haves):
+        """Пишет в pack_dir объекты от want, которых нет у клиента; возвращает (путь к .idx, число объектов)"""
+        known = [commit_hash for commit_hash in haves if self.objects.exists(commit_hash)]
+        order = missing_objects(self.objects, want, known)
+        if not order:
+            return None, 0
+        return write_pack(pack_dir, self.objects, order), len(order)
+
+    def receive_pack(self, branch, old, new, force=False):
+        check_update(branch, old, new)
+        # Новый pack-файл уже лежит в каталоге, перечитываем список
+        self.objects.close_packs()
+        if not self.objects.exists(new):
+            raise Exception(f"Pushed commit {new} is missing")
+
+        from core.repository import Repository
+        repository = Repository(self.path)
+        # Ветка заблокирована, пока обновляется рабочее дерево: иначе при проигранной гонке дерево
+        # уже переведено на new, а ветка осталась прежней
+        lock = lock_ref(self.vcs_dir, branch, old, check_old=True)
+        try:
+            if old and not force and not repository.is_ancestor(old, new):
+                raise Exception("Updates were rejected because the remote contains work that you do not have locally")
+            if branch == self.get_head():
+                # Как receive.denyCurrentBranch=updateInstead в git: рабочее дерево обновляется вместе с веткой
+                if not repository.apply_update(old, new):
+                    raise Exception("Remote working tree has local changes to the updated files")
+            update_ref(self.vcs_dir, branch, new, lock=lock)
+        finally:
+            lock.release()
+
+
+class FileTransport:
+    def __init__(self, path):
+        self.endpoint = LocalEndpoint(path)
+
+    def get_head(self):
+        return self.endpoint.get_head()
+
+    def get_ref(self, branch):
+        return self.endpoint.get_ref(branch)
+
+    def fetch(self, objects, want, haves):
+        # Pack пишется сразу в хранилище получателя, без промежуточной копии
+        _, count = self.endpoint.upload_pack(objects.pack_dir, want, haves)
+        objects.close_packs()
+        return count
+
+    def push(self, objects, branch, old, new, known, force=False):
+        order = missing_objects(objects, new, known)
+        if order:
+            write_pack(self.endpoint.objects.pack_dir, objects, order)
+        self.endpoint.receive_pack(branch, old, new, force)
+        return len(order)
+
+
+class HttpTransport:
+    """Клиент протокола `gitx serve`: обмен списками have/want в JSON и pack-файлами в теле запроса"""
+
+    def __init__(self, url):
+        import requests
+
+        self.url = url.rstrip("/")
+        self.session = requests.Session()
+
+    def __send(self, method, path, sent=0, **kwargs):
+        with span("http.request", method=method, path=path) as request_span:
+            response = self.session.request(method, f"{self.url}{path}", **kwargs)
+            received = response.headers.get("Content-Length") if kwargs.get("stream") else len(response.content)
+            request_span.set(status=response.status_code, sent=sent, received=received)
+        return response
+
+    def __check(self, response):
+        if response.status_code != 200:
+            try:
+                message = response.json().get("message", f"HTTP {response.status_code}")
+            except ValueError:
+                message = f"HTTP {response.status_code}"
+            raise Exception(message)
+        return response
+
+    def get_head(self):
+        return self.__check(self.__send("GET", "/head")).json()["branch"]
+
+    def get_ref(self, branch):
+        return self.__check(self.__send("GET", f"/refs/{branch}")).json()["sha"]
+
+    def fetch(self, objects, want, haves):
+        response = self.__check(self.__send("POST", "/fetch", json={"want": want, "haves": haves}, stream=True))
+        with response:
+            response.raw.decode_content = True
+            count = int(response.headers.get("X-Gitx-Objects", 0))
+            store_payload(objects.pack_dir, response.raw)
+        objects.close_packs()
+        return count
+
+    def push(self, objects, branch, old, new, known, force=False):
+        order = missing_objects(objects, new, known)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            idx_path = write_pack(tmp_dir, objects, order) if order else None
+            payload_path = os.path.join(tmp_dir, "payload")
+            with open(payload_path, 'wb') as payload:
+                write_payload(idx_path, payload)
+
+            params = {"branch": branch, "old": old or "", "new": new, "force": "1" if force else ""}
+            with open(payload_path, 'rb') as payload:
+                sent = os.path.getsize(payload_path)
+                self.__check(self.__send("POST", "/push", sent=sent, params=params, data=payload))
+        return len(order)
+
+
+def open_transport(url):
+    if url.startswith("file://"):
+        return FileTransport(url[len("file://"):])
+    if url.startswith(("http://", "https://")):
+        return HttpTransport(url)
+    return FileTransport(url)
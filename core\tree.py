@@ -0,0 +1,119 @@
+TREE_MODE = "40000"
+
+
+def format_tree(entries):
+    """Сериализует записи (mode, name, hash) в формат дерева git"""
+    # git сортирует каталоги так, будто к их имени добавлен '/'
+    def sort_key(entry):
+        return entry[1] + "/" if entry[0] == TREE_MODE else entry[1]
+
+    return b"".join(
+        f"{mode} {name}".encode() + b"\0" + bytes.fromhex(oid)
+        for mode, name, oid in sorted(entries, key=sort_key)
+    )
+
+
+def parse_tree(data):
+    entries = []
+    pos = 0
+    while pos < len(data):
+        space = data.index(b" ", pos)
+        nul = data.index(b"\0", space)
+        entries.append((data[pos:space].decode(), data[space + 1:nul].decode("utf-8"), data[nul + 1:nul + 21].hex()))
+        pos = nul + 21
+    return entries
+
+
+def read_tree(objects, tree_hash):
+    obj_type, data = objects.read(tree_hash)
+    if obj_type != "tree":
+        raise Exception(f"Object {tree_hash} is not a tree")
+    return parse_tree(data)
+
+
+def lookup_path(objects, tree_hash, path):
+    """Возвращает (mode, hash) записи по пути внутри дерева или None"""
+    entry = (TREE_MODE, tree_hash)
+    for name in path.strip("/").split("/"):
+        if entry[0] != TREE_MODE:
+            return None
+        entry = next(((mode, oid) for mode, entry_name, oid in read_tree(objects, entry[1]) if entry_name == name), None)
+        if entry is None:
+            return None
+    return entry
+
+
+def walk_tree(objects, tree_hash, prefix=""):
+    """Рекурсивно перечисляет файлы дерева как (path, mode, hash)"""
+    for mode, name, oid in read_tree(objects, tree_hash):
+        path = f"{prefix}{name}"
+        if mode == TREE_MODE:
+            yield from walk_tree(objects, oid, f"{path}/")
+        else:
+            yield path, mode, oid
+
+
+def write_tree(objects, index):
+    """Записывает иерархию деревьев для индекса, переиспользуя закэшированные деревья неизменённых каталогов"""
+    if "" in index.trees:
+        return index.trees[""]
+
+    files = {}
+    subdirs = {}
+    seen = set()
+    for path, entry in index.items():
+        directory, _, name = path.rpartition("/")
+        files.setdefault(directory, []).append((entry.git_mode, name, entry.hash))
+
+        while directory and directory not in seen:
+            seen.add(directory)
+            parent, _, dirname = directory.rpartition("/")
+            subdirs.setdefault(parent, set()).add(dirname)
+            directory = parent
+
+    def build(directory):
+        cached = index.trees.get(directory)
+        if cached:
+            return cached
+
+        entries = list(files.get(directory, []))
+        for dirname in subdirs.get(directory, ()):
+            child = f"{directory}/{dirname}" if directory else dirname
+            entries.append((TREE_MODE, dirname, build(child)))
+
+        tree_hash = objects.write("tree", format_tree(entries))
+        index.cache_tree(directory, tree_hash)
+        return tree_hash
+
+    return build("")
+
+
+def diff_trees(objects, old_tree, new_tree, prefix="", read_old=None):
+    """Отдаёт (path, old, new) для различающихся файлов, где old/new — (mode, hash) или None;
+    поддеревья с одинаковым id пропускаются без чтения. read_old позволяет читать старую сторону не из objects"""
+    if old_tree == new_tree:
+        return
+
+    read_old = read_old or (lambda tree_hash: read_tree(objects, tree_hash))
+    old = {name: (mode, oid) for mode, name, oid in read_old(old_tree)} if old_tree else {}
+    new = {name: (mode, oid) for mode, name, oid in read_tree(objects, new_tree)} if new_tree else {}
+
+    for name in sorted(old.keys() | new.keys()):
+        old_entry, new_entry = old.get(name), new.get(name)
+        if old_entry == new_entry:
+            continue
+
+        path = f"{prefix}{name}"
+        old_is_tree = old_entry is not None and old_entry[0] == TREE_MODE
+        new_is_tree = new_entry is not None and new_entry[0] == TREE_MODE
+        if not old_is_tree and not new_is_tree:
+            yield path, old_entry, new_entry
+            continue
+
+        yield from diff_trees(
+            objects, old_entry[1] if old_is_tree else None, new_entry[1] if new_is_tree else None, f"{path}/", read_old
+        )
+        if old_entry is not None and not old_is_tree:
+            yield path, old_entry, None
+        if new_entry is not None and not new_is_tree:
+            yield path, None, new_entry
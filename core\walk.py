@@ -0,0 +1,54 @@
+import os
+import re
+
+from core.ignore import translate
+
+
+def compile_pathspecs(pathspecs):
+    """Объединяет пути и шаблоны командной строки в одно выражение; None означает «все файлы»"""
+    if not pathspecs:
+        return None
+
+    parts = []
+    for spec in pathspecs:
+        if os.sep == '\\':
+            spec = spec.replace('\\', '/')
+        while spec.startswith('./'):
+            spec = spec[2:]
+        spec = spec.strip('/')
+        if spec in ('', '.', '*'):
+            return None
+        # Как и rglob: шаблон совпадает на любой глубине, каталог захватывает всё своё содержимое
+        parts.append('(?:.*/)?' + translate(spec) + '(?:/.*)?')
+    return re.compile('|'.join(parts), re.DOTALL)
+
+
+def walk_worktree(root, matcher, pathspecs=None):
+    """Один проход по рабочему дереву: отдаёт (relative_path, stat) неигнорируемых файлов,
+    подходящих под любой из pathspecs, не заходя в игнорируемые каталоги"""
+    spec = compile_pathspecs(pathspecs)
+    stack = [""]
+
+    while stack:
+        directory = stack.pop()
+        prefix = f"{directory}/" if directory else ""
+        try:
+            with os.scandir(os.path.join(root, directory) if directory else root) as iterator:
+                entries = sorted(iterator, key=lambda entry: entry.name)
+        except (FileNotFoundError, NotADirectoryError, PermissionError):
+            continue
+
+        if directory and any(entry.name == ".gitxignore" for entry in entries):
+            matcher.add_file(os.path.join(root, directory, ".gitxignore"), directory)
+
+        subdirs = []
+        for entry in entries:
+            path = prefix + entry.name
+            if entry.is_dir(follow_symlinks=False):
+                if not matcher.match(path, True):
+                    subdirs.append(path)
+            elif entry.is_file() and not matcher.match(path):
+                if spec is None or spec.fullmatch(path):
+                    yield path, entry.stat()
+
+        stack.extend(reversed(subdirs))
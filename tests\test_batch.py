@@ -0,0 +1,33 @@
+import json
+import os
+import subprocess
+import sys
+
+MAIN = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "main.py")
+
+
+def run_batch(cwd, requests):
+    lines = "".join(json.dumps(request) + "\n" for request in requests)
+    result = subprocess.run([sys.executable, MAIN, "batch"], cwd=cwd, input=lines, capture_output=True, text=True)
+    return [json.loads(line) for line in result.stdout.splitlines()]
+
+
+def test_json_responses_report_failures(tmp_path):
+    (tmp_path / "a.txt").write_text("a\n")
+    responses = run_batch(tmp_path, [
+        {"command": "init"},
+        {"command": "add", "files": ["a.txt"]},
+        {"command": "commit", "message": "first"},
+        {"command": "nope"},
+        {"command": "commit", "message": "again"},
+        {"command": "checkout", "branch": "missing"},
+        {"command": "add", "files": ["missing.txt"]},
+        {"args": ["log", "-n", "1"]},
+    ])
+
+    assert [response["ok"] for response in responses] == [True, True, True, False, False, False, False, True]
+    assert responses[2]["result"] == responses[7]["output"].split()[1]
+    assert responses[3]["error"] == "Command 'nope' not found"
+    assert responses[4]["error"] == "Nothing to commit"
+    assert responses[6]["error"] == "pathspec 'missing.txt' did not match any files"
+    assert all(response["error"] is None for response in responses if response["ok"])
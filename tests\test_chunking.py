@@ -0,0 +1,74 @@
+import hashlib
+import os
+import random
+import zlib
+
+import pytest
+
+from core.chunking import split_chunks
+from core.objects import CHUNKED, ObjectStore
+
+MIN, AVERAGE, MAX = 4 << 10, 16 << 10, 64 << 10
+
+
+def chunk_ids(data):
+    pieces = list(split_chunks([data[i:i + 5000] for i in range(0, len(data), 5000)], MIN, AVERAGE, MAX))
+    assert b"".join(pieces) == data
+    assert all(len(piece) <= MAX for piece in pieces)
+    return [hashlib.sha1(piece).hexdigest() for piece in pieces]
+
+
+def text(size, seed=1):
+    rng = random.Random(seed)
+    words = [b"the", b"quick", b"brown", b"fox", b"jumps", b"over", b"lazy", b"dog", b"lorem", b"ipsum", b"\n"]
+    out = bytearray()
+    while len(out) < size:
+        out += rng.choice(words) + b" "
+    return bytes(out)
+
+
+def csv(rows, seed=2):
+    rng = random.Random(seed)
+    return b"".join(b"%d,%s,%0.4f\n" % (i, rng.choice([b"alpha", b"beta"]), rng.random()) for i in range(rows))
+
+
+@pytest.mark.parametrize("data", [text(2 << 20), csv(60000), os.urandom(2 << 20)], ids=["text", "csv", "random"])
+def test_prepend_changes_only_first_chunks(data):
+    before = chunk_ids(data)
+    after = chunk_ids(b"PREPEND!" + data)
+    assert len(before) > 10
+    # Вставка затрагивает только ближайшие части, остальные совпадают с прежними
+    assert len(set(after) - set(before)) <= 2
+
+
+def test_insert_in_the_middle_of_text():
+    data = text(2 << 20, seed=3)
+    before = chunk_ids(data)
+    after = chunk_ids(data[:len(data) // 2] + b"inserted line\n" + data[len(data) // 2:])
+    assert len(set(after) - set(before)) <= len(before) // 20
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ObjectStore(str(tmp_path), large_file_threshold=1 << 20)
+
+
+def test_write_from_memory_is_chunked(store):
+    data = text(6 << 20)
+    oid = store.write("blob", data)
+    assert oid == hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+    assert store.info(oid) == ("blob", len(data))
+    with open(store.object_path(oid), "rb") as file:
+        assert zlib.decompress(file.read()).startswith(CHUNKED.encode())
+    assert store.read(oid) == ("blob", data)
+
+
+def test_repacked_store_reads_chunked_blob(store):
+    data = os.urandom(6 << 20)
+    oid = store.write("blob", data)
+    assert store.repack() is not None
+    # Манифест остаётся loose, а его части уходят в pack
+    assert set(store.loose_oids()) == {oid}
+    store.close_packs()
+    assert store.read(oid) == ("blob", data)
+    assert b"".join(store.stream(oid)[2]) == data
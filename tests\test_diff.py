@@ -0,0 +1,59 @@
+import time
+
+import core.diff
+from core.diff import diff_lines, unified_diff
+
+
+def _apply(a, b, ops):
+    """Проверяет скрипт правок: индексы идут подряд, а '=' указывает на равные строки"""
+    i = j = 0
+    for tag, x, y in ops:
+        assert (x, y) == (i, j)
+        if tag == "=":
+            assert a[x] == b[y]
+            i, j = i + 1, j + 1
+        elif tag == "-":
+            i += 1
+        else:
+            j += 1
+    assert (i, j) == (len(a), len(b))
+
+
+def _cost(ops):
+    return sum(1 for tag, _, _ in ops if tag != "=")
+
+
+def test_shortest_script():
+    a = list("abcabba")
+    b = list("cbabac")
+    ops = diff_lines(a, b)
+    _apply(a, b, ops)
+    assert _cost(ops) == 5
+
+
+def test_insert_and_delete_only():
+    assert diff_lines([], ["x"]) == [("+", 0, 0)]
+    assert diff_lines(["x"], []) == [("-", 0, 0)]
+    _apply(["a", "b"], ["a", "x", "b"], diff_lines(["a", "b"], ["a", "x", "b"]))
+
+
+def test_cost_limit_still_produces_valid_script(monkeypatch):
+    monkeypatch.setattr(core.diff, "MAX_COST", 2)
+    a = list("abcdefabcdefxyz")
+    b = list("fedcbaxyzabcabc")
+    _apply(a, b, diff_lines(a, b))
+
+
+def test_large_rewrite_is_fast():
+    a = [f"line {i}\n" for i in range(20000)]
+    b = [f"other {i}\n" for i in range(20000)]
+    started = time.time()
+    ops = diff_lines(a, b)
+    assert time.time() - started < 30
+    _apply(a, b, ops)
+
+
+def test_unified_diff_hunk():
+    a = ["a\n", "b\n", "c\n"]
+    b = ["a\n", "B\n", "c\n"]
+    assert list(unified_diff(a, b)) == ["@@ -1,3 +1,3 @@\n", " a\n", "-b\n", "+B\n", " c\n"]
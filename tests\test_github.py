@@ -0,0 +1,119 @@
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from benchmarks.mock_github import MockGitHub
+
+MAIN = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "main.py")
+
+
+@pytest.fixture
+def mock():
+    with MockGitHub() as mock:
+        yield mock
+
+
+@pytest.fixture
+def gitx(mock, tmp_path):
+    env = dict(os.environ, GITX_GITHUB_API=mock.url, GITX_GITHUB_RETRIES="3")
+
+    def run(*args):
+        result = subprocess.run([sys.executable, MAIN, *args], cwd=tmp_path, env=env, capture_output=True, text=True)
+        return result.stdout + result.stderr
+
+    run("init")
+    run("remote", "add", "origin", "https://github.com/u/r")
+    run("auth", "token")
+    return run
+
+
+def commit_files(gitx, tmp_path, names, message):
+    for name in names:
+        (tmp_path / name).write_text(f"{name} {message}\n")
+    gitx("add", *names)
+    return gitx("commit", "-m", message).split()[1]
+
+
+def push_first_commit(gitx, tmp_path):
+    # Пустой репозиторий инициализируется через contents API, дальше работает Git Data API
+    commit_files(gitx, tmp_path, ["a.txt"], "first")
+    assert "Push completed" in gitx("push", "origin", "main")
+
+
+def test_throttled_requests_are_retried(gitx, mock, tmp_path):
+    push_first_commit(gitx, tmp_path)
+    commit_files(gitx, tmp_path, [f"f{i}.txt" for i in range(6)], "second")
+    mock.inject(429, count=2, path="git/blobs", retry_after=1)
+    mock.inject(403, count=2, path="git/blobs", retry_after=0)
+
+    assert "Push completed" in gitx("push", "origin", "main")
+    assert mock.rejected == 4
+    assert mock.handled["POST git/blobs"] == 6
+
+
+def test_primary_rate_limit_waits_for_reset(gitx, mock, tmp_path):
+    push_first_commit(gitx, tmp_path)
+    commit_files(gitx, tmp_path, [f"f{i}.txt" for i in range(4)], "second")
+    mock.set_rate_limit(4, window=1)
+
+    started = time.time()
+    assert "Push completed" in gitx("push", "origin", "main", "-j", "2")
+    # Восемь запросов при лимите 4 в секунду укладываются не меньше чем в одно окно
+    assert time.time() - started >= 1
+
+
+def test_plain_forbidden_is_not_retried(gitx, mock, tmp_path):
+    push_first_commit(gitx, tmp_path)
+    commit_files(gitx, tmp_path, ["b.txt"], "second")
+    mock.inject(403, count=5, path="git/blobs", message="Resource not accessible by integration")
+
+    output = gitx("push", "origin", "main")
+    assert "Push failed: Resource not accessible by integration" in output
+    assert mock.rejected == 1
+
+
+def test_interrupted_push_resumes_from_journal(gitx, mock, tmp_path):
+    push_first_commit(gitx, tmp_path)
+    names = [f"f{i}.txt" for i in range(8)]
+    commit_files(gitx, tmp_path, names, "second")
+    # Сервер отказывает загрузкам блобов до конца попытки: push прерывается
+    mock.inject(500, count=4, path="git/blobs")
+    mock.handled.clear()
+    output = gitx("push", "origin", "main", "-j", "1")
+    assert "Push failed" in output
+    uploaded = mock.handled["POST git/blobs"]
+    journal = tmp_path / ".gitx" / "journal" / "github" / "u" / "r"
+    assert journal.exists()
+    assert len(journal.read_text().split()) == uploaded
+
+    mock.faults.clear()
+    mock.handled.clear()
+    output = gitx("push", "origin", "main")
+    assert f"Resuming interrupted push: {uploaded} blobs already uploaded" in output
+    assert "Push completed" in output
+    assert mock.handled["POST git/blobs"] == len(names) - uploaded
+    assert not journal.exists()
+
+    # Повтор после успешного push не загружает ни одного блоба
+    mock.handled.clear()
+    assert "Everything up-to-date" in gitx("push", "origin", "main")
+    assert mock.handled["POST git/blobs"] == 0
+
+
+def test_push_of_non_descendant_is_rejected(gitx, mock, tmp_path):
+    push_first_commit(gitx, tmp_path)
+    commit_files(gitx, tmp_path, ["b.txt"], "second")
+    assert "Push completed" in gitx("push", "origin", "main")
+    remote_head = mock.refs["main"]
+
+    first = gitx("log", "--oneline").splitlines()[1].split()[0]
+    gitx("checkout", first)
+    output = gitx("push", "origin", "main")
+    assert "Updates were rejected" in output
+    assert mock.refs["main"] == remote_head
+
+    assert "Push completed" in gitx("push", "origin", "main", "--force")
+    assert mock.refs["main"] != remote_head
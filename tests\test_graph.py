@@ -0,0 +1,71 @@
+import os
+
+import pytest
+
+from core.graph import CHAIN, CommitGraph
+from core.repository import Repository
+
+
+@pytest.fixture
+def repository(tmp_path):
+    repository = Repository(str(tmp_path))
+    repository.init()
+    return repository
+
+
+def commit_file(repository, name, data):
+    with open(os.path.join(repository.path, name), "w") as file:
+        file.write(data)
+    repository.add([name])
+    return repository.commit(f"write {name}")
+
+
+def graph_dir(repository):
+    return os.path.join(repository.vcs_dir, "objects", "info", "gitx-commit-graphs")
+
+
+def test_graph_grows_by_layers(repository):
+    commits = []
+    for i in range(40):
+        commits.append(commit_file(repository, "a.txt", f"{i}\n"))
+        repository.get_commit("HEAD")
+        assert list(repository.iter_log(max_count=1)) == [commits[-1]]
+
+    graph = CommitGraph(graph_dir(repository))
+    assert len(graph) == 40
+    # Слои сливаются по мере роста, так что их остаётся порядка log n
+    assert 1 < len(graph.layers) <= 7
+    assert [graph.oid(graph.parents(graph.lookup(c))[0]) for c in commits[1:]] == commits[:-1]
+    assert graph.generation(graph.lookup(commits[-1])) == 40
+    assert repository.is_ancestor(commits[3], commits[-1])
+    assert not repository.is_ancestor(commits[-1], commits[3])
+    graph.close()
+
+    repository.gc()
+    graph = CommitGraph(graph_dir(repository))
+    assert len(graph.layers) == 1 and len(graph) == 40
+    graph.close()
+    # Слитые слои удалены
+    files = sorted(os.listdir(graph_dir(repository)))
+    assert files[0] == CHAIN and len(files) == 2 and files[1].endswith(".graph")
+
+
+def test_merge_base_across_layers(repository):
+    base = commit_file(repository, "a.txt", "a\n")
+    repository.create_branch("side")
+    main_tip = commit_file(repository, "b.txt", "b\n")
+    repository.get_commit("HEAD")
+    repository.checkout("side")
+    side_tip = commit_file(repository, "c.txt", "c\n")
+    assert repository.get_merge_bases(main_tip, side_tip) == [base]
+    assert repository.get_merge_bases(base, side_tip) == [base]
+
+
+def test_legacy_graph_is_removed(repository):
+    commit_file(repository, "a.txt", "a\n")
+    legacy_path = os.path.join(repository.vcs_dir, "objects", "info", "commit-graph")
+    os.makedirs(os.path.dirname(legacy_path), exist_ok=True)
+    with open(legacy_path, "wb") as file:
+        file.write(b"GXCG" + b"\0" * 16)
+    next(Repository(repository.path).iter_log(max_count=1))
+    assert not os.path.exists(legacy_path)
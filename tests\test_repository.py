@@ -0,0 +1,45 @@
+import os
+
+import pytest
+
+from core.repository import Repository
+
+
+@pytest.fixture
+def repository(tmp_path):
+    repository = Repository(str(tmp_path))
+    repository.init()
+    return repository
+
+
+def write(repository, path, data):
+    full_path = os.path.join(repository.path, path)
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    with open(full_path, "w") as file:
+        file.write(data)
+
+
+def test_add_stages_deleted_files(repository):
+    write(repository, "a.txt", "a\n")
+    write(repository, "sub/b.txt", "b\n")
+    repository.add(["."])
+    repository.commit("first")
+
+    os.remove(os.path.join(repository.path, "sub", "b.txt"))
+    repository.add(["sub"])
+    assert repository.get_status()["staged"] == [("deleted", "sub/b.txt")]
+
+    repository.commit("remove b")
+    status = repository.get_status()
+    assert status["staged"] == [] and status["unstaged"] == []
+
+
+def test_rename_branch_refuses_detached_head(repository):
+    write(repository, "a.txt", "a\n")
+    repository.add(["a.txt"])
+    first = repository.commit("first")
+    assert repository.checkout(first)
+
+    assert repository.rename_branch("renamed") is False
+    assert "renamed" not in repository.get_branches()
+    assert repository.current_branch() is None
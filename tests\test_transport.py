@@ -0,0 +1,78 @@
+import os
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+import requests
+
+from core.refs import read_ref, update_ref
+from core.repository import Repository
+from core.server import ProtocolHandler
+from core.transport import LocalEndpoint
+
+
+@pytest.fixture
+def remote(tmp_path):
+    repository = Repository(str(tmp_path / "remote"))
+    os.makedirs(repository.path)
+    repository.init()
+    with open(os.path.join(repository.path, "a.txt"), "w") as file:
+        file.write("a\n")
+    repository.add(["a.txt"])
+    repository.commit("first")
+    return repository
+
+
+@pytest.fixture
+def server(remote):
+    handler = type("Handler", (ProtocolHandler,), {"repository_path": remote.path})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_push_rejects_branch_outside_refs(server, remote, tmp_path):
+    head = remote.resolve("HEAD")
+    for branch in ("../../../escaped", "../../HEAD", "a/../../b", "refs/../x"):
+        response = requests.post(f"{server}/push", params={"branch": branch, "new": head, "force": "1"}, data=b"")
+        assert response.status_code == 400
+    assert not os.path.exists(os.path.join(remote.path, "escaped"))
+    assert not os.path.exists(tmp_path / "escaped")
+
+
+def test_push_rejects_malformed_commit_ids(server, remote):
+    response = requests.post(f"{server}/push", params={"branch": "main", "new": "../x"}, data=b"")
+    assert response.status_code == 400
+    response = requests.post(f"{server}/push", params={"branch": "main", "old": "zz", "new": "0" * 40}, data=b"")
+    assert response.status_code == 400
+
+
+def test_get_ref_rejects_traversal(server):
+    assert requests.get(f"{server}/refs/..%2F..%2FHEAD").status_code == 400
+
+
+def test_update_ref_validates_names(remote):
+    with pytest.raises(Exception):
+        update_ref(remote.vcs_dir, "../../escaped", "0" * 40)
+    assert not os.path.exists(os.path.join(remote.path, "escaped"))
+
+
+def test_stale_old_leaves_worktree_untouched(remote):
+    first = remote.resolve("HEAD")
+    with open(os.path.join(remote.path, "a.txt"), "w") as file:
+        file.write("b\n")
+    remote.add(["a.txt"])
+    second = remote.commit("second")
+    # Возвращаем ветку и дерево на первый коммит: второй остаётся в хранилище
+    update_ref(remote.vcs_dir, "main", first)
+    Repository(remote.path).apply_update(second, first)
+
+    endpoint = LocalEndpoint(remote.path)
+    with pytest.raises(Exception, match="concurrently"):
+        endpoint.receive_pack("main", second, second, force=True)
+    assert read_ref(remote.vcs_dir, "main") == first
+    with open(os.path.join(remote.path, "a.txt")) as file:
+        assert file.read() == "a\n"